@@ -377,7 +377,10 @@ export default function GameDetail() {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
-        }
+        },
+        body: JSON.stringify({
+          game_id: id
+        }),
       });
 
       if (!response.ok) {
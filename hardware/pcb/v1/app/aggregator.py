@@ -0,0 +1,216 @@
+import re
+import threading
+import time
+
+FILES = "abcdefgh"
+PIECES = set("PNBRQKpnbrqk")
+EMPTY = "."
+
+# Each ATtiny region covers a 2x2 block. A-D are the prototype regions
+# (ranks 1-4, files a-d); E-P extend the same layout to the full board.
+REGION_ORIGINS = {
+    "C": ("a", 1), "D": ("c", 1), "E": ("e", 1), "F": ("g", 1),
+    "A": ("a", 3), "B": ("c", 3), "G": ("e", 3), "H": ("g", 3),
+    "I": ("a", 5), "J": ("c", 5), "K": ("e", 5), "L": ("g", 5),
+    "M": ("a", 7), "N": ("c", 7), "O": ("e", 7), "P": ("g", 7),
+}
+
+
+def region_squares(region):
+    """Squares covered by a region, in order a1-style: lower-left, lower-right, upper-left, upper-right"""
+    file, rank = REGION_ORIGINS[region]
+    right = FILES[FILES.index(file) + 1]
+    return [f"{file}{rank}", f"{right}{rank}", f"{file}{rank + 1}", f"{right}{rank + 1}"]
+
+
+REGION_SQUARES = {region: region_squares(region) for region in REGION_ORIGINS}
+SQUARE_INDEX = {f"{file}{rank}": (rank - 1) * 8 + i for i, file in enumerate(FILES) for rank in range(1, 9)}
+SQUARE_NAMES = sorted(SQUARE_INDEX, key=SQUARE_INDEX.get)
+
+# Castling right -> (king square, rook square, king symbol, rook symbol)
+CASTLING_HOMES = {
+    "K": ("e1", "h1", "K", "R"),
+    "Q": ("e1", "a1", "K", "R"),
+    "k": ("e8", "h8", "k", "r"),
+    "q": ("e8", "a8", "k", "r"),
+}
+
+
+EMPTY_BYTE = ord(EMPTY)
+WHITE_BYTES = frozenset(b"PNBRQK")
+START_BOARD = bytes("RNBQKBNR" + "P" * 8 + EMPTY * 32 + "p" * 8 + "rnbqkbnr", "ascii")
+EMPTY_RUN = re.compile(rb"\.+")
+
+
+def normalize_piece(piece):
+    """Firmware reports '-' (or an unknown label) for empty squares"""
+    return piece if piece in PIECES else EMPTY
+
+
+def placement_fen(board):
+    """FEN placement field for a 64-byte board indexed a1=0 .. h8=63"""
+    return b"/".join(
+        EMPTY_RUN.sub(lambda run: b"%d" % len(run.group()), board[rank * 8:rank * 8 + 8])
+        for rank in range(7, -1, -1)
+    ).decode("ascii")
+
+
+def changed_mask(before, after):
+    """Bitmap (bit i = square i) of squares that differ between two 64-byte boards"""
+    diff = (int.from_bytes(before, "little") ^ int.from_bytes(after, "little")).to_bytes(64, "little")
+    mask = 0
+    for index, byte in enumerate(diff):
+        if byte:
+            mask |= 1 << index
+    return mask
+
+
+def mask_squares(mask):
+    """Square indexes set in a change bitmap, ascending"""
+    squares = []
+    while mask:
+        low = mask & -mask
+        squares.append(low.bit_length() - 1)
+        mask ^= low
+    return squares
+
+
+class Snapshot:
+    """A consistent copy of the board at one version"""
+    __slots__ = ("version", "board", "changed")
+
+    def __init__(self, version, board, changed):
+        self.version = version
+        self.board = board
+        self.changed = changed
+
+
+class BoardAggregator:
+    """Merges per-region square updates into one 8x8 board and emits a full FEN on every change.
+
+    The board is a 64-byte bytearray (a1=0 .. h8=63, FEN letters, '.' empty)
+    with a version that increases on every change and a bitmap of the squares
+    that version changed. Writers serialize on a lock and bump a seqlock
+    counter around each mutation; snapshot() never takes the lock, it retries
+    until it copies the board between two equal, even counter reads. The FEN is
+    built once per version.
+
+    Side to move is inferred from which colour last put a piece on a new
+    square relative to the position at the previous turn change, so lifting a
+    piece, or adjusting one and putting it back, does not flip the turn.
+    Seeing the starting position resets the game state; from then on a
+    castling right is dropped permanently once its king or rook leaves its
+    home square. `on_fen` is called synchronously with each new FEN.
+    """
+
+    def __init__(self, on_fen=None, initial=None):
+        self.board = bytearray(EMPTY * 64, "ascii")
+        if initial:
+            for square, piece in initial.items():
+                self.board[SQUARE_INDEX[square]] = ord(normalize_piece(piece))
+        self.on_fen = on_fen
+        self.version = 0
+        self.changed = 0  # bitmap of the squares the current version changed
+        self.white_to_move = True
+        self.fullmove = 1
+        self.lost_castling = set()
+        self.started = False
+        self.turn_board = bytes(self.board)
+        self.sequence = 0  # sequence number of the last update applied
+        self._seq = 0  # seqlock counter, odd while the board is being written
+        self._fen_cache = (None, None)  # (version, fen), replaced as one reference
+        self._lock = threading.Lock()
+
+    def apply(self, region, squares, sequence=None):
+        """Apply a region's {square: piece} update; returns the new FEN, or None if nothing changed"""
+        with self._lock:
+            self.sequence = self.sequence + 1 if sequence is None else sequence
+            changed = 0
+            for square, piece in squares.items():
+                index = SQUARE_INDEX.get(square)
+                if index is None:
+                    continue
+                piece = ord(normalize_piece(piece))
+                if self.board[index] != piece:
+                    if not changed:
+                        self._seq += 1  # odd: readers retry until the write completes
+                    self.board[index] = piece
+                    changed |= 1 << index
+            if not changed:
+                return None
+            self.changed = changed
+            self.version += 1
+            self._seq += 1
+            self._update_state()
+            fen = self._build_fen()
+            self._fen_cache = (self.version, fen)
+        if self.on_fen:
+            self.on_fen(fen)
+        return fen
+
+    def snapshot(self):
+        """Consistent (version, board, changed) without taking the writer lock"""
+        while True:
+            seq = self._seq
+            if seq & 1:
+                time.sleep(0)
+                continue
+            snapshot = Snapshot(self.version, bytes(self.board), self.changed)
+            if self._seq == seq:
+                return snapshot
+
+    def changes_since(self, snapshot):
+        """(current snapshot, bitmap of squares changed since `snapshot`)"""
+        current = self.snapshot()
+        if current.version == snapshot.version:
+            return current, 0
+        return current, changed_mask(snapshot.board, current.board)
+
+    @property
+    def fen(self):
+        """FEN of the current version, built at most once per version"""
+        version, fen = self._fen_cache
+        if version != self.version:
+            with self._lock:
+                version, fen = self._fen_cache
+                if version != self.version:
+                    fen = self._build_fen()
+                    self._fen_cache = (self.version, fen)
+        return fen
+
+    def _at_home(self, right):
+        king_square, rook_square, king, rook = CASTLING_HOMES[right]
+        return self.board[SQUARE_INDEX[king_square]] == ord(king) and self.board[SQUARE_INDEX[rook_square]] == ord(rook)
+
+    def _update_state(self):
+        if self.board == START_BOARD:
+            self.started = True
+            self.white_to_move = True
+            self.fullmove = 1
+            self.lost_castling = set()
+            self.turn_board = START_BOARD
+            return
+
+        if self.started:
+            for right in CASTLING_HOMES:
+                if not self._at_home(right):
+                    self.lost_castling.add(right)
+
+        mover_placed = False
+        for index in mask_squares(changed_mask(self.turn_board, self.board)):
+            after = self.board[index]
+            if after != EMPTY_BYTE and (after in WHITE_BYTES) == self.white_to_move:
+                mover_placed = True
+                break
+        if mover_placed:
+            if not self.white_to_move:
+                self.fullmove += 1
+            self.white_to_move = not self.white_to_move
+            self.turn_board = bytes(self.board)
+
+    def _build_fen(self):
+        castling = "".join(
+            right for right in "KQkq" if right not in self.lost_castling and self._at_home(right)
+        ) or "-"
+        turn = "w" if self.white_to_move else "b"
+        return f"{placement_fen(self.board)} {turn} {castling} - 0 {self.fullmove}"
@@ -0,0 +1,78 @@
+"""Frames per second and accuracy of the vectorized sensor classifier.
+
+Synthesizes raw readings for random positions (sticker RGB plus noise, hall
+and IR around the firmware thresholds) and classifies them one frame at a
+time, as the ingest loop would, and in batches.
+
+    python bench_classifier.py [--frames 2000] [--noise 3] [--seed 1]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from classifier import HALL, IR, STICKERS, SensorClassifier
+
+
+def random_truth(frames, rng):
+    """Random sticker class per square, about half the squares empty"""
+    truth = rng.integers(0, len(STICKERS), size=(frames, 64))
+    truth[rng.random((frames, 64)) < 0.5] = 0
+    return truth
+
+
+def synthesize(frames, noise, rng, truth=None):
+    """(readings, truth): readings (frames, 64, 5) and the true sticker class per square"""
+    centroids = np.array([rgb for _, rgb in STICKERS], dtype=np.float64)
+    pieces = [piece for piece, _ in STICKERS]
+    if truth is None:
+        truth = random_truth(frames, rng)
+    readings = np.empty((frames, 64, 5))
+    readings[..., :3] = centroids[truth] + rng.normal(0, noise, (frames, 64, 3))
+    occupied = truth != 0
+    white = np.array([piece.isupper() for piece in pieces])[truth]
+    readings[..., IR] = np.where(occupied, 800, 300) + rng.normal(0, 60, (frames, 64))
+    readings[..., HALL] = np.where(occupied & white, 620, np.where(occupied, 180, 400)) + rng.normal(0, 30, (frames, 64))
+    return readings, truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=3.0, help="RGB noise standard deviation")
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    readings, truth = synthesize(args.frames, args.noise, rng)
+    expected = ["".join(STICKERS[index][0] for index in row) for row in truth]
+    classifier = SensorClassifier()
+
+    started = time.perf_counter()
+    single = [classifier.classify(frame)[0] for frame in readings]
+    elapsed = time.perf_counter() - started
+    print(f"one frame per call   {args.frames / elapsed:8.0f} frames/s  {elapsed / args.frames * 1e6:6.0f} us/frame")
+
+    started = time.perf_counter()
+    batched = []
+    for offset in range(0, args.frames, args.batch):
+        placements, confidence = classifier.classify(readings[offset:offset + args.batch])
+        batched.extend(placements)
+    elapsed = time.perf_counter() - started
+    print(f"batches of {args.batch:<9} {args.frames / elapsed:8.0f} frames/s")
+    assert batched == single
+
+    def accuracy(placements):
+        return sum(a == b for placement, row in zip(placements, expected) for a, b in zip(placement, row)) / (args.frames * 64)
+
+    # The firmware's decision: nearest sticker by RGB alone
+    centroids = classifier.centroids
+    distance = (((readings[..., None, :3] - centroids) ** 2) * (1.0, 1.0, 0.8)).sum(axis=-1)
+    nearest = ["".join(STICKERS[index][0] for index in row) for row in distance.argmin(axis=-1)]
+    print(f"square accuracy      {accuracy(single):.2%} fused, {accuracy(nearest):.2%} nearest sticker RGB only "
+          f"(RGB noise {args.noise})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Wire size and host decode throughput: JSON lines vs binary region frames.
+
+Replays the same stream of random region updates through both formats,
+including the firmware's [DEBUG] lines, and for binary frames a run with
+corrupted bytes to exercise resync.
+
+    python bench_frames.py [--updates 100000] [--seed 1]
+"""
+import argparse
+import json
+import random
+import time
+
+from aggregator import REGION_SQUARES
+from region_frames import FrameDecoder, encode_frame, frame_squares
+
+BAUD = 9600
+BITS_PER_BYTE = 10  # 8N1
+
+
+def make_updates(count, rng):
+    pieces = ".PNBRQKpnbrqk"
+    regions = sorted(REGION_SQUARES)
+    sequences = dict.fromkeys(regions, 0)
+    updates = []
+    for _ in range(count):
+        region = rng.choice(regions)
+        sequences[region] += 1
+        updates.append((
+            region,
+            sequences[region],
+            [rng.choice(pieces) for _ in range(4)],
+            [rng.randrange(1024) for _ in range(4)],
+            [rng.randrange(1024) for _ in range(4)],
+        ))
+    return updates
+
+
+def json_stream(updates):
+    # Same shape as serializeJson() in src/main.cpp: '-' for empty squares
+    lines = []
+    for region, _, pieces, _, _ in updates:
+        squares = {square: ("-" if piece == "." else piece) for square, piece in zip(REGION_SQUARES[region], pieces)}
+        lines.append(json.dumps({"region": region, "squares": squares}, separators=(",", ":")).encode() + b"\n")
+    return b"".join(lines)
+
+
+def binary_stream(updates):
+    return b"".join(encode_frame(*update) for update in updates)
+
+
+def decode_json(data, chunk):
+    buffer = bytearray()
+    decoded = 0
+    for offset in range(0, len(data), chunk):
+        buffer += data[offset:offset + chunk]
+        while True:
+            end = buffer.find(b"\n")
+            if end < 0:
+                break
+            line = bytes(buffer[:end]).strip()
+            del buffer[:end + 1]
+            if line.startswith(b"{"):
+                json.loads(line)["squares"]
+                decoded += 1
+    return decoded
+
+
+def decode_binary(data, chunk):
+    decoder = FrameDecoder()
+    decoded = 0
+    for offset in range(0, len(data), chunk):
+        for frame in decoder.feed(data[offset:offset + chunk]):
+            frame_squares(frame)
+            decoded += 1
+    return decoded, decoder
+
+
+def corrupt(data, rate, rng):
+    data = bytearray(data)
+    for _ in range(int(len(data) * rate)):
+        data[rng.randrange(len(data))] ^= 1 << rng.randrange(8)
+    return bytes(data)
+
+
+def timed(label, count, wire_bytes, decode):
+    started = time.perf_counter()
+    result = decode()
+    elapsed = time.perf_counter() - started
+    per_update = wire_bytes / count
+    print(f"{label:<22} {per_update:6.1f} B/update  {BAUD / BITS_PER_BYTE / per_update:6.1f} updates/s at {BAUD} baud  "
+          f"{count / elapsed:10.0f} decodes/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--chunk", type=int, default=64, help="Bytes handed to the decoder per read")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    updates = make_updates(args.updates, rng)
+    debug = b"[DEBUG] Piece change detected, updating board state...\n"
+
+    json_data = json_stream(updates)
+    binary_data = binary_stream(updates)
+    timed("json", len(updates), len(json_data), lambda: decode_json(json_data, args.chunk))
+    decoded, _ = timed("binary", len(updates), len(binary_data), lambda: decode_binary(binary_data, args.chunk))
+    assert decoded == len(updates)
+
+    # Firmware debug text interleaved with every frame
+    mixed = b"".join(debug + encode_frame(*update) for update in updates)
+    decoded, decoder = timed("binary + debug text", len(updates), len(mixed), lambda: decode_binary(mixed, args.chunk))
+    assert decoded == len(updates), decoded
+
+    noisy = corrupt(binary_data, 0.001, rng)
+    decoded, decoder = timed("binary, 0.1% bit flips", len(updates), len(noisy), lambda: decode_binary(noisy, args.chunk))
+    print(f"  recovered {decoded}/{len(updates)} frames, {decoder.errors} rejected syncs, {decoder.skipped} bytes skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Per-square calibration for SensorClassifier.
+
+Record raw readings while known positions are set up on the board
+(`python main.py --calibrate BOARD_ID`, with regions built with
+-DRAW_READINGS), fit per-square sticker centroids and hall/IR thresholds,
+and keep the result per board ID. A samples file recorded earlier can be
+refitted with:
+
+    python calibration.py BOARD_ID samples.jsonl [--dir calibrations]
+
+Each sample line is {"placement": <64 chars, a1..h8, '.' empty>,
+"readings": <64 x [red, green, blue, ir, hall], null for a square no region reported>}.
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from aggregator import EMPTY, FILES, SQUARE_INDEX, normalize_piece
+from classifier import BLUE, FIELDS, HALL, IR, RED, STICKERS, SensorClassifier
+
+BOARD_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibrations")
+PRIOR_WEIGHT = 2.0  # samples' worth of weight given to the per-square response fit
+
+# Positions set up while recording, as FEN placements: every square is seen empty and
+# under pieces of both colours, and all of them need only one set of 32 pieces
+CALIBRATION_POSITIONS = [
+    "8/8/8/8/8/8/8/8",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR",
+    "RNBQKBNR/PPPPPPPP/8/8/8/8/pppppppp/rnbqkbnr",
+    "8/8/rnbqkbnr/pppppppp/PPPPPPPP/RNBQKBNR/8/8",
+    "8/8/RNBQKBNR/PPPPPPPP/pppppppp/rnbqkbnr/8/8",
+]
+
+
+def placement_from_fen(fen):
+    """64-character placement, a1..h8, of a FEN (only the placement field is used)"""
+    ranks = fen.split(" ", 1)[0].split("/")
+    if len(ranks) != 8:
+        raise ValueError(f"expected 8 ranks in {fen!r}")
+    rows = []
+    for rank in reversed(ranks):
+        row = "".join(EMPTY * int(char) if char.isdigit() else char for char in rank)
+        if len(row) != len(FILES) or any(normalize_piece(piece) != piece for piece in row):
+            raise ValueError(f"invalid rank {rank!r} in {fen!r}")
+        rows.append(row)
+    return "".join(rows)
+
+
+class Calibration:
+    """Fitted per-square parameters for one board"""
+
+    def __init__(self, board_id, pieces, centroids, hall_low, hall_high, ir_present, rgb_scale, samples):
+        self.board_id = board_id
+        self.pieces = pieces
+        self.centroids = np.asarray(centroids, dtype=np.float64)  # (64, classes, 3)
+        self.hall_low = np.asarray(hall_low, dtype=np.float64)  # (64,)
+        self.hall_high = np.asarray(hall_high, dtype=np.float64)
+        self.ir_present = np.asarray(ir_present, dtype=np.float64)
+        self.rgb_scale = float(rgb_scale)
+        self.samples = samples
+
+    def classifier(self, **options):
+        return SensorClassifier(
+            pieces=self.pieces,
+            centroids=self.centroids,
+            hall_low=self.hall_low,
+            hall_high=self.hall_high,
+            ir_present=self.ir_present,
+            rgb_scale=self.rgb_scale,
+            **options,
+        )
+
+    def to_dict(self):
+        return {
+            "board_id": self.board_id,
+            "pieces": "".join(self.pieces),
+            "centroids": np.round(self.centroids, 3).tolist(),
+            "hall_low": np.round(self.hall_low, 3).tolist(),
+            "hall_high": np.round(self.hall_high, 3).tolist(),
+            "ir_present": np.round(self.ir_present, 3).tolist(),
+            "rgb_scale": round(self.rgb_scale, 3),
+            "samples": self.samples,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["board_id"], list(data["pieces"]), data["centroids"], data["hall_low"],
+            data["hall_high"], data["ir_present"], data["rgb_scale"], data["samples"],
+        )
+
+
+class CalibrationRecorder:
+    """Collects (readings, placement) samples while known positions are on the board.
+
+    Samples come either whole from record(), or from the region streams:
+    update() keeps the latest readings of each square as regions report them
+    (from the reader thread) and record_latest() takes them as the sample for
+    the position now set up. Squares no region reported are NaN and left out
+    of the fit.
+    """
+
+    def __init__(self, board_id):
+        if not BOARD_ID.match(board_id):
+            raise ValueError("board ID may only contain letters, digits, '-' and '_'")
+        self.board_id = board_id
+        self.readings = []
+        self.placements = []
+        self.latest = np.full((64, len(FIELDS)), np.nan)
+        self.updated_at = np.full(64, -np.inf)  # time.monotonic() of each square's latest readings
+        self._lock = threading.Lock()
+
+    def record(self, readings, placement):
+        readings = np.asarray(readings, dtype=np.float64)
+        if readings.shape != (64, len(FIELDS)):
+            raise ValueError("readings must be 64 squares of [red, green, blue, ir, hall]")
+        if len(placement) != 64:
+            raise ValueError("placement must have 64 squares")
+        self.readings.append(readings)
+        self.placements.append(placement)
+
+    def update(self, squares, at=None):
+        """Latest raw readings of some squares, {square: [red, green, blue, ir, hall]}"""
+        at = time.monotonic() if at is None else at
+        with self._lock:
+            for square, values in squares.items():
+                index = SQUARE_INDEX.get(square)
+                if index is None or len(values) != len(FIELDS):
+                    continue
+                self.latest[index] = values
+                self.updated_at[index] = at
+
+    def stale(self, since):
+        """Squares that have reported readings, but none since `since`"""
+        with self._lock:
+            reported = np.isfinite(self.updated_at)
+            return [square for square, index in SQUARE_INDEX.items() if reported[index] and self.updated_at[index] < since]
+
+    def reported_since(self, since):
+        """Number of squares with readings from `since` on"""
+        with self._lock:
+            return int((self.updated_at >= since).sum())
+
+    def record_latest(self, placement):
+        """Record the latest readings of every square as a sample of `placement`; returns the squares reported"""
+        with self._lock:
+            readings = self.latest.copy()
+        self.record(readings, placement)
+        return int((~np.isnan(readings).any(axis=-1)).sum())
+
+    def save_samples(self, path):
+        """Write the samples as JSON lines, the format main() reads"""
+        with open(path, "w") as f:
+            for readings, placement in zip(self.readings, self.placements):
+                rows = [None if np.isnan(row).any() else row.tolist() for row in readings]
+                f.write(json.dumps({"placement": placement, "readings": rows}) + "\n")
+
+    def load_samples(self, path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    sample = json.loads(line)
+                    rows = [[np.nan] * len(FIELDS) if row is None else row for row in sample["readings"]]
+                    self.record(rows, sample["placement"])
+
+    def fit(self, pieces=None, defaults=None):
+        """Fit a Calibration from the recorded samples"""
+        if not self.readings:
+            raise ValueError("no samples recorded")
+        pieces = pieces or [piece for piece, _ in STICKERS]
+        defaults = defaults or SensorClassifier()
+        return fit_calibration(self.board_id, np.stack(self.readings), self.placements, pieces, defaults)
+
+
+def _masked_mean(values, mask, fallback):
+    """Mean of `values` over samples (axis 0) where `mask`, `fallback` where nothing was seen"""
+    count = mask.sum(axis=0)
+    total = np.where(mask, values, 0.0).sum(axis=0)
+    return np.where(count > 0, total / np.maximum(count, 1), fallback)
+
+
+def fit_calibration(board_id, readings, placements, pieces, defaults):
+    """Per-square class centroids and thresholds from labelled samples.
+
+    Every square's RGB response is fitted as gain * board-wide class mean +
+    offset per channel (least squares over the square's samples), which
+    covers classes the square never saw. Each centroid blends that fit with
+    the square's own sample mean for the class; with the labels known the
+    mean is where k-means on the same features would converge. Hall and IR
+    thresholds sit halfway between the class means on each side of them.
+    Readings that are NaN (a square no region reported) are left out; a
+    square with none keeps the board-wide centroids and default thresholds.
+    """
+    index = {piece: i for i, piece in enumerate(pieces)}
+    unknown = {piece for placement in placements for piece in placement} - set(index)
+    if unknown:
+        raise ValueError(f"placement has pieces with no sticker class: {''.join(sorted(unknown))}")
+    labels = np.array([[index[piece] for piece in placement] for placement in placements])  # (samples, 64)
+    valid = ~np.isnan(readings).any(axis=-1)  # (samples, 64)
+    if not valid.any():
+        raise ValueError("no square has readings")
+    readings = np.where(valid[..., None], readings, 0.0)
+    classes = len(pieces)
+    onehot = (labels[..., None] == np.arange(classes)) & valid[..., None]  # (samples, 64, classes)
+    rgb = readings[..., RED:BLUE + 1]
+
+    counts = onehot.sum(axis=0)  # (64, classes)
+    sums = np.einsum("sqk,sqc->qkc", onehot.astype(np.float64), rgb)
+    board_counts = counts.sum(axis=0)
+    board_means = np.where(board_counts[:, None] > 0, sums.sum(axis=0) / np.maximum(board_counts, 1)[:, None],
+                           np.broadcast_to(defaults.centroids, (classes, 3)))
+
+    # Per-square, per-channel linear response to the board-wide class means
+    x = board_means[labels] * valid[..., None]  # (samples, 64, 3)
+    n = valid.sum(axis=0)[:, None]  # (64, 1)
+    sx, sy = x.sum(axis=0), rgb.sum(axis=0)
+    sxx, sxy = (x * x).sum(axis=0), (x * rgb).sum(axis=0)
+    spread = n * sxx - sx * sx
+    gain = np.where(spread > 1e-6, (n * sxy - sx * sy) / np.where(spread > 1e-6, spread, 1.0), 1.0)
+    offset = np.where(n > 0, (sy - gain * sx) / np.maximum(n, 1), 0.0)
+    response = gain[:, None, :] * board_means + offset[:, None, :]  # (64, classes, 3)
+    centroids = (sums + PRIOR_WEIGHT * response) / (counts + PRIOR_WEIGHT)[..., None]
+
+    residual = rgb - np.take_along_axis(centroids[None], labels[..., None, None], axis=2)[..., 0, :]
+    rgb_scale = max(1.0, float(np.sqrt((residual ** 2)[valid].mean())))
+
+    is_empty = labels == index[EMPTY]
+    is_white = np.array([piece.isupper() for piece in pieces])[labels]
+    empty = is_empty & valid
+    white = is_white & valid
+    black = ~is_empty & ~is_white & valid
+    hall, ir = readings[..., HALL], readings[..., IR]
+    hall_empty = _masked_mean(hall, empty, (defaults.hall_low + defaults.hall_high) / 2)
+    hall_low = (_masked_mean(hall, black, 2 * defaults.hall_low - hall_empty) + hall_empty) / 2
+    hall_high = (_masked_mean(hall, white, 2 * defaults.hall_high - hall_empty) + hall_empty) / 2
+    ir_empty = _masked_mean(ir, empty, defaults.ir_present - defaults.ir_scale)
+    ir_present = (_masked_mean(ir, ~is_empty & valid, 2 * defaults.ir_present - ir_empty) + ir_empty) / 2
+
+    return Calibration(board_id, list(pieces), centroids, hall_low, hall_high, ir_present, rgb_scale, len(placements))
+
+
+class CalibrationStore:
+    """Calibrations kept as <directory>/<board_id>.json"""
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+
+    def path(self, board_id):
+        if not BOARD_ID.match(board_id):
+            raise ValueError("board ID may only contain letters, digits, '-' and '_'")
+        return os.path.join(self.directory, f"{board_id}.json")
+
+    def save(self, calibration):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(calibration.board_id)
+        with open(path + ".tmp", "w") as f:
+            json.dump(calibration.to_dict(), f)
+        os.replace(path + ".tmp", path)
+        return path
+
+    def load(self, board_id):
+        """The board's Calibration, or None if it was never calibrated"""
+        try:
+            with open(self.path(board_id)) as f:
+                return Calibration.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def classifier(self, board_id, **options):
+        """Calibrated classifier for the board, or the default one if it has no calibration"""
+        calibration = self.load(board_id)
+        return calibration.classifier(**options) if calibration else SensorClassifier(**options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit and store a board calibration from recorded samples")
+    parser.add_argument("board_id")
+    parser.add_argument("samples", help="JSON lines of {placement, readings}")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="Calibration directory")
+    args = parser.parse_args()
+
+    recorder = CalibrationRecorder(args.board_id)
+    recorder.load_samples(args.samples)
+    path = CalibrationStore(args.dir).save(recorder.fit())
+    print(f"Saved calibration from {len(recorder.readings)} samples to {path}")
+
+
+if __name__ == "__main__":
+    main()
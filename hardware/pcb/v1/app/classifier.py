@@ -0,0 +1,138 @@
+import numpy as np
+
+from aggregator import EMPTY, SQUARE_INDEX
+
+# Raw readings per square, in this order along the last axis
+FIELDS = ("red", "green", "blue", "ir", "hall")
+RED, GREEN, BLUE, IR, HALL = range(len(FIELDS))
+
+# stickerDB_5mm_1mm and pieceMap from lib/StickerReader: RGB signature -> piece
+STICKERS = [
+    (EMPTY, (5, 5, 15)),
+    ("p", (33, 9, 13)),
+    ("K", (11, 30, 16)),
+    ("Q", (6, 25, 42)),
+    ("q", (25, 34, 32)),
+    ("r", (14, 40, 60)),
+    ("R", (27, 19, 39)),
+    ("B", (27, 12, 37)),
+    ("N", (33, 33, 14)),
+    ("b", (10, 10, 25)),
+    ("n", (30, 42, 71)),
+    ("P", (8, 27, 17)),
+    ("k", (29, 15, 15)),
+]
+
+# Colour evidence from the hall sensor, indexed by class
+NO_MAGNET, WHITE_MAGNET, BLACK_MAGNET = range(3)
+
+
+def _log_sigmoid(x):
+    return -np.logaddexp(0.0, -x)
+
+
+class SensorClassifier:
+    """Classifies all 64 squares of one or more frames in a single vectorized pass.
+
+    `readings` has shape (64, 5) or (frames, 64, 5) with FIELDS along the last
+    axis, squares indexed a1=0 .. h8=63. Each square gets a log-score per
+    sticker class from three independent pieces of evidence:
+
+    - RGB: weighted squared distance to the class centroid (the firmware's
+      nearest-sticker match, softened with `rgb_scale`)
+    - hall: white magnets read above `hall_high`, black below `hall_low`
+    - IR: reflectance above `ir_present` means something sits on the square
+
+    The winning class gives the piece and its normalized probability the
+    confidence. Centroids may be (classes, 3) for the whole board or
+    (64, classes, 3) per square, and every threshold a scalar or a (64,)
+    array, so calibrated boards use the same pass.
+    """
+
+    def __init__(self, pieces=None, centroids=None, hall_low=300, hall_high=500, ir_present=600,
+                 rgb_weights=(1.0, 1.0, 0.8), rgb_scale=5.0, hall_scale=25.0, ir_scale=50.0):
+        if pieces is None:
+            pieces = [piece for piece, _ in STICKERS]
+            centroids = [rgb for _, rgb in STICKERS]
+        self.pieces = np.frombuffer("".join(pieces).encode("ascii"), dtype=np.uint8)
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.hall_low = np.asarray(hall_low, dtype=np.float64)
+        self.hall_high = np.asarray(hall_high, dtype=np.float64)
+        self.ir_present = np.asarray(ir_present, dtype=np.float64)
+        self.rgb_weights = np.asarray(rgb_weights, dtype=np.float64) / (2.0 * rgb_scale ** 2)
+        self.hall_scale = hall_scale
+        self.ir_scale = ir_scale
+        empty = self.pieces == ord(EMPTY)
+        self.colour = np.where(empty, NO_MAGNET, np.where(np.char.isupper(list(pieces)), WHITE_MAGNET, BLACK_MAGNET))
+        self.empty = empty
+
+    def scores(self, readings):
+        """Unnormalized log-probabilities, shape (..., 64, classes)"""
+        readings = np.asarray(readings, dtype=np.float64)
+        rgb = readings[..., None, RED:BLUE + 1]
+        distance = ((rgb - self.centroids) ** 2 * self.rgb_weights).sum(axis=-1)
+
+        hall = readings[..., HALL]
+        log_white = _log_sigmoid((hall - self.hall_high) / self.hall_scale)
+        log_black = _log_sigmoid((self.hall_low - hall) / self.hall_scale)
+        log_none = np.log(np.clip(1.0 - np.exp(log_white) - np.exp(log_black), 1e-9, None))
+        magnet = np.stack((log_none, log_white, log_black), axis=-1)[..., self.colour]
+
+        ir = (readings[..., IR] - self.ir_present) / self.ir_scale
+        present = np.where(self.empty, _log_sigmoid(-ir)[..., None], _log_sigmoid(ir)[..., None])
+
+        return magnet + present - distance
+
+    def classify(self, readings):
+        """(placement, confidence): 64-char placement string(s) and per-square probabilities.
+
+        A single frame gives one string and a (64,) array; a batch gives a list
+        of strings and a (frames, 64) array.
+        """
+        scores = self.scores(readings)
+        best = scores.argmax(axis=-1)
+        top = np.take_along_axis(scores, best[..., None], axis=-1)[..., 0]
+        confidence = 1.0 / np.exp(scores - top[..., None]).sum(axis=-1)
+        codes = self.pieces[best]
+        if codes.ndim == 1:
+            return codes.tobytes().decode("ascii"), confidence
+        return [row.tobytes().decode("ascii") for row in codes], confidence
+
+
+class StreamClassifier:
+    """Classifies the board from raw readings as the regions report them.
+
+    The latest readings of every square are kept in one (64, 5) frame. Each
+    update() writes one region's squares and classifies the whole frame in
+    one pass, so a calibrated classifier's per-square arrays apply as they
+    are. `placement` and `confidence` hold the latest full-board result;
+    squares no region has reported yet are empty with confidence 0. Used from
+    the reader thread only.
+    """
+
+    def __init__(self, classifier=None):
+        self.classifier = classifier or SensorClassifier()
+        self.readings = np.zeros((64, len(FIELDS)))
+        self.reported = np.zeros(64, dtype=bool)
+        self.placement = EMPTY * 64
+        self.confidence = np.zeros(64)
+
+    def update(self, squares):
+        """Classify with new readings {square: [red, green, blue, ir, hall]}; returns {square: piece} for them.
+
+        Raises ValueError or TypeError, before changing anything, if a reading is not numeric.
+        """
+        rows = {}
+        for square, values in squares.items():
+            index = SQUARE_INDEX.get(square)
+            if index is not None and len(values) == len(FIELDS):
+                rows[square] = (index, np.asarray(values, dtype=np.float64))
+        if not rows:
+            return {}
+        for index, values in rows.values():
+            self.readings[index] = values
+            self.reported[index] = True
+        placement, confidence = self.classifier.classify(self.readings)
+        self.placement = "".join(piece if seen else EMPTY for piece, seen in zip(placement, self.reported))
+        self.confidence = np.where(self.reported, confidence, 0.0)
+        return {square: placement[index] for square, (index, _) in rows.items()}
@@ -1,50 +1,87 @@
 import serial
+import argparse
+import os
 import threading
-import json
 import time
+import numpy as np
+from aggregator import BoardAggregator, REGION_SQUARES, SQUARE_NAMES, mask_squares
+from calibration import CALIBRATION_POSITIONS, DEFAULT_DIR, CalibrationRecorder, CalibrationStore, placement_from_fen
+from classifier import StreamClassifier
+from region_reader import RegionReader, PROTOCOLS
 
-board_state = {}
-
-def is_json(line: str) -> bool:
-    return line.startswith("{") and line.endswith("}")
-
-def read_from_port(region, port):
-    ser = serial.Serial(port, 9600)
-    while True:
-        try:
-            line = ser.readline().decode('utf-8').strip()
-
-            if not is_json(line):
-                # print(f"[{region}][DEBUG] {line}")
-                continue
-
-            data = json.loads(line)
-            print(data)
-            if "squares" in data:
-                for square, piece in data["squares"].items():
-                    board_state[square] = piece
-        except Exception as e:
-            print(f"[{region}][ERROR] Failed to parse: {e}")
-
-def fen_from_board():
-    full_rows = []
-    for rank in range(4, 0, -1):
-        row = ''
-        empty = 0
-        for file in 'abcd':
-            sq = f"{file}{rank}"
-            piece = board_state.get(sq, '.')
-            if piece == '.':
-                empty += 1
-            else:
-                if empty > 0:
-                    row += str(empty)
-                    empty = 0
-                row += piece
-        if empty > 0:
-            row += str(empty)
-        full_rows.append(row)
-    return "/".join(full_rows)
+class FenForwarder:
+    """Writes each FEN as a line to the serial port the server's /serial/connect reads from"""
+
+    def __init__(self, port, baud_rate):
+        self.ser = serial.Serial(port, baud_rate, timeout=1) if port else None
+
+    def __call__(self, fen):
+        print("Current FEN:", fen)
+        if self.ser:
+            self.ser.write(fen.encode('utf-8') + b'\n')
+
+class DiffForwarder:
+    """Writes only the changed squares of each new board version, with periodic full keyframes.
+
+    Lines are "D <version> <turn> <castling> <ep> <halfmove> <fullmove>
+    <square><piece> ..." and "K <version> <fen>"; the server's DiffStream
+    drops diffs after a gap in versions until the next keyframe.
+    """
+
+    def __init__(self, port, baud_rate, aggregator, keyframe_interval=5.0):
+        self.ser = serial.Serial(port, baud_rate, timeout=1) if port else None
+        self.aggregator = aggregator
+        self.keyframe_interval = keyframe_interval
+        self.snapshot = None
+        self.last_keyframe = None
+
+    def _write(self, line):
+        print(line)
+        if self.ser:
+            self.ser.write(line.encode('utf-8') + b'\n')
+
+    def __call__(self, fen):
+        if self.snapshot is None or self._keyframe_due():
+            self.keyframe()
+            return
+        current, mask = self.aggregator.changes_since(self.snapshot)
+        board = current.board
+        changes = " ".join(f"{SQUARE_NAMES[index]}{chr(board[index])}" for index in mask_squares(mask))
+        self._write(f"D {current.version} {fen.split(' ', 1)[1]} {changes}")
+        self.snapshot = current
+
+    def _keyframe_due(self):
+        return self.last_keyframe is None or time.monotonic() - self.last_keyframe >= self.keyframe_interval
+
+    def keyframe(self):
+        self.snapshot = self.aggregator.snapshot()
+        self.last_keyframe = time.monotonic()
+        self._write(f"K {self.snapshot.version} {self.aggregator.fen}")
+
+    def tick(self):
+        """Resend the full board once the keyframe interval has passed, even while nothing changes"""
+        if self.snapshot is not None and self._keyframe_due():
+            self.keyframe()
+
+class ProbabilityForwarder:
+    """Writes the classified board as a "P <placement> <confidence>" line after each message with readings.
+
+    The placement lists a1..h8 ('.' empty) and the confidence is two hex
+    digits per square, as the server's moveDecoder.parse_probabilities reads
+    them; squares no region has reported go out as empty with confidence 0.
+    """
+
+    def __init__(self, port, baud_rate, classifier):
+        self.ser = serial.Serial(port, baud_rate, timeout=1) if port else None
+        self.classifier = classifier
+
+    def line(self):
+        confidence = np.rint(np.clip(self.classifier.confidence, 0.0, 1.0) * 255).astype(np.uint8)
+        return f"P {self.classifier.placement} {confidence.tobytes().hex()}"
+
+    def __call__(self, region, readings):
+        if self.ser:
+            self.ser.write(self.line().encode('utf-8') + b'\n')
 
 # Map regions to ports
 ports = {
@@ -56,14 +93,161 @@ ports = {
     # 'R4': '/dev/cu.usbserial-1413',
 }
 
-# Start a thread for each serial device
-for region, port in ports.items():
-    t = threading.Thread(target=read_from_port, args=(region, port))
-    t.daemon = True
-    t.start()
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Aggregate region square updates into full-board FENs")
+    parser.add_argument(
+        "--region",
+        action="append",
+        default=[],
+        metavar="REGION=PORT",
+        help=f"Region serial port, repeatable (regions {', '.join(sorted(REGION_SQUARES))}); defaults to the prototype ports"
+    )
+    parser.add_argument(
+        "--forward",
+        default=None,
+        help="Serial port to write FEN lines to (the port the server connects to)"
+    )
+    parser.add_argument("--baud", type=int, default=115200, help="Baud rate of the forward port")
+    parser.add_argument(
+        "--diff",
+        action="store_true",
+        help="Forward only changed squares, with a full keyframe every --keyframe-interval seconds"
+    )
+    parser.add_argument("--keyframe-interval", type=float, default=5.0, help="Seconds between diff-stream keyframes")
+    parser.add_argument(
+        "--protocol",
+        choices=PROTOCOLS,
+        default="json",
+        help="Region wire format: JSON lines or binary frames (firmware built with -DBINARY_FRAMES)"
+    )
+    parser.add_argument(
+        "--calibrate",
+        metavar="BOARD_ID",
+        help="Record raw readings (regions built with -DRAW_READINGS) for known positions and fit the board's calibration"
+    )
+    parser.add_argument(
+        "--positions",
+        help="File of FENs to set up while calibrating, one per line (default: calibration.CALIBRATION_POSITIONS)"
+    )
+    parser.add_argument(
+        "--classify",
+        action="store_true",
+        help="Classify squares on the host from raw readings (regions built with -DRAW_READINGS)"
+    )
+    parser.add_argument(
+        "--board",
+        metavar="BOARD_ID",
+        help="With --classify, use the board's calibration (see --calibrate) instead of the default thresholds"
+    )
+    parser.add_argument(
+        "--probabilities",
+        action="store_true",
+        help="With --classify, forward the classified board with per-square confidence (P lines) instead of FENs"
+    )
+    parser.add_argument("--settle", type=float, default=5.0, help="Seconds to wait for fresh readings of each position")
+    parser.add_argument(
+        "--stats-interval",
+        type=float,
+        default=0,
+        help="Print per-region message rate and parse errors every N seconds (0 disables)"
+    )
+    return parser.parse_args()
+
+def calibrate(reader, recorder, fens, settle):
+    """Prompt for each position, then record the readings every reporting square sends after it is set up"""
+    stop = threading.Event()
+    thread = threading.Thread(target=reader.run, kwargs={"should_stop": stop.is_set}, daemon=True)
+    thread.start()
+    try:
+        for number, fen in enumerate(fens, start=1):
+            placement = placement_from_fen(fen)
+            input(f"[{number}/{len(fens)}] Set up {fen} and press Enter ")
+            since = time.monotonic()
+            deadline = since + settle
+            # Firmware built with -DRAW_READINGS reports every second even when nothing changes
+            while (recorder.stale(since) or not recorder.reported_since(since)) and time.monotonic() < deadline:
+                time.sleep(0.1)
+            stale = recorder.stale(since)
+            if stale:
+                print(f"No fresh readings within {settle:g} s for {', '.join(sorted(stale))}; using the last ones")
+            reported = recorder.record_latest(placement)
+            print(f"Recorded {reported}/64 squares")
+    finally:
+        stop.set()
+        thread.join(1)
+
+def stream_classifier(board_id=None, store=None):
+    """StreamClassifier with the board's calibration, or the default thresholds without one"""
+    if board_id is None:
+        return StreamClassifier()
+    calibration = (store or CalibrationStore()).load(board_id)
+    if calibration is None:
+        print(f"No calibration for {board_id}; using the default thresholds")
+        return StreamClassifier()
+    print(f"Using the calibration of {board_id} ({calibration.samples} samples)")
+    return StreamClassifier(calibration.classifier())
+
+def record_calibration(args):
+    if args.protocol != "json":
+        raise SystemExit("Raw readings come in JSON messages; calibrate with --protocol json")
+    recorder = CalibrationRecorder(args.calibrate)
+    fens = CALIBRATION_POSITIONS
+    if args.positions:
+        with open(args.positions) as f:
+            fens = [line.strip() for line in f if line.strip()]
+    reader = RegionReader(ports, BoardAggregator(), protocol="json",
+                          on_readings=lambda region, squares: recorder.update(squares))
+    try:
+        calibrate(reader, recorder, fens, args.settle)
+    except KeyboardInterrupt:
+        print("Stopped")
+    finally:
+        reader.close()
+    if not recorder.readings:
+        return
+    # The samples are kept so the calibration can be refitted (python calibration.py BOARD_ID SAMPLES)
+    os.makedirs(DEFAULT_DIR, exist_ok=True)
+    samples = os.path.join(DEFAULT_DIR, f"{args.calibrate}-samples.jsonl")
+    recorder.save_samples(samples)
+    path = CalibrationStore().save(recorder.fit())
+    print(f"Saved {len(recorder.readings)} samples to {samples} and the calibration to {path}")
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    if args.region:
+        ports = dict(item.split("=", 1) for item in args.region)
+
+    if args.calibrate:
+        record_calibration(args)
+        raise SystemExit(0)
+
+    classifier = None
+    if args.classify:
+        if args.protocol != "json":
+            raise SystemExit("Raw readings come in JSON messages; classify with --protocol json")
+        classifier = stream_classifier(args.board)
+    elif args.probabilities or args.board:
+        raise SystemExit("--probabilities and --board need --classify")
 
-# Print updated FEN every second
-while True:
-    time.sleep(1)
-    print("Current FEN:", fen_from_board())
+    # Every square change is forwarded immediately, as a full FEN or as a diff,
+    # or every classified message as a P line
+    aggregator = BoardAggregator()
+    forwarder = None
+    on_readings = None
+    if args.probabilities:
+        aggregator.on_fen = FenForwarder(None, args.baud)
+        on_readings = ProbabilityForwarder(args.forward, args.baud, classifier)
+    elif args.diff:
+        forwarder = DiffForwarder(args.forward, args.baud, aggregator, args.keyframe_interval)
+        aggregator.on_fen = forwarder
+    else:
+        aggregator.on_fen = FenForwarder(args.forward, args.baud)
 
+    # One thread multiplexes all region ports
+    reader = RegionReader(ports, aggregator, protocol=args.protocol, on_readings=on_readings, classifier=classifier)
+    try:
+        reader.run(stats_interval=args.stats_interval, on_tick=forwarder.tick if forwarder else None)
+    except KeyboardInterrupt:
+        print("Stopped")
+    finally:
+        reader.close()
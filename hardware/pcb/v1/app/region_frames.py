@@ -0,0 +1,106 @@
+import binascii
+import collections
+import struct
+
+from aggregator import EMPTY, REGION_SQUARES
+
+# Binary region frame, little-endian, 25 bytes:
+#   sync      2 bytes  0xC5 0x5C
+#   region    1 byte   ASCII region letter
+#   sequence  uint16   per-region counter, wraps at 65536
+#   squares   uint16   four 4-bit piece codes, slot 0 in the low nibble
+#   hall      4 x uint16  raw hall readings per slot
+#   ir        4 x uint16  raw IR readings per slot
+#   crc       uint16   CRC-16/CCITT-FALSE over region..ir
+# Slots follow REGION_SQUARES order: lower-left, lower-right, upper-left, upper-right.
+SYNC = b"\xc5\x5c"
+FRAME = struct.Struct("<2sBHH4H4HH")
+FRAME_SIZE = FRAME.size
+CRC_INIT = 0xFFFF
+
+PIECE_CODES = EMPTY + "PNBRQKpnbrqk"  # code -> piece; 13-15 are invalid
+CODE_OF = {piece: code for code, piece in enumerate(PIECE_CODES)}
+REGION_BYTES = {ord(region): region for region in REGION_SQUARES}
+# One byte of the squares field -> its two pieces, None if either code is invalid
+PIECE_PAIRS = [
+    (PIECE_CODES[byte & 0xF], PIECE_CODES[byte >> 4])
+    if (byte & 0xF) < len(PIECE_CODES) and (byte >> 4) < len(PIECE_CODES) else None
+    for byte in range(256)
+]
+
+Frame = collections.namedtuple("Frame", "region sequence pieces hall ir")
+
+
+def encode_frame(region, sequence, pieces, hall=(0, 0, 0, 0), ir=(0, 0, 0, 0)):
+    """Build one frame; `pieces` is four FEN letters (or '.'/'-' for empty) in slot order"""
+    codes = 0
+    for slot, piece in enumerate(pieces):
+        codes |= CODE_OF.get(piece, 0) << (slot * 4)
+    body = FRAME.pack(SYNC, ord(region), sequence & 0xFFFF, codes, *hall, *ir, 0)[2:-2]
+    return SYNC + body + struct.pack("<H", binascii.crc_hqx(body, CRC_INIT))
+
+
+def frame_squares(frame):
+    """{square: piece} update for the aggregator"""
+    return dict(zip(REGION_SQUARES[frame.region], frame.pieces))
+
+
+class FrameDecoder:
+    """Incremental decoder for a byte stream of binary frames.
+
+    feed() accepts whatever the port returned and yields every complete frame.
+    Bytes that do not start a valid frame (firmware debug text, line noise, a
+    frame with a bad CRC) are skipped one sync search at a time, so a corrupt
+    frame costs at most that frame. `errors` counts rejected sync candidates and
+    `skipped` the bytes discarded while resyncing.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.errors = 0
+        self.skipped = 0
+
+    def feed(self, data):
+        buffer = self.buffer
+        buffer += data
+        frames = []
+        start = 0
+        end = len(buffer)
+        view = memoryview(buffer)
+        try:
+            while True:
+                sync = buffer.find(SYNC, start)
+                if sync < 0:
+                    # Keep a trailing 0xC5 that may be the first half of the next sync
+                    keep = end - 1 if end > start and buffer[end - 1] == SYNC[0] else end
+                    self.skipped += keep - start
+                    start = keep
+                    break
+                self.skipped += sync - start
+                start = sync
+                if end - start < FRAME_SIZE:
+                    break
+                frame = self._decode(view, start)
+                if frame is None:
+                    self.errors += 1
+                    self.skipped += 1
+                    start += 1
+                    continue
+                frames.append(frame)
+                start += FRAME_SIZE
+        finally:
+            view.release()
+        del buffer[:start]
+        return frames
+
+    @staticmethod
+    def _decode(view, offset):
+        _, region, sequence, codes, h0, h1, h2, h3, i0, i1, i2, i3, crc = FRAME.unpack_from(view, offset)
+        region = REGION_BYTES.get(region)
+        if region is None or binascii.crc_hqx(view[offset + 2:offset + FRAME_SIZE - 2], CRC_INIT) != crc:
+            return None
+        low = PIECE_PAIRS[codes & 0xFF]
+        high = PIECE_PAIRS[codes >> 8]
+        if low is None or high is None:
+            return None
+        return Frame(region, sequence, low + high, (h0, h1, h2, h3), (i0, i1, i2, i3))
@@ -0,0 +1,177 @@
+import collections
+import itertools
+import json
+import selectors
+import time
+import serial
+from region_frames import FrameDecoder, frame_squares
+
+RATE_WINDOW = 10.0  # seconds of history used for the per-region message rate
+MAX_LINE = 4096  # bytes without a newline before a region's line buffer is dropped (noise, wrong protocol)
+PROTOCOLS = ("json", "binary")
+
+
+class RegionStream:
+    """Framing buffer and counters for one region's serial port"""
+
+    def __init__(self, region, ser, protocol="json"):
+        self.region = region
+        self.ser = ser
+        self.buffer = bytearray()
+        self.decoder = FrameDecoder() if protocol == "binary" else None
+        self.last_sequence = None  # firmware sequence number of the last binary frame
+        self.messages = 0
+        self.parse_errors = 0
+        self.dropped = 0  # binary frames missing from the firmware sequence
+        self.recent = collections.deque()  # arrival times within RATE_WINDOW
+
+    def rate(self, now=None):
+        now = time.monotonic() if now is None else now
+        while self.recent and self.recent[0] < now - RATE_WINDOW:
+            self.recent.popleft()
+        return len(self.recent) / RATE_WINDOW
+
+
+class RegionReader:
+    """Reads every region port from a single thread with a selector.
+
+    Each port is opened non-blocking and framed into lines separately, so a
+    partial line from one region never mixes with another. Square updates are
+    applied to the aggregator one message at a time, each tagged with a
+    global sequence number. Needs selectable serial file descriptors (macOS,
+    Linux).
+
+    With protocol="binary" ports carry region_frames frames instead of JSON
+    lines; gaps in each region's firmware sequence are counted as dropped.
+
+    Firmware built with -DRAW_READINGS adds each square's raw sensor readings
+    to its JSON messages; `on_readings(region, {square: [red, green, blue, ir,
+    hall]})` is called with them when set (calibration recording). With a
+    classifier.StreamClassifier as `classifier` the squares with readings
+    take the host's classification instead of the firmware's piece.
+    """
+
+    def __init__(self, ports, aggregator, baud_rate=9600, opener=serial.Serial, protocol="json", on_readings=None,
+                 classifier=None):
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"protocol must be one of {', '.join(PROTOCOLS)}")
+        self.aggregator = aggregator
+        self.on_readings = on_readings
+        self.classifier = classifier
+        self.selector = selectors.DefaultSelector()
+        self.streams = {}
+        self.sequence = itertools.count(1)
+        for region, port in ports.items():
+            ser = opener(port, baud_rate, timeout=0)
+            stream = RegionStream(region, ser, protocol)
+            self.streams[region] = stream
+            self.selector.register(ser.fileno(), selectors.EVENT_READ, stream)
+
+    def poll(self, timeout=None):
+        """Wait for readable ports and handle what arrived; returns the number of messages applied"""
+        applied = 0
+        for key, _ in self.selector.select(timeout):
+            stream = key.data
+            try:
+                chunk = stream.ser.read(stream.ser.in_waiting or 1)
+            except serial.SerialException as e:
+                print(f"[{stream.region}][ERROR] Read failed, closing port: {e}")
+                self.selector.unregister(key.fileobj)
+                stream.ser.close()
+                continue
+            if stream.decoder:
+                applied += self._handle_frames(stream, chunk)
+            else:
+                stream.buffer += chunk
+                applied += self._drain(stream)
+                if len(stream.buffer) > MAX_LINE:
+                    stream.parse_errors += 1
+                    print(f"[{stream.region}][ERROR] No newline in {len(stream.buffer)} bytes, dropping them")
+                    stream.buffer.clear()
+        return applied
+
+    def _drain(self, stream):
+        applied = 0
+        while True:
+            end = stream.buffer.find(b"\n")
+            if end < 0:
+                return applied
+            line = bytes(stream.buffer[:end]).strip()
+            del stream.buffer[:end + 1]
+            if self._handle_line(stream, line):
+                applied += 1
+
+    def _handle_frames(self, stream, chunk):
+        decoder = stream.decoder
+        errors = decoder.errors
+        frames = decoder.feed(chunk)
+        stream.parse_errors += decoder.errors - errors
+        applied = 0
+        for frame in frames:
+            if frame.region != stream.region:
+                stream.parse_errors += 1
+                print(f"[{stream.region}][ERROR] Frame from region {frame.region} on this port")
+                continue
+            if stream.last_sequence is not None:
+                stream.dropped += (frame.sequence - stream.last_sequence - 1) & 0xFFFF
+            stream.last_sequence = frame.sequence
+            stream.messages += 1
+            stream.recent.append(time.monotonic())
+            self.aggregator.apply(stream.region, frame_squares(frame), sequence=next(self.sequence))
+            applied += 1
+        return applied
+
+    def _handle_line(self, stream, line):
+        if not (line.startswith(b"{") and line.endswith(b"}")):
+            return False  # firmware debug output
+        try:
+            data = json.loads(line)
+            squares = data["squares"]
+            raw = data.get("raw")
+            if not isinstance(squares, dict):
+                raise ValueError("squares is not an object")
+            if raw is not None and not isinstance(raw, dict):
+                raise ValueError("raw is not an object")
+            classified = self.classifier.update(raw) if raw and self.classifier else {}
+        except (ValueError, KeyError, TypeError) as e:
+            stream.parse_errors += 1
+            print(f"[{stream.region}][ERROR] Failed to parse: {e}")
+            return False
+        stream.messages += 1
+        stream.recent.append(time.monotonic())
+        self.aggregator.apply(stream.region, {**squares, **classified}, sequence=next(self.sequence))
+        if raw and self.on_readings:
+            self.on_readings(stream.region, raw)
+        return True
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            region: {
+                "messages": stream.messages,
+                "rate": stream.rate(now),
+                "parse_errors": stream.parse_errors,
+                "dropped": stream.dropped,
+            }
+            for region, stream in self.streams.items()
+        }
+
+    def run(self, stats_interval=0, should_stop=lambda: False, on_tick=None):
+        """Poll until should_stop() is true, printing per-region stats every stats_interval seconds.
+
+        on_tick, if given, is called after every poll (at least every half second).
+        """
+        next_stats = time.monotonic() + stats_interval
+        while not should_stop():
+            self.poll(timeout=0.5)
+            if on_tick:
+                on_tick()
+            if stats_interval and time.monotonic() >= next_stats:
+                next_stats += stats_interval
+                for region, stats in self.stats().items():
+                    print(f"[{region}] {stats['rate']:.1f} msg/s, {stats['messages']} messages, {stats['parse_errors']} parse errors, {stats['dropped']} dropped")
+
+    def close(self):
+        for stream in self.streams.values():
+            stream.ser.close()
+        self.selector.close()
@@ -0,0 +1,149 @@
+import random
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+# Add the parent directory to sys.path to import the module
+sys.path.append(str(Path(__file__).parent))
+
+from aggregator import (BoardAggregator, REGION_SQUARES, SQUARE_INDEX, START_BOARD, changed_mask, mask_squares,
+                        normalize_piece)
+
+def fen_from_board(board_state):
+    """The original main.py placement builder, over the full board instead of the a1-d4 prototype quarter"""
+    full_rows = []
+    for rank in range(8, 0, -1):
+        row = ''
+        empty = 0
+        for file in 'abcdefgh':
+            piece = board_state.get(f"{file}{rank}", '.')
+            if piece == '.':
+                empty += 1
+            else:
+                if empty > 0:
+                    row += str(empty)
+                    empty = 0
+                row += piece
+        if empty > 0:
+            row += str(empty)
+        full_rows.append(row)
+    return "/".join(full_rows)
+
+def bits(*squares):
+    mask = 0
+    for square in squares:
+        mask |= 1 << SQUARE_INDEX[square]
+    return mask
+
+class TestBoardAggregator(unittest.TestCase):
+    def test_fen_matches_fen_from_board(self):
+        """Test that the placement of the cached FEN matches the original builder over random updates"""
+        rng = random.Random(1)
+        aggregator = BoardAggregator()
+        board_state = {}
+        for _ in range(3000):
+            region = rng.choice(sorted(REGION_SQUARES))
+            squares = {square: rng.choice(".-PNBRQKpnbrqk") for square in REGION_SQUARES[region]}
+            aggregator.apply(region, squares)
+            board_state.update({square: normalize_piece(piece) for square, piece in squares.items()})
+            self.assertEqual(aggregator.fen.split(" ")[0], fen_from_board(board_state))
+
+    def test_version_bumps_only_on_change(self):
+        """Test that each change bumps the version once and records the squares it changed"""
+        fens = []
+        aggregator = BoardAggregator(on_fen=fens.append)
+        self.assertEqual(aggregator.version, 0)
+        fen = aggregator.apply("C", {"a1": "R", "b1": "N"})
+        self.assertEqual((aggregator.version, aggregator.changed), (1, bits("a1", "b1")))
+        self.assertIs(aggregator.fen, fen)  # built once for the version
+        self.assertIsNone(aggregator.apply("C", {"a1": "R", "b1": "N"}))
+        self.assertIsNone(aggregator.apply("C", {"z9": "Q"}))
+        self.assertEqual(aggregator.version, 1)
+        aggregator.apply("C", {"b1": "-"})
+        self.assertEqual((aggregator.version, aggregator.changed), (2, bits("b1")))
+        self.assertEqual(fens, [fen, aggregator.fen])
+
+    def test_changes_since(self):
+        """Test the change bitmap between a snapshot and the current board"""
+        aggregator = BoardAggregator()
+        before = aggregator.snapshot()
+        current, mask = aggregator.changes_since(before)
+        self.assertEqual((current.version, mask), (0, 0))
+
+        aggregator.apply("A", {"a3": "P", "b3": "p"})
+        aggregator.apply("B", {"c3": "N"})
+        aggregator.apply("A", {"b3": "."})  # changed and changed back
+        current, mask = aggregator.changes_since(before)
+        self.assertEqual(current.version, 3)
+        self.assertEqual(mask, bits("a3", "c3"))
+        self.assertEqual([current.board[index] for index in mask_squares(mask)], [ord("P"), ord("N")])
+        self.assertEqual(changed_mask(before.board, current.board), mask)
+
+    def test_starting_position_state(self):
+        """Test side to move, move number and castling rights from the starting position"""
+        aggregator = BoardAggregator()
+        for region, squares in REGION_SQUARES.items():
+            aggregator.apply(region, {square: chr(START_BOARD[SQUARE_INDEX[square]]) for square in squares})
+        self.assertEqual(aggregator.fen, "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+        aggregator.apply("E", {"e2": "."})  # lifted: still white to move
+        self.assertTrue(aggregator.fen.endswith(" w KQkq - 0 1"))
+        aggregator.apply("G", {"e4": "P"})
+        aggregator.apply("O", {"e7": "."})
+        aggregator.apply("K", {"e5": "p"})
+        aggregator.apply("E", {"e1": "."})
+        aggregator.apply("E", {"e2": "K"})
+        self.assertEqual(aggregator.fen, "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPPKPPP/RNBQ1BNR b kq - 0 2")
+
+    def test_snapshot_waits_for_writer(self):
+        """Test that snapshot() retries while the seqlock counter shows a write in progress"""
+        aggregator = BoardAggregator()
+        aggregator.apply("A", {"a3": "P"})
+        aggregator._seq += 1  # a writer is mid-update
+        result = []
+        reader = threading.Thread(target=lambda: result.append(aggregator.snapshot()))
+        reader.start()
+        time.sleep(0.05)
+        self.assertEqual(result, [])
+        aggregator.board[SQUARE_INDEX["a3"]] = ord("Q")
+        aggregator.version += 1
+        aggregator._seq += 1
+        reader.join(1)
+        self.assertEqual(result[0].version, 2)
+        self.assertEqual(result[0].board[SQUARE_INDEX["a3"]], ord("Q"))
+
+    def test_snapshot_consistent_under_concurrent_writer(self):
+        """Test that snapshots taken while another thread writes never mix two versions"""
+        aggregator = BoardAggregator()
+        region = REGION_SQUARES["A"]
+        boards = {"P": {square: "P" for square in region}, "p": {square: "p" for square in region}}
+        stop = threading.Event()
+
+        def write():
+            piece = "P"
+            while not stop.is_set():
+                aggregator.apply("A", boards[piece])
+                piece = "p" if piece == "P" else "P"
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            versions = []
+            deadline = time.monotonic() + 0.5
+            while time.monotonic() < deadline:
+                snapshot = aggregator.snapshot()
+                pieces = {snapshot.board[SQUARE_INDEX[square]] for square in region}
+                self.assertEqual(len(pieces), 1, snapshot.board)
+                if snapshot.version:
+                    # Odd versions hold the white pawns, even ones the black pawns
+                    self.assertEqual(pieces.pop(), ord("P" if snapshot.version % 2 else "p"))
+                versions.append(snapshot.version)
+        finally:
+            stop.set()
+            writer.join(1)
+        self.assertEqual(versions, sorted(versions))
+        self.assertGreater(versions[-1], 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+# Add the parent directory to sys.path to import the module
+sys.path.append(str(Path(__file__).parent))
+
+from aggregator import BoardAggregator, REGION_SQUARES, SQUARE_INDEX
+from calibration import CALIBRATION_POSITIONS, CalibrationRecorder, CalibrationStore, placement_from_fen
+from classifier import HALL, IR, STICKERS, SensorClassifier
+from region_reader import RegionReader
+from test_region_reader import PipePort
+
+RGB = dict(STICKERS)
+PIECES = [piece for piece, _ in STICKERS]
+START = "RNBQKBNR" + "P" * 8 + "." * 32 + "p" * 8 + "rnbqkbnr"
+
+class SkewedBoard:
+    """Readings with a fixed RGB gain and hall/IR offset per square, plus noise"""
+
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.gain = self.rng.uniform(0.7, 1.3, (64, 3))
+        self.hall_offset = self.rng.normal(0, 60, 64)
+        self.ir_offset = self.rng.normal(0, 120, 64)
+
+    def read(self, placement):
+        readings = np.empty((64, 5))
+        for square, piece in enumerate(placement):
+            readings[square, :3] = np.array(RGB[piece]) * self.gain[square]
+            readings[square, IR] = (300 if piece == "." else 800) + self.ir_offset[square]
+            readings[square, HALL] = (400 if piece == "." else 620 if piece.isupper() else 180) + self.hall_offset[square]
+        readings += self.rng.normal(0, 1, readings.shape)
+        return readings
+
+    def random_placement(self):
+        return "".join(self.rng.choice(PIECES, 64))
+
+class TestCalibration(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = CalibrationStore(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_placement_from_fen(self):
+        """Test FEN placements in a1..h8 order and rejected placements"""
+        self.assertEqual(placement_from_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"), START)
+        self.assertEqual(len({placement_from_fen(fen) for fen in CALIBRATION_POSITIONS}), len(CALIBRATION_POSITIONS))
+        for fen in ("8/8/8", "9/8/8/8/8/8/8/8", "8/8/8/8/8/8/8/7x"):
+            with self.assertRaises(ValueError):
+                placement_from_fen(fen)
+
+    def test_fit_improves_skewed_board(self):
+        """Test that a calibration fitted from known positions reads a skewed board better than the defaults"""
+        board = SkewedBoard()
+        recorder = CalibrationRecorder("skewed")
+        for _ in range(20):
+            placement = board.random_placement()
+            recorder.record(board.read(placement), placement)
+        calibration = recorder.fit()
+        self.assertEqual(calibration.centroids.shape, (64, len(PIECES), 3))
+        self.assertEqual(calibration.samples, 20)
+
+        truth = [board.random_placement() for _ in range(50)]
+        readings = np.stack([board.read(placement) for placement in truth])
+
+        def accuracy(classifier):
+            placements, _ = classifier.classify(readings)
+            return np.mean([a == b for placement, expected in zip(placements, truth) for a, b in zip(placement, expected)])
+        fixed, calibrated = accuracy(SensorClassifier()), accuracy(calibration.classifier())
+        self.assertGreater(calibrated, 0.97)
+        self.assertGreater(calibrated, fixed + 0.02)
+        # Thresholds move with each square's hall offset
+        self.assertGreater(np.corrcoef(calibration.hall_high, board.hall_offset)[0, 1], 0.9)
+
+    def test_unreported_squares_keep_defaults(self):
+        """Test that squares without readings are left out of the fit and get the default thresholds"""
+        board = SkewedBoard()
+        recorder = CalibrationRecorder("partial")
+        for fen in CALIBRATION_POSITIONS:
+            placement = placement_from_fen(fen)
+            readings = board.read(placement)
+            readings[32:] = np.nan  # only ranks 1-4 are connected
+            recorder.record(readings, placement)
+        calibration = recorder.fit()
+        defaults = SensorClassifier()
+        for values in (calibration.centroids, calibration.hall_low, calibration.hall_high, calibration.ir_present):
+            self.assertFalse(np.isnan(values).any())
+        self.assertTrue(np.allclose(calibration.hall_low[32:], defaults.hall_low))
+        self.assertTrue(np.allclose(calibration.hall_high[32:], defaults.hall_high))
+        self.assertFalse(np.allclose(calibration.hall_high[:32], defaults.hall_high))
+        blank = CalibrationRecorder("blank")
+        blank.record(np.full((64, 5), np.nan), START)
+        with self.assertRaises(ValueError):
+            blank.fit()
+
+    def test_store_round_trip(self):
+        """Test that a saved calibration loads per board and unknown boards fall back to the defaults"""
+        board = SkewedBoard()
+        recorder = CalibrationRecorder("board-1")
+        for fen in CALIBRATION_POSITIONS:
+            placement = placement_from_fen(fen)
+            recorder.record(board.read(placement), placement)
+        calibration = recorder.fit()
+        path = self.store.save(calibration)
+        self.assertEqual(path, os.path.join(self.temp_dir.name, "board-1.json"))
+
+        loaded = self.store.load("board-1")
+        self.assertEqual(loaded.pieces, calibration.pieces)
+        self.assertEqual(loaded.samples, len(CALIBRATION_POSITIONS))
+        np.testing.assert_allclose(loaded.centroids, calibration.centroids, atol=1e-3)
+        np.testing.assert_allclose(loaded.hall_high, calibration.hall_high, atol=1e-3)
+        readings = board.read(START)
+        self.assertEqual(self.store.classifier("board-1").classify(readings)[0],
+                         calibration.classifier().classify(readings)[0])
+
+        self.assertIsNone(self.store.load("board-2"))
+        self.assertEqual(self.store.classifier("board-2").hall_high, SensorClassifier().hall_high)
+        for board_id in ("../board-1", "a b", ""):
+            with self.assertRaises(ValueError):
+                self.store.path(board_id)
+            with self.assertRaises(ValueError):
+                CalibrationRecorder(board_id)
+
+    def test_samples_round_trip(self):
+        """Test that samples with unreported squares are written as null and read back as NaN"""
+        recorder = CalibrationRecorder("samples")
+        readings = SkewedBoard().read(START)
+        readings[5] = np.nan
+        recorder.record(readings, START)
+        path = os.path.join(self.temp_dir.name, "samples.jsonl")
+        recorder.save_samples(path)
+        with open(path) as f:
+            self.assertIsNone(json.loads(f.readline())["readings"][5])
+        loaded = CalibrationRecorder("samples")
+        loaded.load_samples(path)
+        self.assertEqual(loaded.placements, [START])
+        np.testing.assert_allclose(loaded.readings[0], readings)
+
+    def test_latest_readings(self):
+        """Test that streamed readings are kept per square and recorded as the current sample"""
+        recorder = CalibrationRecorder("stream")
+        recorder.update({"a1": [1, 2, 3, 4, 5], "b1": [6, 7, 8, 9, 10], "z9": [0] * 5, "c1": [1, 2]}, at=1.0)
+        recorder.update({"a1": [11, 12, 13, 14, 15]}, at=2.0)
+        self.assertEqual(recorder.stale(1.5), ["b1"])
+        self.assertEqual(recorder.reported_since(1.5), 1)
+        self.assertEqual(recorder.record_latest(START), 2)
+        np.testing.assert_array_equal(recorder.readings[0][SQUARE_INDEX["a1"]], [11, 12, 13, 14, 15])
+        self.assertTrue(np.isnan(recorder.readings[0][SQUARE_INDEX["c1"]]).all())
+
+    def test_stream_classifier_uses_calibration(self):
+        """Test that main's classify mode reads a calibrated board better than the defaults"""
+        import main
+
+        board = SkewedBoard()
+        recorder = CalibrationRecorder("board-1")
+        for _ in range(20):
+            placement = board.random_placement()
+            recorder.record(board.read(placement), placement)
+        self.store.save(recorder.fit())
+        truth = [board.random_placement() for _ in range(20)]
+
+        def accuracy(board_id):
+            with redirect_stdout(io.StringIO()):
+                stream = main.stream_classifier(board_id, self.store)
+            correct = 0
+            for placement in truth:
+                readings = board.read(placement)
+                # Region by region, as the reader hands them over
+                for squares in REGION_SQUARES.values():
+                    stream.update({square: readings[SQUARE_INDEX[square]].tolist() for square in squares})
+                correct += sum(a == b for a, b in zip(stream.placement, placement))
+            return correct / (64 * len(truth))
+        fixed, calibrated = accuracy("board-2"), accuracy("board-1")  # board-2 has no calibration
+        self.assertGreater(calibrated, 0.97)
+        self.assertGreater(calibrated, fixed + 0.02)
+
+@unittest.skipIf(sys.platform == "win32", "the selector needs selectable pipes")
+class TestRecordMode(unittest.TestCase):
+    def test_calibrate_records_each_position(self):
+        """Test main.calibrate recording streamed raw readings for each prompted position"""
+        import main
+
+        board = SkewedBoard()
+        recorder = CalibrationRecorder("record")
+        reader = RegionReader({"C": "/dev/C", "D": "/dev/D"}, BoardAggregator(), opener=PipePort,
+                              on_readings=lambda region, squares: recorder.update(squares))
+        fens = CALIBRATION_POSITIONS[:2]
+
+        def report(placement):
+            # The regions report a moment after the position is confirmed
+            readings = board.read(placement)
+            for region, stream in reader.streams.items():
+                squares = REGION_SQUARES[region]
+                message = {
+                    "region": region,
+                    "squares": {square: placement[SQUARE_INDEX[square]] for square in squares},
+                    "raw": {square: readings[SQUARE_INDEX[square]].tolist() for square in squares},
+                }
+                stream.ser.feed(json.dumps(message).encode() + b"\n")
+
+        prompts = iter(placement_from_fen(fen) for fen in fens)
+
+        def confirm(prompt):
+            threading.Timer(0.05, report, args=(next(prompts),)).start()
+            return ""
+
+        try:
+            with patch("builtins.input", confirm), redirect_stdout(io.StringIO()) as output:
+                main.calibrate(reader, recorder, fens, settle=2)
+        finally:
+            reader.close()
+        self.assertIn("Recorded 8/64 squares", output.getvalue())
+        self.assertEqual(recorder.placements, [placement_from_fen(fen) for fen in fens])
+        second = recorder.readings[1]
+        self.assertEqual(int((~np.isnan(second).any(axis=-1)).sum()), 8)
+        # d1 holds the white queen in the second position
+        self.assertAlmostEqual(second[SQUARE_INDEX["d1"], HALL], 620 + board.hall_offset[SQUARE_INDEX["d1"]], delta=5)
+
+if __name__ == "__main__":
+    unittest.main()
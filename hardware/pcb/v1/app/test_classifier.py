@@ -0,0 +1,94 @@
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+# Add the parent directory to sys.path to import the module
+sys.path.append(str(Path(__file__).parent))
+
+from classifier import HALL, IR, STICKERS, SensorClassifier, StreamClassifier
+
+RGB = dict(STICKERS)
+SQUARES = [file + rank for rank in "12345678" for file in "abcdefgh"]
+PLACEMENT = "RNBQKBNR" + "P" * 8 + "." * 32 + "p" * 8 + "rnbqkbnr"
+
+def readings_for(placement):
+    """Clean readings: sticker RGB, IR well above/below presence, hall by magnet colour"""
+    readings = np.empty((64, 5))
+    for square, piece in enumerate(placement):
+        readings[square, :3] = RGB[piece]
+        readings[square, IR] = 300 if piece == "." else 800
+        readings[square, HALL] = 400 if piece == "." else 620 if piece.isupper() else 180
+    return readings
+
+class TestSensorClassifier(unittest.TestCase):
+    def setUp(self):
+        self.classifier = SensorClassifier()
+
+    def test_single_frame(self):
+        """Test that clean readings give the placement with high confidence on every square"""
+        placement, confidence = self.classifier.classify(readings_for(PLACEMENT))
+        self.assertEqual(placement, PLACEMENT)
+        self.assertEqual(confidence.shape, (64,))
+        self.assertTrue(np.all((confidence > 0.5) & (confidence <= 1.0)), confidence)
+        # Empty squares are far from every sticker; P and K stickers are close, so their squares are less sure
+        self.assertTrue(np.all(confidence[16:48] > 0.99))
+        self.assertLess(confidence[4], confidence[1])
+
+    def test_fused_evidence(self):
+        """Test that the hall magnet decides a square whose RGB sits halfway between two stickers"""
+        readings = readings_for(PLACEMENT)
+        e4 = 28  # between the white knight and black queen stickers, piece present
+        readings[e4, :3] = (np.array(RGB["N"]) + np.array(RGB["q"])) / 2
+        readings[e4, IR] = 800
+        for hall, piece in ((620, "N"), (180, "q")):
+            readings[e4, HALL] = hall
+            placement, confidence = self.classifier.classify(readings)
+            self.assertEqual(placement[e4], piece)
+            self.assertGreater(confidence[e4], 0.99)
+        # With no magnet either way the square is a coin flip between the two
+        readings[e4, HALL] = 400
+        placement, confidence = self.classifier.classify(readings)
+        self.assertIn(placement[e4], "Nq")
+        self.assertAlmostEqual(confidence[e4], 0.5, delta=0.05)
+        self.assertEqual(placement[:e4] + placement[e4 + 1:], PLACEMENT[:e4] + PLACEMENT[e4 + 1:])
+
+    def test_batch_matches_single_frames(self):
+        """Test that a batch gives a list of placements and the same results as one frame at a time"""
+        frames = np.stack([readings_for(PLACEMENT), readings_for(PLACEMENT[::-1]), readings_for("." * 64)])
+        placements, confidence = self.classifier.classify(frames)
+        self.assertEqual(placements, [PLACEMENT, PLACEMENT[::-1], "." * 64])
+        self.assertEqual(confidence.shape, (3, 64))
+        # Noisy frames too, where some squares are misread
+        frames[..., :3] += np.random.default_rng(0).normal(0, 4, frames[..., :3].shape)
+        placements, confidence = self.classifier.classify(frames)
+        for frame, placement, row in zip(frames, placements, confidence):
+            single, single_confidence = self.classifier.classify(frame)
+            self.assertEqual(single, placement)
+            np.testing.assert_allclose(single_confidence, row)
+
+class TestStreamClassifier(unittest.TestCase):
+    def test_updates_classify_whole_board(self):
+        """Test that each region's readings reclassify the frame and only reported squares count"""
+        stream = StreamClassifier()
+        readings = readings_for(PLACEMENT)
+        self.assertEqual(stream.update({"a1": readings[0].tolist(), "b2": readings[9].tolist(), "z9": [0] * 5}),
+                         {"a1": "R", "b2": "P"})
+        self.assertEqual(stream.placement, "R" + "." * 8 + "P" + "." * 54)
+        self.assertGreater(stream.confidence[9], 0.5)
+        self.assertEqual(np.count_nonzero(stream.confidence), 2)
+
+        stream.update({square: readings[index].tolist() for index, square in enumerate(SQUARES)})
+        self.assertEqual(stream.placement, PLACEMENT)
+        self.assertEqual(np.count_nonzero(stream.confidence), 64)
+
+    def test_bad_readings_change_nothing(self):
+        """Test that a non-numeric reading raises before any square is written"""
+        stream = StreamClassifier()
+        with self.assertRaises(ValueError):
+            stream.update({"a1": readings_for(PLACEMENT)[0].tolist(), "a2": ["x", 1, 2, 3, 4]})
+        self.assertFalse(stream.reported.any())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import binascii
+import json
+import struct
+import sys
+import unittest
+from pathlib import Path
+
+# Add the parent directory to sys.path to import the module
+sys.path.append(str(Path(__file__).parent))
+
+from region_frames import CRC_INIT, FRAME_SIZE, SYNC, FrameDecoder, encode_frame, frame_squares
+
+class TestFrameDecoder(unittest.TestCase):
+    def test_round_trip(self):
+        """Test that an encoded frame decodes to its region, sequence, pieces and readings"""
+        data = encode_frame("B", 70000, "P.nK", hall=(1, 2, 3, 4), ir=(5, 6, 7, 1023))
+        self.assertEqual(len(data), FRAME_SIZE)
+        self.assertTrue(data.startswith(SYNC))
+        [frame] = FrameDecoder().feed(data)
+        self.assertEqual((frame.region, frame.sequence), ("B", 70000 & 0xFFFF))
+        self.assertEqual(frame.pieces, ("P", ".", "n", "K"))
+        self.assertEqual((frame.hall, frame.ir), ((1, 2, 3, 4), (5, 6, 7, 1023)))
+        self.assertEqual(frame_squares(frame), {"c3": "P", "d3": ".", "c4": "n", "d4": "K"})
+
+    def test_bad_crc_rejected(self):
+        """Test that a frame with a corrupted byte is rejected and the next frame still decodes"""
+        bad = bytearray(encode_frame("A", 1, "PPPP"))
+        bad[6] ^= 0x01
+        decoder = FrameDecoder()
+        frames = decoder.feed(bytes(bad) + encode_frame("A", 2, "...."))
+        self.assertEqual([frame.sequence for frame in frames], [2])
+        self.assertEqual(decoder.errors, 1)
+        self.assertEqual(decoder.skipped, FRAME_SIZE)
+
+    def test_invalid_region_and_codes_rejected(self):
+        """Test that frames naming an unknown region or piece code are rejected despite a valid CRC"""
+        decoder = FrameDecoder()
+        self.assertEqual(decoder.feed(encode_frame("Z", 1, "....")), [])
+        body = bytearray(encode_frame("A", 1, "...."))
+        body[5] = 0x0F  # piece code 15 in slot 0
+        body[-2:] = struct.pack("<H", binascii.crc_hqx(bytes(body[2:-2]), CRC_INIT))
+        self.assertEqual(decoder.feed(bytes(body)), [])
+        self.assertEqual(decoder.errors, 2)
+
+    def test_resync_after_garbage(self):
+        """Test that noise, a false sync and debug text before a frame are skipped"""
+        decoder = FrameDecoder()
+        garbage = b"\x00\xff" + SYNC + b"\x01\x02" + b"[DEBUG] Piece change detected\n"
+        frames = decoder.feed(garbage + encode_frame("C", 9, "rnbq"))
+        self.assertEqual([frame.pieces for frame in frames], [("r", "n", "b", "q")])
+        self.assertEqual(decoder.skipped, len(garbage))
+        self.assertEqual(decoder.buffer, bytearray())
+
+    def test_split_frames(self):
+        """Test frames fed one byte at a time, including a sync split across reads"""
+        stream = b"noise\xc5" + encode_frame("D", 1, "K...") + encode_frame("D", 2, ".K..")
+        decoder = FrameDecoder()
+        frames = []
+        for index in range(len(stream)):
+            frames += decoder.feed(stream[index:index + 1])
+        self.assertEqual([frame.sequence for frame in frames], [1, 2])
+        self.assertEqual(decoder.errors, 0)
+        self.assertEqual(decoder.skipped, len(b"noise\xc5"))
+
+    def test_json_lines_skipped(self):
+        """Test that JSON lines from a region left on the JSON protocol yield no frames and are discarded"""
+        line = json.dumps({"region": "A", "squares": {"a3": "P"}}).encode() + b"\n"
+        decoder = FrameDecoder()
+        self.assertEqual(decoder.feed(line * 3), [])
+        self.assertEqual(decoder.skipped, len(line) * 3)
+        self.assertEqual(len(decoder.buffer), 0)
+        # Binary frames that follow are read normally
+        self.assertEqual(len(decoder.feed(encode_frame("A", 1, "...."))), 1)
+
+if __name__ == "__main__":
+    unittest.main()
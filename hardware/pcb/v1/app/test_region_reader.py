@@ -0,0 +1,139 @@
+import io
+import json
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Add the parent directory to sys.path to import the module
+sys.path.append(str(Path(__file__).parent))
+
+from aggregator import BoardAggregator
+from classifier import StreamClassifier
+from region_frames import encode_frame
+from region_reader import MAX_LINE, RegionReader
+
+class PipePort:
+    """Selectable stand-in for a non-blocking serial.Serial, fed through a pipe"""
+
+    def __init__(self, port, baud_rate, timeout=None):
+        self.port = port
+        self._read, self._write = os.pipe()
+        os.set_blocking(self._read, False)
+
+    def fileno(self):
+        return self._read
+
+    @property
+    def in_waiting(self):
+        return 0  # the reader then asks for one byte; read() returns whatever is buffered
+
+    def read(self, size=1):
+        try:
+            return os.read(self._read, max(size, 65536))
+        except BlockingIOError:
+            return b""
+
+    def feed(self, data):
+        os.write(self._write, data)
+
+    def close(self):
+        for fd in (self._read, self._write):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+def json_line(region, squares):
+    return json.dumps({"region": region, "squares": squares}).encode() + b"\n"
+
+@unittest.skipIf(sys.platform == "win32", "the selector needs selectable pipes")
+class TestRegionReader(unittest.TestCase):
+    def reader(self, protocol="json", regions="AB", **options):
+        self.aggregator = BoardAggregator()
+        reader = RegionReader({region: f"/dev/{region}" for region in regions}, self.aggregator,
+                              opener=PipePort, protocol=protocol, **options)
+        self.addCleanup(reader.close)
+        return reader
+
+    def poll(self, reader):
+        with redirect_stdout(io.StringIO()):
+            return reader.poll(timeout=0.1)
+
+    def test_lines_framed_per_region(self):
+        """Test that partial lines from two regions are reassembled separately"""
+        reader = self.reader()
+        a = json_line("A", {"a3": "P"})
+        b = json_line("B", {"c3": "n"})
+        reader.streams["A"].ser.feed(a[:10])
+        reader.streams["B"].ser.feed(b[:7])
+        self.assertEqual(self.poll(reader), 0)
+        reader.streams["A"].ser.feed(a[10:])
+        reader.streams["B"].ser.feed(b[7:] + b"[DEBUG] Piece change detected\n")
+        self.assertEqual(self.poll(reader), 2)
+        self.assertEqual(self.aggregator.fen.split(" ")[0], "8/8/8/8/8/P1n5/8/8")
+        self.assertEqual(self.aggregator.sequence, 2)
+        stats = reader.stats()
+        self.assertEqual((stats["A"]["messages"], stats["B"]["messages"]), (1, 1))
+        self.assertEqual(stats["A"]["parse_errors"] + stats["B"]["parse_errors"], 0)
+
+    def test_parse_errors_counted(self):
+        """Test that malformed JSON and a missing squares object count as parse errors"""
+        reader = self.reader()
+        reader.streams["A"].ser.feed(b'{"region": "A", "squares": [1]}\n{"region": \n{"region": "A"}\n')
+        self.assertEqual(self.poll(reader), 0)
+        self.assertEqual(reader.stats()["A"]["parse_errors"], 2)
+
+    def test_unterminated_bytes_dropped(self):
+        """Test that a region sending bytes without a newline cannot grow its buffer past MAX_LINE"""
+        reader = self.reader()
+        stream = reader.streams["A"]
+        for _ in range(3):
+            stream.ser.feed(b"\xff" * (MAX_LINE // 2 + 1))
+            self.poll(reader)
+        self.assertLessEqual(len(stream.buffer), MAX_LINE)
+        self.assertGreaterEqual(stream.parse_errors, 1)
+        # Lines after the noise are read again
+        stream.ser.feed(b"\n" + json_line("A", {"a3": "P"}))
+        self.assertEqual(self.poll(reader), 1)
+
+    def test_binary_frames_count_dropped(self):
+        """Test binary frames, gaps in the firmware sequence and frames from the wrong region"""
+        reader = self.reader(protocol="binary")
+        stream = reader.streams["A"]
+        stream.ser.feed(encode_frame("A", 1, "P...") + encode_frame("A", 4, "Q...") + encode_frame("B", 5, "...."))
+        self.assertEqual(self.poll(reader), 2)
+        self.assertEqual(self.aggregator.fen.split(" ")[0], "8/8/8/8/8/Q7/8/8")
+        self.assertEqual((stream.messages, stream.dropped, stream.parse_errors), (2, 2, 1))
+
+    def test_classified_squares_replace_firmware(self):
+        """Test that squares with raw readings take the host classification and the P line carries it"""
+        import main
+
+        classifier = StreamClassifier()
+        lines = []
+        reader = self.reader(classifier=classifier,
+                             on_readings=lambda region, raw: lines.append(main.ProbabilityForwarder(None, 0, classifier).line()))
+        # The firmware calls a3 empty, but the readings are a white pawn's; b3 has no readings
+        message = {"region": "A", "squares": {"a3": "-", "b3": "n"},
+                   "raw": {"a3": [8, 27, 17, 800, 620]}}
+        reader.streams["A"].ser.feed(json.dumps(message).encode() + b"\n")
+        reader.streams["A"].ser.feed(b'{"region": "A", "squares": {}, "raw": {"a4": ["x", 0, 0, 0, 0]}}\n')
+        self.assertEqual(self.poll(reader), 1)
+        self.assertEqual(self.aggregator.fen.split(" ")[0], "8/8/8/8/8/Pn6/8/8")
+        self.assertEqual(reader.stats()["A"]["parse_errors"], 1)
+        self.assertEqual(len(lines), 1)
+        tag, placement, confidence = lines[0].split(" ")
+        self.assertEqual((tag, placement), ("P", "." * 16 + "P" + "." * 47))
+        confidence = bytes.fromhex(confidence)
+        self.assertGreater(confidence[16], 127)
+        self.assertEqual(confidence[:16] + confidence[17:], bytes(63))
+
+    def test_unknown_protocol(self):
+        """Test that an unknown protocol is rejected"""
+        with self.assertRaises(ValueError):
+            RegionReader({}, BoardAggregator(), opener=PipePort, protocol="xml")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,7 @@
 #include "StickerReader.h"
 #include "LEDUtils.h"
 #include "ArduinoJson.h"
+#include <util/crc16.h>
 
 #ifndef REGION
 #define REGION "R1"  // fallback if not provided by PlatformIO
@@ -47,6 +48,65 @@ void setSquareLabels() {
 }
 
 
+#ifdef RAW_READINGS
+// Calibration builds add each square's raw readings to the JSON message and report at least
+// every RAW_REPORT_MS, so the host (app/main.py --calibrate) sees squares that did not change
+const unsigned long RAW_REPORT_MS = 1000;
+unsigned long lastReport = 0;
+
+bool reportDue() {
+  return millis() - lastReport >= RAW_REPORT_MS;
+}
+#else
+bool reportDue() {
+  return false;
+}
+#endif
+
+#ifdef BINARY_FRAMES
+// Binary region frame, see app/region_frames.py for the layout
+const char PIECE_CODES[] = ".PNBRQKpnbrqk";
+uint16_t frameSequence = 0;
+
+uint8_t pieceCode(const char* fen) {
+  const char* found = strchr(PIECE_CODES, fen[0]);
+  return (found && fen[0]) ? found - PIECE_CODES : 0;
+}
+
+// Slot within the region's 2x2 block: lower-left, lower-right, upper-left, upper-right
+uint8_t squareSlot(const char* label) {
+  return ((label[1] - '1') % 2) * 2 + (label[0] - 'a') % 2;
+}
+
+void writeFrame(const char** fens, const int* hall, const int* ir) {
+  uint8_t frame[25];
+  uint16_t codes = 0;
+  frame[0] = 0xC5;
+  frame[1] = 0x5C;
+  frame[2] = region[0];
+  frame[3] = frameSequence & 0xFF;
+  frame[4] = frameSequence >> 8;
+  frameSequence++;
+  for (int i = 0; i < 4; i++) {
+    uint8_t slot = squareSlot(squareLabels[i]);
+    codes |= (uint16_t)pieceCode(fens[i]) << (slot * 4);
+    frame[7 + slot * 2] = hall[i] & 0xFF;
+    frame[8 + slot * 2] = hall[i] >> 8;
+    frame[15 + slot * 2] = ir[i] & 0xFF;
+    frame[16 + slot * 2] = ir[i] >> 8;
+  }
+  frame[5] = codes & 0xFF;
+  frame[6] = codes >> 8;
+  uint16_t crc = 0xFFFF;
+  for (int i = 2; i < 23; i++) {
+    crc = _crc_xmodem_update(crc, frame[i]);
+  }
+  frame[23] = crc & 0xFF;
+  frame[24] = crc >> 8;
+  Serial.write(frame, sizeof(frame));
+}
+#endif
+
 const int PHOTO_PIN_A = A1;
 const int PHOTO_PIN_B = A2;
 const int PHOTO_PIN_C = A0;
@@ -131,7 +191,7 @@ void loop() {
   static int signatureA[4] = {0}, signatureB[4] = {0}, signatureC[4] = {0}, signatureD[4] = {0};
   static const char* labelA = "Empty", *labelB = "Empty", *labelC = "Empty", *labelD = "Empty";
   
-  if (anyPieceChanged) {
+  if (anyPieceChanged || reportDue()) {
     delay(500); // Debounce delay and allow piece to land
 
     Serial.println("[DEBUG] Piece change detected, updating board state...");
@@ -199,7 +259,17 @@ void loop() {
     Serial.print(fenC);
     Serial.println(fenD);
     
+#ifdef BINARY_FRAMES
+    const char* fens[4] = {fenA, fenB, fenC, fenD};
+    int hall[4] = {readerA.getHallValue(), readerB.getHallValue(), readerC.getHallValue(), readerD.getHallValue()};
+    int ir[4] = {readerA.getIRValue(), readerB.getIRValue(), readerC.getIRValue(), readerD.getIRValue()};
+    writeFrame(fens, hall, ir);
+#else
+#ifdef RAW_READINGS
+    StaticJsonDocument<512> doc;
+#else
     StaticJsonDocument<200> doc;
+#endif
     doc["region"] = region;
   
     JsonObject squares = doc.createNestedObject("squares");
@@ -207,9 +277,27 @@ void loop() {
     squares[squareLabels[1]] = fenB;
     squares[squareLabels[2]] = fenC;
     squares[squareLabels[3]] = fenD;
+
+#ifdef RAW_READINGS
+    // [red, green, blue, ir, hall] per square, read now rather than at the last placement
+    StickerReader* readers[4] = {&readerA, &readerB, &readerC, &readerD};
+    JsonObject raw = doc.createNestedObject("raw");
+    for (int i = 0; i < 4; i++) {
+      int signature[4];
+      readers[i]->readSignature(signature);
+      JsonArray values = raw.createNestedArray(squareLabels[i]);
+      values.add(signature[0]);
+      values.add(signature[1]);
+      values.add(signature[2]);
+      values.add(readers[i]->getIRValue());
+      values.add(readers[i]->getHallValue());
+    }
+    lastReport = millis();
+#endif
   
     serializeJson(doc, Serial);
     Serial.println();
+#endif
 
     // Print detailed information only for changed squares that had pieces placed
     // No need to do full info print for removed pieces
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Random access into a large multi-game PGN through PgnArchive's offset index.
+
+Writes an archive of --games games (the sample PGNs repeated with numbered
+Event tags) unless --archive points at an existing one. Then it times the
+one-off offset scan, reopening the index, and loading random game numbers,
+and reports the process's peak RSS. Run from anywhere:
+
+    python hardware/sim/bench_pgn_archive.py --games 200000
+"""
+import argparse
+import glob
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pgn_index import PgnArchive, PgnIndex
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def write_archive(path, games):
+    samples = []
+    for sample in sorted(glob.glob(os.path.join(SIM_DIR, "pgn", "*.pgn"))):
+        with open(sample, encoding="utf-8") as f:
+            samples.append(f.read().strip())
+    with open(path, "w", encoding="utf-8") as f:
+        for number in range(games):
+            text = samples[number % len(samples)]
+            f.write(text.replace('[Event "', f'[Event "#{number + 1} ', 1) + "\n\n")
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark seeking into a large PGN archive")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--archive", help="Existing PGN archive (skips generation)")
+    parser.add_argument("--loads", type=int, default=200, help="Random games to load")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = args.archive or os.path.join(temp_dir, "archive.pgn")
+        cache_dir = os.path.join(temp_dir, "index")
+        if not args.archive:
+            write_archive(path, args.games)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"archive     {size_mb:8.1f} MB   peak RSS before indexing {peak_rss_mb():.0f} MB")
+
+        started = time.perf_counter()
+        archive = PgnArchive(path, cache_dir)
+        scan = time.perf_counter() - started
+        print(f"scan        {scan:8.2f} s    {len(archive)} games, {size_mb / scan:.0f} MB/s")
+        archive.close()
+
+        started = time.perf_counter()
+        archive = PgnArchive(path, cache_dir)
+        print(f"reopen      {(time.perf_counter() - started) * 1000:8.2f} ms")
+
+        # Through PgnIndex, as the emulators load "<file>#N"
+        index = PgnIndex(os.path.dirname(path), cache_dir)
+        index.games()
+        stem = os.path.basename(path)[:-len(".pgn")]
+        rng = random.Random(args.seed)
+        numbers = [rng.randrange(1, len(archive) + 1) for _ in range(args.loads)]
+        started = time.perf_counter()
+        for number in numbers:
+            game = index.load(f"{stem}#{number}")
+            assert game["headers"]["Event"].startswith(f"#{number} ") or args.archive
+        load = (time.perf_counter() - started) / len(numbers)
+        print(f"load game   {load * 1000:8.2f} ms   (seek, parse and replay of a random game #N)")
+        print(f"peak RSS    {peak_rss_mb():8.0f} MB")
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
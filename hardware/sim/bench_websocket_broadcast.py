@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Many local spectators: replay per client vs --broadcast in pgn_websocket_emulator.
+
+Starts the emulator as a subprocess in each mode and connects --clients
+websocket clients to one game. Every client reads until the game completes.
+Reports the emulator's CPU time (from its rusage once it exits), the
+messages delivered and, for positions published after every client had
+connected, the spread between the first and last client receiving the same
+move. Run from anywhere:
+
+    python hardware/sim/bench_websocket_broadcast.py --clients 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import websockets
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+CONNECT_CONCURRENCY = 100  # stay under the listen backlog
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_server(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f"Emulator did not start on port {port}")
+
+
+async def watch(uri, gate, connected, arrivals):
+    """One spectator: (move, arrival time) for every position until the game completes"""
+    async with gate:
+        websocket = await websockets.connect(uri, max_queue=None)
+    connected.append(time.monotonic())
+    received = 0
+    async with websocket:
+        async for raw in websocket:
+            received += 1
+            message = json.loads(raw)
+            if message["type"] == "position":
+                arrivals.append((message["move"], time.monotonic()))
+    return received
+
+
+async def run_clients(port, clients, game):
+    gate = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    connected, arrivals = [], []
+    uri = f"ws://127.0.0.1:{port}/?game={game}"
+    started = time.monotonic()
+    results = await asyncio.gather(*(watch(uri, gate, connected, arrivals) for _ in range(clients)),
+                                   return_exceptions=True)
+    elapsed = time.monotonic() - started
+    return results, connected, arrivals, elapsed
+
+
+def spread(arrivals, all_connected):
+    """Per-move (last - first) arrival across clients, for moves first seen after everyone connected"""
+    by_move = {}
+    for move, at in arrivals:
+        by_move.setdefault(move, []).append(at)
+    spreads = sorted(max(times) - min(times) for times in by_move.values() if min(times) > all_connected)
+    return spreads
+
+
+def bench(mode, args):
+    port = free_port()
+    command = [sys.executable, os.path.join(SIM_DIR, "pgn_websocket_emulator.py"), "--port", str(port),
+               "--delay", str(args.delay), "--pgn-dir", args.pgn_dir, "--game", args.game]
+    if mode == "broadcast":
+        command += ["--broadcast", "--queue-size", str(args.queue_size)]
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_for_server(port))
+        results, connected, arrivals, elapsed = asyncio.run(run_clients(port, args.clients, args.game))
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait(10)
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+
+    failed = [r for r in results if isinstance(r, BaseException)]
+    delivered = sum(r for r in results if not isinstance(r, BaseException))
+    spreads = spread(arrivals, max(connected) if connected else 0)
+    line = (f"{mode:<11} {len(results) - len(failed):5d}/{args.clients} clients  {delivered:7d} messages  "
+            f"{elapsed:6.1f} s wall  emulator CPU {cpu:6.2f} s ({cpu / max(delivered, 1) * 1e6:5.1f} us/message)")
+    if spreads:
+        line += (f"  fan-out spread p50 {spreads[len(spreads) // 2] * 1000:.1f} ms "
+                 f"max {spreads[-1] * 1000:.1f} ms")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark websocket replay per client vs broadcast")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--delay", type=float, default=0.2, help="Seconds between positions")
+    parser.add_argument("--game", default="immortal")
+    parser.add_argument("--pgn-dir", default=os.path.join(SIM_DIR, "pgn"))
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--mode", choices=["per-client", "broadcast"], action="append",
+                        help="Mode to run (repeatable; default both)")
+    args = parser.parse_args()
+    for mode in args.mode or ["per-client", "broadcast"]:
+        bench(mode, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import time
 import argparse
 import sys
 from serial.tools import list_ports
+from virtual_serial import VirtualSerialPort
 
 def get_available_ports():
     """Get a list of available serial ports."""
@@ -57,6 +58,11 @@ def parse_arguments():
         action="store_true",
         help="List available serial ports and select interactively"
     )
+    parser.add_argument(
+        "--virtual",
+        action="store_true",
+        help="Create a pseudo-terminal, print its path and send once a reader (the server) opens it"
+    )
     return parser.parse_args()
 
 # Immortal Game in FEN notation (move by move)
@@ -86,6 +92,24 @@ fen_immortal_game = [
     "rnb1kb1r/pppp3p/8/4pP2/2P5/3N2p1/PP3PKP/R1BQ1q2 b kq - 4 12",  # 12. Qxg1
 ]
 
+def send_positions(ser, delay):
+    """Send the game's FEN positions over an open port (serial or virtual)"""
+    for i, fen in enumerate(fen_immortal_game):
+        print(f"Move {i + 1}: Sending FEN: {fen}")
+        ser.write(fen.encode('utf-8'))  # Send FEN as bytes
+        ser.write(b'\n')  # Newline to mark end of message
+        time.sleep(delay)  # Wait before sending next move
+    print("Game Over! All moves sent.")
+
+def send_fen_game_virtual(delay):
+    """Send the game over a new pseudo-terminal once something opens it"""
+    with VirtualSerialPort() as ser:
+        print(f"Virtual serial port: {ser.port}")
+        print("Waiting for a reader to open it...")
+        ser.wait_for_reader()
+        print(f"Reader connected to {ser.port}")
+        send_positions(ser, delay)
+
 def send_fen_game(port, baud_rate, delay):
     """
     Send FEN positions over serial connection.
@@ -98,12 +122,7 @@ def send_fen_game(port, baud_rate, delay):
     try:
         with serial.Serial(port, baud_rate, timeout=1) as ser:
             print(f"Connected to {port} at {baud_rate} baud")
-            for i, fen in enumerate(fen_immortal_game):
-                print(f"Move {i + 1}: Sending FEN: {fen}")
-                ser.write(fen.encode('utf-8'))  # Send FEN as bytes
-                ser.write(b'\n')  # Newline to mark end of message
-                time.sleep(delay)  # Wait before sending next move
-            print("Game Over! All moves sent.")
+            send_positions(ser, delay)
     except serial.SerialException as e:
         print(f"Error: Could not open serial port {port}: {e}")
         print("\nAvailable ports on your system:")
@@ -124,6 +143,13 @@ def send_fen_game(port, baud_rate, delay):
 if __name__ == "__main__":
     args = parse_arguments()
     
+    if args.virtual:
+        try:
+            send_fen_game_virtual(args.delay)
+        except KeyboardInterrupt:
+            print("\nEmulator stopped by user")
+        sys.exit(0)
+    
     if args.list:
         port = select_port_interactively()
     else:
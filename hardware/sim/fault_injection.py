@@ -0,0 +1,153 @@
+"""Seeded fault injection for the serial emulators.
+
+A FaultInjector turns each clean FEN frame into the bytes a faulty board
+would put on the wire. The faults are:
+
+- drop: the frame is lost;
+- duplicate: the frame is sent twice;
+- misread: one square reads as a different piece (or empty);
+- lift: a frame with one piece missing goes out first, as when a piece is
+  picked up and put back;
+- garbage: a line of random bytes goes out first;
+- partial: only the start of the line is sent, without its newline, so it
+  runs into the next frame;
+- burst: this frame and the next few are held back and written together.
+
+Each fault has a per-frame probability. Profiles are named sets of rates,
+and the same seed reproduces the same fault sequence.
+"""
+import collections
+import random
+
+FAULTS = ("drop", "duplicate", "misread", "lift", "garbage", "partial", "burst")
+PIECES = "PNBRQKpnbrqk"
+BURST_FRAMES = (2, 6)  # frames held back per burst (inclusive range)
+
+PROFILES = {
+    "none": {},
+    "light": {"drop": 0.01, "duplicate": 0.02, "misread": 0.01, "lift": 0.02,
+              "garbage": 0.005, "partial": 0.005, "burst": 0.01},
+    "noisy": {"drop": 0.03, "duplicate": 0.05, "misread": 0.05, "lift": 0.05,
+              "garbage": 0.02, "partial": 0.02, "burst": 0.03},
+    "hostile": {"drop": 0.08, "duplicate": 0.1, "misread": 0.15, "lift": 0.1,
+                "garbage": 0.05, "partial": 0.05, "burst": 0.08},
+}
+
+
+def parse_profile(spec):
+    """Fault rates from "noisy", "misread=0.1,drop=0.02" or both ("noisy,drop=0")"""
+    rates = {}
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, value = part.partition("=")
+        if not sep:
+            if name not in PROFILES:
+                raise ValueError(f"Unknown fault profile '{name}'. Choose from {', '.join(PROFILES)}")
+            rates.update(PROFILES[name])
+        elif name not in FAULTS:
+            raise ValueError(f"Unknown fault '{name}'. Choose from {', '.join(FAULTS)}")
+        else:
+            rate = float(value)
+            if not 0 <= rate <= 1:
+                raise ValueError(f"Fault rate for {name} must be within [0, 1]")
+            rates[name] = rate
+    return rates
+
+
+def expand_placement(board_fen):
+    """64 squares in FEN order (a8..h8, ..., a1..h1), '.' for empty"""
+    cells = []
+    for char in board_fen:
+        if char.isdigit():
+            cells.extend("." * int(char))
+        elif char != "/":
+            cells.append(char)
+    return cells
+
+
+def collapse_placement(cells):
+    ranks = []
+    for start in range(0, 64, 8):
+        rank, empty = "", 0
+        for cell in cells[start:start + 8]:
+            if cell == ".":
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            rank += cell
+        ranks.append(rank + (str(empty) if empty else ""))
+    return "/".join(ranks)
+
+
+class FaultInjector:
+    """Applies a fault profile to outgoing FEN frames; `counts` tallies the faults injected"""
+
+    def __init__(self, rates, seed=None):
+        self.rates = {name: rates.get(name, 0.0) for name in FAULTS}
+        self.rng = random.Random(seed)
+        self.counts = collections.Counter()
+        self._held = []  # payloads of a burst in progress
+        self._burst_left = 0
+
+    def _hit(self, fault):
+        rate = self.rates[fault]
+        if rate and self.rng.random() < rate:
+            self.counts[fault] += 1
+            return True
+        return False
+
+    def _edit_square(self, fen, occupied_only, replacement):
+        board_fen, sep, rest = fen.partition(" ")
+        cells = expand_placement(board_fen)
+        squares = [i for i, cell in enumerate(cells) if cell != "."] if occupied_only else range(64)
+        square = self.rng.choice(list(squares))
+        cells[square] = replacement(cells[square])
+        return collapse_placement(cells) + sep + rest
+
+    def misread(self, fen):
+        """FEN with one square read as something else"""
+        return self._edit_square(fen, False, lambda cell: self.rng.choice([s for s in "." + PIECES if s != cell]))
+
+    def lift(self, fen):
+        """FEN with one piece missing"""
+        return self._edit_square(fen, True, lambda cell: ".")
+
+    def payloads(self, fen):
+        """Byte strings to write for one frame, in order (empty while the frame is lost or held)"""
+        if self._hit("drop"):
+            return self._deliver([])
+        if self._hit("misread"):
+            fen = self.misread(fen)
+        line = (fen + "\n").encode("utf-8")
+        payloads = []
+        if self._hit("garbage"):
+            payloads.append(bytes(self.rng.randrange(256) for _ in range(self.rng.randint(1, 40))) + b"\n")
+        if self._hit("lift"):
+            payloads.append((self.lift(fen) + "\n").encode("utf-8"))
+        if self._hit("partial"):
+            payloads.append(line[:self.rng.randrange(1, len(line) - 1)])
+        else:
+            payloads.append(line)
+            if self._hit("duplicate"):
+                payloads.append(line)
+        return self._deliver(payloads)
+
+    def _deliver(self, payloads):
+        if not self._burst_left and self._hit("burst"):
+            self._burst_left = self.rng.randint(*BURST_FRAMES)
+        if self._burst_left:
+            self._held.extend(payloads)
+            self._burst_left -= 1
+            if self._burst_left:
+                return []
+            payloads, self._held = [b"".join(self._held)], []
+        return payloads
+
+    def flush(self):
+        """Whatever a burst still holds (at the end of a replay)"""
+        payloads, self._held, self._burst_left = self._held, [], 0
+        return [b"".join(payloads)] if payloads else []
+
+    def summary(self):
+        return ", ".join(f"{name} {self.counts[name]}" for name in FAULTS if self.counts[name]) or "no faults"
@@ -0,0 +1,335 @@
+"""Persistent index of a PGN directory, shared by the serial and websocket emulators.
+
+Listing games needs only each file's headers and move count, and replaying
+one needs only its FEN sequence, but both used to replay every game from the
+PGN text. PgnIndex keeps those results in <pgn_dir>/.pgn_index/:
+
+- index.json holds the headers and move count of every file, validated
+  against the file's mtime and size;
+- <game>.fen holds one position per line for each game;
+- <file>.pgn.offsets holds the byte offset of every game in the file.
+
+Files are parsed only when they are new or have changed, and only when the
+index is first used. Listing thousands of unchanged PGNs then costs one stat
+per file.
+
+A file may be a multi-game archive. Its first game is `<stem>` as usual;
+game N (1-based) is `<stem>#N` and is read with a seek to its offset. The
+offsets are memory-mapped, so memory stays flat however large the archive.
+"""
+import io
+import json
+import logging
+import mmap
+import os
+import struct
+from array import array
+
+import chess.pgn
+
+INDEX_DIR = ".pgn_index"
+INDEX_VERSION = 2
+OFFSETS_HEADER = struct.Struct("<8sqQ")  # magic, source mtime_ns, source size; native uint64 offsets follow
+OFFSETS_MAGIC = b"PGNOFF01"
+OFFSETS_CHUNK = 65536  # offsets buffered while scanning, so the scan's memory stays flat too
+BOM = b"\xef\xbb\xbf"
+
+logger = logging.getLogger('chess-pgn-index')
+
+
+def game_positions(game):
+    """FEN of the start position and after every mainline move"""
+    board = game.board()
+    positions = [board.fen()]
+    for move in game.mainline_moves():
+        board.push(move)
+        positions.append(board.fen())
+    return positions
+
+
+def split_game_id(game_id):
+    """("archive", 12) for "archive#12", ("game", None) for "game" """
+    stem, sep, number = game_id.rpartition("#")
+    if sep and number.isdigit() and int(number) > 0:
+        return stem, int(number)
+    return game_id, None
+
+
+def scan_offsets(f):
+    """Byte offset of each game in a binary PGN stream, read line by line.
+
+    A game starts at the first tag pair after movetext (or at the start of
+    the file), or at movetext when the file starts without tag pairs.
+    """
+    offset = 0
+    in_tags = False
+    seen_game = False
+    for line in f:
+        content = line[len(BOM):] if offset == 0 and line.startswith(BOM) else line
+        if content.startswith(b"["):
+            if not in_tags:
+                yield offset
+                in_tags = seen_game = True
+        elif content.strip() and not content.startswith(b"%"):
+            if not seen_game:
+                yield offset
+                seen_game = True
+            in_tags = False
+        offset += len(line)
+
+
+class PgnArchive:
+    """Random access to the games of a PGN file of any size through a persistent byte-offset index.
+
+    The offsets file is rebuilt (one streaming pass) when missing or when the
+    PGN's mtime or size changed, then memory-mapped. When it cannot be written,
+    the offsets are kept in memory instead.
+    """
+
+    def __init__(self, path, cache_dir=None):
+        self.path = path
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(path), INDEX_DIR)
+        self.offsets_path = os.path.join(self.cache_dir, os.path.basename(path) + ".offsets")
+        self._mmap = None
+        stat = os.stat(path)
+        self.offsets = self._open(stat)
+        if self.offsets is None:
+            self.offsets = self._build(stat)
+
+    def _open(self, stat):
+        try:
+            with open(self.offsets_path, "rb") as f:
+                header = f.read(OFFSETS_HEADER.size)
+                if header != OFFSETS_HEADER.pack(OFFSETS_MAGIC, stat.st_mtime_ns, stat.st_size):
+                    return None
+                if os.fstat(f.fileno()).st_size == OFFSETS_HEADER.size:
+                    return array("Q")
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # A truncated or corrupt file leaves a partial offset, which the cast rejects
+            return memoryview(self._mmap)[OFFSETS_HEADER.size:].cast("Q")
+        except (OSError, ValueError, TypeError):
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            return None
+
+    def _build(self, stat):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temporary = f"{self.offsets_path}.{os.getpid()}.tmp"
+            with open(self.path, "rb") as source, open(temporary, "wb") as f:
+                f.write(OFFSETS_HEADER.pack(OFFSETS_MAGIC, stat.st_mtime_ns, stat.st_size))
+                chunk = array("Q")
+                for offset in scan_offsets(source):
+                    chunk.append(offset)
+                    if len(chunk) == OFFSETS_CHUNK:
+                        chunk.tofile(f)
+                        del chunk[:]
+                chunk.tofile(f)
+            os.replace(temporary, self.offsets_path)
+        except OSError as e:
+            logger.debug(f"Could not write PGN offsets {self.offsets_path}: {e}")
+            with open(self.path, "rb") as source:
+                return array("Q", scan_offsets(source))
+        offsets = self._open(stat)
+        return array("Q") if offsets is None else offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _open_at(self, index):
+        raw = open(self.path, "rb")
+        raw.seek(self.offsets[index])
+        return io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+
+    def read_game(self, index):
+        """Game `index` (0-based), parsed from its offset"""
+        with self._open_at(index) as f:
+            return chess.pgn.read_game(f)
+
+    def headers(self, index):
+        with self._open_at(index) as f:
+            return chess.pgn.read_headers(f)
+
+    def iter_headers(self, start=0):
+        """Headers of games start, start + 1, ... streamed from one handle"""
+        if start >= len(self):
+            return
+        with self._open_at(start) as f:
+            while True:
+                headers = chess.pgn.read_headers(f)
+                if headers is None:
+                    return
+                yield headers
+
+    def close(self):
+        if self._mmap is not None:
+            self.offsets.release()
+            self._mmap.close()
+            self._mmap = None
+
+
+class PgnIndex:
+    """Headers, move counts and FEN sequences of the *.pgn files in a directory (archives by game number)"""
+
+    def __init__(self, pgn_dir, cache_dir=None):
+        self.pgn_dir = pgn_dir
+        self.cache_dir = cache_dir or os.path.join(pgn_dir, INDEX_DIR)
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.entries = self._read_index()
+        self.positions = {}  # game id -> FEN list, for games loaded or indexed in this process
+        self.archives = {}  # stem -> PgnArchive, for multi-game files read in this process
+        self.dirty = False
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+            return {}
+        return data.get("games", {})
+
+    def path(self, game_id):
+        return os.path.join(self.pgn_dir, game_id + ".pgn")
+
+    def _positions_path(self, game_id):
+        return os.path.join(self.cache_dir, game_id + ".fen")
+
+    def games(self):
+        """{stem: {"headers", "moves_count", "games", ...}} per file, indexing new or changed files.
+
+        "headers" and "moves_count" describe the file's first game; "games"
+        is how many games the file holds.
+        """
+        seen = set()
+        with os.scandir(self.pgn_dir) as listing:
+            for dir_entry in listing:
+                if not dir_entry.name.endswith(".pgn") or not dir_entry.is_file():
+                    continue
+                game_id = dir_entry.name[:-len(".pgn")]
+                seen.add(game_id)
+                if self._stale(game_id, dir_entry.stat()):
+                    self._index_file(game_id, dir_entry.stat())
+        for game_id in set(self.entries) - seen:
+            del self.entries[game_id]
+            self.positions.pop(game_id, None)
+            self._close_archive(game_id)
+            self._remove(self._positions_path(game_id))
+            self._remove(os.path.join(self.cache_dir, game_id + ".pgn.offsets"))
+            self.dirty = True
+        self.save()
+        return self.entries
+
+    def game_ids(self):
+        """Every game id from the last games() listing: "<stem>", or "<stem>#1".."<stem>#N" for archives"""
+        for stem in sorted(self.entries):
+            count = self.entries[stem]["games"]
+            if count > 1:
+                for number in range(1, count + 1):
+                    yield f"{stem}#{number}"
+            else:
+                yield stem
+
+    def has_game(self, game_id):
+        """Whether game_id names a file (or a game within an archive) from the last games() listing"""
+        stem, number = split_game_id(game_id)
+        if stem not in self.entries:
+            return False
+        return number is None or number <= self.entries[stem]["games"]
+
+    def load(self, game_id):
+        """{"headers", "positions"} of one game, as the emulators' load_pgn returns it"""
+        stem, number = split_game_id(game_id)
+        stat = os.stat(self.path(stem))
+        if self._stale(stem, stat):
+            self._index_file(stem, stat)
+            self.save()
+        if number is not None and number > 1:
+            game = self._archive(stem).read_game(number - 1)
+            return {"headers": dict(game.headers), "positions": game_positions(game)}
+        positions = self.positions.get(stem)
+        if positions is None:
+            try:
+                with open(self._positions_path(stem), encoding="utf-8") as f:
+                    positions = f.read().splitlines()
+            except OSError:
+                # Missing positions file (e.g. a read-only directory): parse the PGN again
+                self._index_file(stem, stat)
+                self.save()
+                positions = self.positions[stem]
+            self.positions[stem] = positions
+        return {"headers": self.entries[stem]["headers"], "positions": positions}
+
+    def _archive(self, stem):
+        if stem not in self.archives:
+            self.archives[stem] = PgnArchive(self.path(stem), self.cache_dir)
+        return self.archives[stem]
+
+    def _close_archive(self, stem):
+        archive = self.archives.pop(stem, None)
+        if archive is not None:
+            archive.close()
+
+    def _stale(self, game_id, stat):
+        entry = self.entries.get(game_id)
+        return entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size
+
+    def _index_file(self, game_id, stat):
+        headers, positions = {}, []
+        self._close_archive(game_id)
+        try:
+            with open(self.path(game_id), encoding="utf-8", errors="replace") as f:
+                game = chess.pgn.read_game(f)
+            if game is not None:
+                headers = dict(game.headers)
+                positions = game_positions(game)
+            else:
+                logger.warning(f"Could not parse PGN file: {self.path(game_id)}")
+        except Exception as e:
+            # Recorded with no positions so the file is not parsed again until it changes
+            logger.warning(f"Error indexing PGN file {self.path(game_id)}: {e}")
+        try:
+            archive = PgnArchive(self.path(game_id), self.cache_dir)
+            games = len(archive)
+            archive.close()
+        except OSError as e:
+            logger.warning(f"Error indexing games in {self.path(game_id)}: {e}")
+            games = 1
+        self.entries[game_id] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "headers": headers,
+            "moves_count": max(len(positions) - 1, 0),
+            "games": games,
+        }
+        self.positions[game_id] = positions
+        self._write(self._positions_path(game_id), "\n".join(positions) + "\n" if positions else "")
+        self.dirty = True
+
+    def save(self):
+        """Write index.json if anything changed (skipped quietly when the directory is read-only)"""
+        if not self.dirty:
+            return
+        if self._write(self.index_path, json.dumps({"version": INDEX_VERSION, "games": self.entries})):
+            self.dirty = False
+
+    def _write(self, path, text):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(temporary, path)
+            return True
+        except OSError as e:
+            logger.debug(f"Could not write PGN index file {path}: {e}")
+            return False
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -6,8 +6,18 @@ import os
 import glob
 import chess
 import chess.pgn
-import io
+import json
+import random
+import statistics
+import threading
+import itertools
+import collections
+import urllib.request
+from datetime import datetime
 from serial.tools import list_ports
+from virtual_serial import VirtualSerialPort
+from pgn_index import PgnIndex, split_game_id
+from fault_injection import FaultInjector, PROFILES, parse_profile
 
 def get_available_ports():
     """Get a list of available serial ports."""
@@ -49,11 +59,9 @@ def list_pgn_files(pgn_dir):
 def load_pgn(pgn_file):
     """Load a PGN file and return a list of FEN positions from the game."""
     try:
+        # Stream the first game rather than reading the whole (possibly multi-game) file
         with open(pgn_file, 'r') as f:
-            pgn_content = f.read()
-            
-        pgn = io.StringIO(pgn_content)
-        game = chess.pgn.read_game(pgn)
+            game = chess.pgn.read_game(f)
         
         if not game:
             print(f"Could not parse PGN file: {pgn_file}")
@@ -126,26 +134,88 @@ def parse_arguments():
     parser.add_argument(
         "--game",
         default=None,
-        help="Specific game to play from the PGN directory"
+        help="Specific game to play from the PGN directory (<file>#N for game N of a multi-game file)"
     )
     parser.add_argument(
         "--loop",
         action="store_true",
         help="Continuously loop through the game positions"
     )
+    parser.add_argument(
+        "--virtual",
+        action="store_true",
+        help="Create a pseudo-terminal, print its path and send once a reader (the server) opens it"
+    )
+    parser.add_argument(
+        "--boards",
+        type=int,
+        default=0,
+        help="Load-generation mode: replay this many games on virtual (pty) boards connected to the server"
+    )
+    parser.add_argument(
+        "--frame-rate",
+        type=float,
+        default=10,
+        help="Load mode: frames per second sent by each board"
+    )
+    parser.add_argument(
+        "--idle-frames",
+        type=int,
+        default=4,
+        help="Load mode: duplicate frames of each position before the next move"
+    )
+    parser.add_argument(
+        "--server",
+        default="http://127.0.0.1:5000",
+        help="Load mode: base URL of the ChessLink server"
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=10,
+        help="Load mode: seconds to wait for the last moves to commit"
+    )
+    parser.add_argument(
+        "--faults",
+        default=None,
+        help=f"Fault profile applied to the frames sent ({', '.join(PROFILES)}), "
+             "optionally with per-fault rates, e.g. noisy,misread=0.1"
+    )
+    parser.add_argument(
+        "--replay",
+        default=None,
+        help="Play back a server session capture (.clcap) instead of a PGN, on --port, --virtual or printed"
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1,
+        help="Replay speed: 1 keeps the captured timing, N plays N times faster, 0 as fast as possible"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed for --faults, to reproduce a run"
+    )
     return parser.parse_args()
 
+def archive_note(game_id, game_info):
+    """Listing suffix for a multi-game file"""
+    if game_info.get('games', 1) > 1:
+        return f" ({game_info['games']} games: {game_id}#1 .. {game_id}#{game_info['games']})"
+    return ""
+
 def select_game_interactively(pgn_files):
-    """Allow user to select a game from available PGN files."""
+    """Allow user to select a game from the PGN files' index entries ({game_id: {"headers", ...}})."""
     if not pgn_files:
         print("No PGN files found.")
         sys.exit(1)
     
     print("\nAvailable PGN files:")
     games = list(pgn_files.items())
-    for i, (game_id, file_path) in enumerate(games):
-        game_info = load_pgn(file_path)
-        print(f"  [{i}] {game_id}: {game_info['headers'].get('Event', 'Unknown')} - {game_info['headers'].get('White', 'Unknown')} vs {game_info['headers'].get('Black', 'Unknown')}")
+    for i, (game_id, game_info) in enumerate(games):
+        print(f"  [{i}] {game_id}: {game_info['headers'].get('Event', 'Unknown')} - {game_info['headers'].get('White', 'Unknown')} vs {game_info['headers'].get('Black', 'Unknown')}{archive_note(game_id, game_info)}")
     
     try:
         choice = int(input("\nSelect game number: "))
@@ -158,7 +228,107 @@ def select_game_interactively(pgn_files):
         print("Please enter a number.")
         return select_game_interactively(pgn_files)
 
-def send_fen_game(port, baud_rate, delay, positions, headers, verbose=False, loop=False):
+def write_frame(ser, fen, injector=None):
+    """Write one FEN frame, through the fault injector if there is one"""
+    if injector is None:
+        ser.write(fen.encode('utf-8'))  # Send FEN as bytes
+        ser.write(b'\n')  # Newline to mark end of message
+        return
+    for payload in injector.payloads(fen):
+        ser.write(payload)
+
+def stream_fen_game(ser, delay, positions, headers, verbose=False, loop=False, injector=None):
+    """
+    Send FEN positions over an open serial connection (or VirtualSerialPort).
+    
+    Args:
+        ser: Open port with write() and read_all()
+        delay: Delay in seconds between positions
+        positions: List of FEN positions to send
+        headers: Game metadata
+        verbose: Print verbose output
+        loop: Whether to loop through positions continuously
+        injector: Optional FaultInjector applied to each frame
+    """
+    print(f"Sending game: {headers.get('Event', 'Unknown')} - {headers.get('White', 'Unknown')} vs {headers.get('Black', 'Unknown')}")
+    
+    try:
+        while True:  # Loop to support replaying the game
+            for i, fen in enumerate(positions):
+                print(f"Move {i}: Sending FEN: {fen}")
+                write_frame(ser, fen, injector)
+                
+                if verbose:
+                    print(f"Data sent. Waiting for {delay} seconds...")
+                
+                try:
+                    time.sleep(delay)  # Wait before sending next move
+                except KeyboardInterrupt:
+                    print("\nTransmission interrupted by user")
+                    return
+                
+                if verbose:
+                    try:
+                        response = ser.read_all().decode('utf-8').strip()
+                        if response:
+                            print(f"Response received: {response}")
+                    except Exception as e:
+                        print(f"Error reading response: {e}")
+            
+            print("Game Over! All moves sent.")
+            if not loop:
+                break
+            print("Looping back to start...")
+    except KeyboardInterrupt:
+        print("\nTransmission interrupted by user")
+    finally:
+        if injector is not None:
+            for payload in injector.flush():
+                ser.write(payload)
+            print(f"Faults injected: {injector.summary()}")
+
+def load_capture(path):
+    """(started_at, [(seconds, raw line)]) of a session capture written by the server"""
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'server'))
+    from sessionCapture import read_capture
+    return read_capture(path)
+
+def replay_capture(ser, records, speed=1, loop=False, verbose=False):
+    """
+    Write captured raw lines with their original spacing divided by speed.
+    
+    Args:
+        ser: Open port with write(), or None to print the lines
+        records: [(seconds, raw line)] from load_capture
+        speed: 1 for real time, N for N times faster, 0 for as fast as possible
+        loop: Whether to replay the capture continuously
+        verbose: Print every line written
+    Returns the number of lines written.
+    """
+    written = 0
+    try:
+        while True:
+            started = time.monotonic()
+            for seconds, raw_line in records:
+                if speed > 0:
+                    delay = started + seconds / speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                if ser is None or verbose:
+                    print(f"{seconds:10.3f}  {raw_line!r}")
+                if ser is not None:
+                    ser.write(raw_line)
+                written += 1
+            elapsed = time.monotonic() - started
+            print(f"Replayed {len(records)} lines in {elapsed:.2f} s ({len(records) / max(elapsed, 1e-9):.0f} lines/s)")
+            if not loop:
+                break
+            print("Looping back to start...")
+    except KeyboardInterrupt:
+        print("\nReplay interrupted by user")
+    return written
+
+def send_fen_game(port, baud_rate, delay, positions, headers, verbose=False, loop=False, injector=None):
     """
     Send FEN positions over serial connection.
     
@@ -170,43 +340,13 @@ def send_fen_game(port, baud_rate, delay, positions, headers, verbose=False, loo
         headers: Game metadata
         verbose: Print verbose output
         loop: Whether to loop through positions continuously
+        injector: Optional FaultInjector applied to each frame
     """
     try:
         with serial.Serial(port, baud_rate, timeout=1) as ser:
             print(f"Connected to {port} at {baud_rate} baud")
-            print(f"Sending game: {headers.get('Event', 'Unknown')} - {headers.get('White', 'Unknown')} vs {headers.get('Black', 'Unknown')}")
-            
-            try:
-                while True:  # Loop to support replaying the game
-                    for i, fen in enumerate(positions):
-                        print(f"Move {i}: Sending FEN: {fen}")
-                        ser.write(fen.encode('utf-8'))  # Send FEN as bytes
-                        ser.write(b'\n')  # Newline to mark end of message
-                        
-                        if verbose:
-                            print(f"Data sent. Waiting for {delay} seconds...")
-                        
-                        try:
-                            time.sleep(delay)  # Wait before sending next move
-                        except KeyboardInterrupt:
-                            print("\nTransmission interrupted by user")
-                            return
-                        
-                        if verbose:
-                            try:
-                                response = ser.read_all().decode('utf-8').strip()
-                                if response:
-                                    print(f"Response received: {response}")
-                            except Exception as e:
-                                print(f"Error reading response: {e}")
-                    
-                    print("Game Over! All moves sent.")
-                    if not loop:
-                        break
-                    print("Looping back to start...")
-            except KeyboardInterrupt:
-                print("\nTransmission interrupted by user")
-                # No need to close the serial port here as the 'with' statement will handle it
+            # The 'with' statement closes the port however the stream ends
+            stream_fen_game(ser, delay, positions, headers, verbose, loop, injector)
     except serial.SerialException as e:
         print(f"Error: Could not open serial port {port}: {e}")
         print("\nAvailable ports on your system:")
@@ -221,9 +361,26 @@ def send_fen_game(port, baud_rate, delay, positions, headers, verbose=False, loo
         if ports:
             if input("\nWould you like to select a port and try again? (y/n): ").lower() == 'y':
                 port = select_port_interactively()
-                send_fen_game(port, baud_rate, delay, positions, headers, verbose, loop)
+                send_fen_game(port, baud_rate, delay, positions, headers, verbose, loop, injector)
         sys.exit(1)
 
+def send_fen_game_virtual(delay, positions, headers, verbose=False, loop=False, injector=None):
+    """
+    Send FEN positions over a new pseudo-terminal once something opens it.
+    
+    Prints the device path to connect the server to (POST /serial/connect).
+    """
+    with VirtualSerialPort() as ser:
+        print(f"Virtual serial port: {ser.port}")
+        print("Waiting for a reader to open it...")
+        try:
+            ser.wait_for_reader()
+        except KeyboardInterrupt:
+            print("\nEmulator stopped by user")
+            return
+        print(f"Reader connected to {ser.port}")
+        stream_fen_game(ser, delay, positions, headers, verbose, loop, injector)
+
 def simulate_fen_game(delay, positions, headers, verbose=False, loop=False):
     """
     Simulate sending FEN positions without a serial connection.
@@ -261,27 +418,197 @@ def simulate_fen_game(delay, positions, headers, verbose=False, loop=False):
         print("\nSimulation interrupted by user")
     
 
+def frame_schedule(positions, idle_frames):
+    """(position index, FEN) for each frame: every position followed by idle_frames duplicates"""
+    for index, fen in enumerate(positions):
+        for _ in range(idle_frames + 1):
+            yield index, fen
+
+def server_request(server, method, path, body=None):
+    """JSON request to the ChessLink server; returns the decoded response"""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(server + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=10) as response:
+        return json.loads(response.read())
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class LoadBoard:
+    """One virtual board in load mode: a VirtualSerialPort, a game on the server and its emit times"""
+
+    def __init__(self, game_id, positions, injector=None):
+        self.game_id = game_id
+        self.positions = positions
+        self.injector = injector
+        self.port = VirtualSerialPort()
+        self.emitted_at = {}  # position index -> wall time its first frame was written
+        self.frames = 0
+        self.bytes = 0
+        self.late = 0  # frames written behind schedule
+
+    def emit(self, frame_rate, idle_frames, stop):
+        interval = 1.0 / frame_rate
+        next_frame = time.monotonic()
+        for index, fen in frame_schedule(self.positions, idle_frames):
+            if stop.is_set():
+                break
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -interval:
+                self.late += 1
+            next_frame += interval
+            payloads = [(fen + '\n').encode('utf-8')] if self.injector is None else self.injector.payloads(fen)
+            self.emitted_at.setdefault(index, datetime.now())
+            for payload in payloads:
+                self.port.write(payload)
+                self.bytes += len(payload)
+            self.frames += 1
+        if self.injector is not None:
+            for payload in self.injector.flush():
+                self.port.write(payload)
+
+    def latencies(self, moves):
+        """Seconds from the first frame of each position to its committed move"""
+        result = []
+        for index, move in enumerate(moves[1:], start=1):
+            emitted = self.emitted_at.get(index)
+            if emitted and move.get('timestamp') and move.get('fen') == self.positions[index]:
+                result.append((datetime.fromisoformat(move['timestamp']) - emitted).total_seconds())
+        return result
+
+    def close(self):
+        self.port.close()
+
+def run_load(index, boards, frame_rate, idle_frames, server, baud_rate, settle, faults=None, seed=None):
+    """Replay a game per virtual board against the server and report throughput and move latency"""
+    index.games()
+    # Boards take the first games (one per file, or the games of an archive in order) and cycle
+    games = [index.load(game_id) for game_id in itertools.islice(index.game_ids(), boards)]
+    games = [game for game in games if game and game["positions"]]
+    run_id = f"{random.getrandbits(32):08x}"
+    load_boards = []
+    try:
+        for i in range(boards):
+            game = games[i % len(games)]
+            # Each board gets its own injector, seeded from --seed and the board number
+            injector = FaultInjector(faults, None if seed is None else seed + i) if faults else None
+            board = LoadBoard(f"load-{run_id}-{i}", game["positions"], injector)
+            load_boards.append(board)
+            server_request(server, 'POST', '/games', {
+                'game_id': board.game_id,
+                'event': 'Load test',
+                'white': game["headers"].get('White', 'White'),
+                'black': game["headers"].get('Black', 'Black')
+            })
+            server_request(server, 'POST', '/serial/connect', {
+                'port': board.port.port, 'game_id': board.game_id, 'baud_rate': baud_rate
+            })
+        print(f"Connected {boards} virtual boards ({len(games)} distinct games) at {frame_rate:g} frames/s each, "
+              f"{idle_frames} idle frames per move")
+
+        stop = threading.Event()
+        threads = [threading.Thread(target=board.emit, args=(frame_rate, idle_frames, stop), daemon=True)
+                   for board in load_boards]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            stop.set()
+            print("\nLoad interrupted, collecting results")
+        emitting = time.monotonic() - started
+
+        # Wait for the server to commit the last moves
+        deadline = time.monotonic() + settle
+        states = {}
+        while True:
+            for board in load_boards:
+                states[board.game_id] = server_request(server, 'GET', f'/games/{board.game_id}/state')['game']['moves']
+            done = all(len(states[board.game_id]) >= len(board.emitted_at) for board in load_boards)
+            if done or time.monotonic() >= deadline:
+                break
+            time.sleep(0.5)
+        elapsed = time.monotonic() - started
+    finally:
+        for board in load_boards:
+            try:
+                server_request(server, 'POST', '/serial/disconnect', {'game_id': board.game_id})
+            except Exception as e:
+                print(f"Could not disconnect {board.game_id}: {e}")
+            board.close()
+
+    frames = sum(board.frames for board in load_boards)
+    sent = sum(len(board.emitted_at) - 1 for board in load_boards)
+    if faults:
+        counts = sum((board.injector.counts for board in load_boards), collections.Counter())
+        print(f"Faults:  {', '.join(f'{name} {count}' for name, count in counts.items()) or 'none injected'}")
+    latencies = sorted(latency for board in load_boards for latency in board.latencies(states.get(board.game_id, [])))
+    print(f"Frames:  {frames} in {emitting:.1f} s = {frames / emitting:.0f} frames/s "
+          f"({sum(board.bytes for board in load_boards) / emitting / 1024:.1f} KiB/s, {sum(board.late for board in load_boards)} late)")
+    print(f"Moves:   {len(latencies)}/{sent} committed matching the PGN, {len(latencies) / elapsed:.1f} moves/s")
+    if latencies:
+        print(f"Latency: p50 {percentile(latencies, 0.5) * 1000:.1f} ms  p90 {percentile(latencies, 0.9) * 1000:.1f} ms  "
+              f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms  max {latencies[-1] * 1000:.1f} ms  "
+              f"mean {statistics.mean(latencies) * 1000:.1f} ms")
+    return latencies
+
 if __name__ == "__main__":
     try:
         args = parse_arguments()
+        try:
+            faults = parse_profile(args.faults) if args.faults else None
+        except ValueError as e:
+            print(f"Invalid --faults: {e}")
+            sys.exit(1)
+        injector = FaultInjector(faults, args.seed) if faults else None
+
+        # Replay a captured session byte for byte
+        if args.replay:
+            started_at, records = load_capture(args.replay)
+            duration = records[-1][0] if records else 0
+            print(f"Capture {args.replay}: {len(records)} lines over {duration:.1f} s, "
+                  f"recorded {datetime.fromtimestamp(started_at):%Y-%m-%d %H:%M:%S}")
+            if args.virtual:
+                with VirtualSerialPort() as ser:
+                    print(f"Virtual serial port: {ser.port}")
+                    print("Waiting for a reader to open it...")
+                    ser.wait_for_reader()
+                    replay_capture(ser, records, args.speed, args.loop, args.verbose)
+            elif args.port and not args.simulate:
+                with serial.Serial(args.port, args.baud, timeout=1) as ser:
+                    replay_capture(ser, records, args.speed, args.loop, args.verbose)
+            else:
+                replay_capture(None, records, args.speed, args.loop)
+            sys.exit(0)
         
         # Check if PGN directory exists
         if not os.path.isdir(args.pgn_dir):
             print(f"PGN directory does not exist: {args.pgn_dir}")
             sys.exit(1)
         
-        # Get available PGN files
-        pgn_files = list_pgn_files(args.pgn_dir)
+        # Get available PGN files from the directory's index (only new or changed files are parsed)
+        index = PgnIndex(args.pgn_dir)
+        pgn_files = index.games()
         if not pgn_files:
             print(f"No PGN files found in directory: {args.pgn_dir}")
             sys.exit(1)
         
+        # Load-generation mode replays every PGN (cycling) on virtual boards
+        if args.boards > 0:
+            run_load(index, args.boards, args.frame_rate, args.idle_frames, args.server, args.baud, args.settle,
+                     faults, args.seed)
+            sys.exit(0)
+
         # List available games if requested
         if args.list_games:
             print("Available PGN files:")
-            for game_id, file_path in pgn_files.items():
-                game_info = load_pgn(file_path)
-                print(f"  {game_id}: {game_info['headers'].get('Event', 'Unknown')} - {game_info['headers'].get('White', 'Unknown')} vs {game_info['headers'].get('Black', 'Unknown')}")
+            for game_id, game_info in pgn_files.items():
+                print(f"  {game_id}: {game_info['headers'].get('Event', 'Unknown')} - {game_info['headers'].get('White', 'Unknown')} vs {game_info['headers'].get('Black', 'Unknown')}{archive_note(game_id, game_info)}")
             sys.exit(0)
         
         # Select game
@@ -289,13 +616,13 @@ if __name__ == "__main__":
         if game_id is None:
             # If no game specified, use an interactive selection
             game_id = select_game_interactively(pgn_files)
-        elif game_id not in pgn_files:
+        elif not index.has_game(game_id):
             print(f"Game '{game_id}' not found. Available games: {', '.join(pgn_files.keys())}")
             game_id = select_game_interactively(pgn_files)
         
         # Load the game
-        pgn_file = pgn_files[game_id]
-        game_info = load_pgn(pgn_file)
+        pgn_file = index.path(split_game_id(game_id)[0])
+        game_info = index.load(game_id)
         if not game_info["positions"]:
             print(f"Could not load positions from PGN file: {pgn_file}")
             sys.exit(1)
@@ -305,6 +632,12 @@ if __name__ == "__main__":
             simulate_fen_game(args.delay, game_info["positions"], game_info["headers"], args.verbose, args.loop)
             sys.exit(0)
         
+        # Use a pseudo-terminal of our own instead of a port
+        if args.virtual:
+            send_fen_game_virtual(args.delay, game_info["positions"], game_info["headers"], args.verbose, args.loop,
+                                  injector)
+            sys.exit(0)
+        
         # Select port
         if args.list_ports:
             port = select_port_interactively()
@@ -326,7 +659,8 @@ if __name__ == "__main__":
         print(f"PGN to Serial Chess Emulator - Ready to send {game_id} on {port}")
         print(f"Press Ctrl+C to abort at any time")
         
-        send_fen_game(port, args.baud, args.delay, game_info["positions"], game_info["headers"], args.verbose, args.loop)
+        send_fen_game(port, args.baud, args.delay, game_info["positions"], game_info["headers"], args.verbose, args.loop,
+                      injector)
     except KeyboardInterrupt:
         print("\nEmulator stopped by user")
         sys.exit(0)
@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import websockets
 import logging
 import json
@@ -8,7 +9,8 @@ import os
 import glob
 import chess
 import chess.pgn
-import io
+from urllib.parse import parse_qs, urlparse
+from pgn_index import PgnIndex, split_game_id
 
 # Enable logging to see connection issues
 logging.basicConfig(
@@ -23,6 +25,9 @@ args = None
 # Cache for PGN games to avoid reloading from disk
 pgn_cache = {}
 
+# On-disk index of the PGN directory (headers, move counts, positions), created in main()
+pgn_index = None
+
 def list_pgn_files(pgn_dir):
     """List all PGN files in the given directory."""
     pgn_files = glob.glob(os.path.join(pgn_dir, "*.pgn"))
@@ -40,11 +45,9 @@ def load_pgn(pgn_file):
         return pgn_cache[pgn_file]
         
     try:
+        # Stream the first game rather than reading the whole (possibly multi-game) file
         with open(pgn_file, 'r') as f:
-            pgn_content = f.read()
-            
-        pgn = io.StringIO(pgn_content)
-        game = chess.pgn.read_game(pgn)
+            game = chess.pgn.read_game(f)
         
         if not game:
             logger.error(f"Could not parse PGN file: {pgn_file}")
@@ -74,14 +77,50 @@ def load_pgn(pgn_file):
         logger.error(f"Error loading PGN file {pgn_file}: {e}")
         return {"headers": {}, "positions": []}
 
+def request_path(websocket):
+    """Request path of a connection (websockets >= 14 keeps it on the request)"""
+    request = getattr(websocket, 'request', None)
+    if request is not None:
+        return request.path
+    return getattr(websocket, 'path', '')
+
+def requested_game(websocket, index, default_game=None):
+    """Game id from the ?game= query parameter (<file>#N within an archive), else default_game, else the first PGN"""
+    game_id = default_game if default_game and index.has_game(default_game) else sorted(index.entries)[0]
+    requested = parse_qs(urlparse(request_path(websocket)).query).get('game', [None])[0]
+    if requested and index.has_game(requested):
+        game_id = requested
+    return game_id
+
+def game_summary(game_id, entry):
+    """Entry for a game in the info message's available_games, from its PgnIndex entry"""
+    return {
+        "id": game_id,
+        "name": entry["headers"].get("Event", game_id),
+        "white": entry["headers"].get("White", "Unknown"),
+        "black": entry["headers"].get("Black", "Unknown"),
+        "result": entry["headers"].get("Result", "*"),
+        "moves_count": entry["moves_count"],
+        "games": entry["games"]
+    }
+
+def position_message(fen, move_number):
+    """Position update for a FEN, with whose move it is"""
+    return {
+        "type": "position",
+        "fen": fen,
+        "move": move_number,
+        "active_player": "w" if fen.split()[1] == "w" else "b"
+    }
+
 async def handle_client(websocket):
     """Handle a client connection to the WebSocket server."""
     try:
         # Get connection info if available
         client_ip = websocket.remote_address[0] if hasattr(websocket, 'remote_address') else "unknown"
         
-        # Default to first PGN if available
-        pgn_files = list_pgn_files(args.pgn_dir)
+        # Default to first PGN if available (the index only parses new or changed files)
+        pgn_files = pgn_index.games()
         if not pgn_files:
             await send_message_safely(websocket, {
                 "type": "error",
@@ -89,22 +128,12 @@ async def handle_client(websocket):
             })
             return
             
-        # Default to the game specified by --game parameter if provided
-        game_id = args.game if args.game in pgn_files else list(pgn_files.keys())[0]
+        # The game from the request's ?game= parameter, else the --game parameter
+        game_id = requested_game(websocket, pgn_index, args.game)
         
-        # Try to get game from request path if available (overrides the --game parameter)
-        if hasattr(websocket, 'path'):
-            # Parse query parameters to get the game ID
-            from urllib.parse import parse_qs, urlparse
-            query_params = parse_qs(urlparse(websocket.path).query)
-            requested_game = query_params.get('game', [None])[0]
-            
-            if requested_game and requested_game in pgn_files:
-                game_id = requested_game
-        
-        # Load the requested PGN file
-        pgn_file = pgn_files[game_id]
-        game_info = load_pgn(pgn_file)
+        # Load the requested game's positions
+        pgn_file = pgn_index.path(split_game_id(game_id)[0])
+        game_info = pgn_index.load(game_id)
         
         if not game_info["positions"]:
             await send_message_safely(websocket, {
@@ -114,17 +143,7 @@ async def handle_client(websocket):
             return
         
         # Get the list of available games to send to the client
-        available_games = []
-        for game_id, file_path in pgn_files.items():
-            game_data = load_pgn(file_path)
-            available_games.append({
-                "id": game_id,
-                "name": game_data["headers"].get("Event", game_id),
-                "white": game_data["headers"].get("White", "Unknown"),
-                "black": game_data["headers"].get("Black", "Unknown"),
-                "result": game_data["headers"].get("Result", "*"),
-                "moves_count": len(game_data["positions"]) - 1
-            })
+        available_games = [game_summary(other_id, entry) for other_id, entry in pgn_files.items()]
         
         logger.info(f"Client connected from {client_ip} - Streaming game: {game_id}")
         
@@ -150,16 +169,7 @@ async def handle_client(websocket):
                     logger.info("Connection closed, stopping position updates")
                     break
                     
-                # Calculate whose move it is from the FEN
-                parts = fen.split()
-                active_player = "w" if parts[1] == "w" else "b"
-                
-                message = {
-                    "type": "position",
-                    "fen": fen,
-                    "move": move_number,
-                    "active_player": active_player
-                }
+                message = position_message(fen, move_number)
                 
                 if not await send_message_safely(websocket, message):
                     connection_open = False
@@ -183,16 +193,7 @@ async def handle_client(websocket):
                             logger.info("Connection closed during loop, stopping position updates")
                             break
                         
-                        # Calculate whose move it is from the FEN
-                        parts = fen.split()
-                        active_player = "w" if parts[1] == "w" else "b"
-                        
-                        message = {
-                            "type": "position",
-                            "fen": fen,
-                            "move": move_number,
-                            "active_player": active_player
-                        }
+                        message = position_message(fen, move_number)
                         
                         if not await send_message_safely(websocket, message):
                             connection_open = False
@@ -242,6 +243,157 @@ async def send_message_safely(websocket, message):
         logger.error(f"Error sending message: {e}")
         return False
 
+def encode_message(message):
+    """JSON text of a message, encoded once and sent as is to every subscriber"""
+    return json.dumps(message)
+
+class Subscriber:
+    """A broadcast client: a bounded queue of pre-encoded messages drained by its own writer"""
+
+    def __init__(self, websocket, queue_size):
+        self.websocket = websocket
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = asyncio.Event()
+
+    def offer(self, message):
+        """Queue a message without waiting; False when the client has fallen queue_size messages behind"""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def run(self):
+        """Send queued messages until the stream ends (a None message)"""
+        while True:
+            message = await self.queue.get()
+            if message is None:
+                return
+            await self.websocket.send(message)
+
+class GameChannel:
+    """One game replayed once on a shared timer and fanned out to all of its subscribers.
+
+    Messages are encoded to UTF-8 JSON once when the channel is created and
+    sent as text frames without re-encoding per client. The replay starts
+    with the first subscriber and stops when the last one leaves; clients
+    joining mid-game get the info message and the current position first.
+    """
+
+    def __init__(self, hub, game_id, game_info):
+        self.hub = hub
+        self.game_id = game_id
+        self.info = encode_message({
+            "type": "info",
+            "message": f"Starting {game_id} game simulation",
+            "total_positions": len(game_info["positions"]),
+            "headers": game_info["headers"],
+            "available_games": hub.available_games
+        })
+        self.positions = [encode_message(position_message(fen, i)) for i, fen in enumerate(game_info["positions"])]
+        self.complete = encode_message({"type": "info", "message": "Game simulation complete"})
+        self.subscribers = set()
+        self.current = None  # index of the position last published
+        self.task = None
+
+    def subscribe(self, subscriber):
+        subscriber.offer(self.info)
+        if self.current is not None:
+            subscriber.offer(self.positions[self.current])  # catch up with the live position
+        self.subscribers.add(subscriber)
+        if self.task is None:
+            self.task = asyncio.ensure_future(self._replay())
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def _publish(self, message):
+        for subscriber in list(self.subscribers):
+            if not subscriber.offer(message):
+                self._drop(subscriber)
+
+    def _drop(self, subscriber):
+        """Disconnect a client whose queue is full instead of letting it hold up the others"""
+        self.subscribers.discard(subscriber)
+        subscriber.dropped.set()
+        self.hub.dropped += 1
+        logger.warning(f"Dropping slow client on {self.game_id} ({subscriber.queue.qsize()} messages queued)")
+
+    async def _replay(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        try:
+            while self.subscribers:
+                for index, message in enumerate(self.positions):
+                    if not self.subscribers:
+                        return
+                    self.current = index
+                    self._publish(message)
+                    self.hub.published += 1
+                    next_tick += self.hub.delay
+                    await asyncio.sleep(max(0.0, next_tick - loop.time()))
+                if not self.hub.loop:
+                    self._publish(self.complete)
+                    self._publish(None)  # ends each subscriber's writer
+                    self.subscribers.clear()
+                else:
+                    logger.info(f"Completed {self.game_id} broadcast cycle, looping back to start")
+        finally:
+            self.task = None
+            self.current = None
+
+class BroadcastHub:
+    """Shared replays for --broadcast: one GameChannel per game, the PGN directory listed once"""
+
+    def __init__(self, index, delay, loop=False, queue_size=16, default_game=None):
+        self.index = index
+        self.pgn_files = index.games()
+        self.delay = delay
+        self.loop = loop
+        self.queue_size = queue_size
+        self.default_game = default_game
+        self.available_games = [game_summary(game_id, entry) for game_id, entry in self.pgn_files.items()]
+        self.channels = {}
+        self.published = 0  # positions published, each fanned out to every subscriber
+        self.dropped = 0  # clients disconnected for falling behind
+
+    def channel(self, game_id):
+        if game_id not in self.channels:
+            self.channels[game_id] = GameChannel(self, game_id, self.index.load(game_id))
+        return self.channels[game_id]
+
+async def handle_broadcast_client(websocket, hub):
+    """Subscribe a client to its game's shared replay."""
+    client_ip = websocket.remote_address[0] if hasattr(websocket, 'remote_address') else "unknown"
+    game_id = requested_game(websocket, hub.index, hub.default_game)
+    channel = hub.channel(game_id)
+    if not channel.positions:
+        await send_message_safely(websocket, {
+            "type": "error",
+            "message": f"Could not load positions from PGN file: {hub.index.path(split_game_id(game_id)[0])}"
+        })
+        return
+    
+    subscriber = Subscriber(websocket, hub.queue_size)
+    channel.subscribe(subscriber)
+    logger.info(f"Client connected from {client_ip} - Subscribed to game: {game_id} ({len(channel.subscribers)} watching)")
+    writer = asyncio.ensure_future(subscriber.run())
+    dropped = asyncio.ensure_future(subscriber.dropped.wait())
+    try:
+        # A drop ends the writer even while it is blocked on a stalled socket
+        done, _ = await asyncio.wait([writer, dropped], return_when=asyncio.FIRST_COMPLETED)
+        if writer in done:
+            writer.result()
+        else:
+            writer.cancel()
+            await websocket.close(code=1013, reason="Client too slow")
+    except websockets.exceptions.ConnectionClosed:
+        logger.info(f"Client disconnected from {client_ip}")
+    finally:
+        writer.cancel()
+        dropped.cancel()
+        channel.unsubscribe(subscriber)
+
 def parse_args():
     parser = argparse.ArgumentParser(description="Chess PGN WebSocket Emulator")
     parser.add_argument("--port", type=int, default=8765, help="Port to run the server on")
@@ -249,12 +401,16 @@ def parse_args():
     parser.add_argument("--loop", action="store_true", help="Continuously loop through positions")
     parser.add_argument("--pgn-dir", default="hardware/sim/pgn", help="Directory containing PGN files")
     parser.add_argument("--list", action="store_true", help="List available PGN files and exit")
-    parser.add_argument("--game", default=None, help="Specific game to play from the PGN directory")
+    parser.add_argument("--game", default=None, help="Specific game to play from the PGN directory (<file>#N for game N of a multi-game file)")
+    parser.add_argument("--broadcast", action="store_true",
+                        help="Replay each game once on a shared timer for all of its clients")
+    parser.add_argument("--queue-size", type=int, default=16,
+                        help="Broadcast mode: messages queued per client before it is dropped as too slow")
     return parser.parse_args()
 
 async def main():
     """Main entry point for the WebSocket server."""
-    global args
+    global args, pgn_index
     args = parse_args()
     
     # Check if PGN directory exists
@@ -263,29 +419,36 @@ async def main():
         return
     
     # List PGN files if requested
-    pgn_files = list_pgn_files(args.pgn_dir)
+    pgn_index = PgnIndex(args.pgn_dir)
+    pgn_files = pgn_index.games()
     if not pgn_files:
         logger.error(f"No PGN files found in directory: {args.pgn_dir}")
         return
         
     if args.list:
         print("Available PGN files:")
-        for game_id, file_path in pgn_files.items():
-            game_info = load_pgn(file_path)
-            print(f"  - {game_id}: {game_info['headers'].get('Event', 'Unknown')} ({game_info['headers'].get('White', 'Unknown')} vs {game_info['headers'].get('Black', 'Unknown')})")
+        for game_id, entry in pgn_files.items():
+            print(f"  - {game_id}: {entry['headers'].get('Event', 'Unknown')} ({entry['headers'].get('White', 'Unknown')} vs {entry['headers'].get('Black', 'Unknown')})")
         return
     
     # Set the default game if specified
-    if args.game is not None and args.game in pgn_files:
+    if args.game is not None and pgn_index.has_game(args.game):
         logger.info(f"Using specified game: {args.game}")
-    elif args.game is not None and args.game not in pgn_files:
+    elif args.game is not None:
         logger.warning(f"Specified game '{args.game}' not found. Available games: {', '.join(pgn_files.keys())}")
         logger.info(f"Using first available game instead")
     
+    # One shared replay per game, or an independent replay per client
+    if args.broadcast:
+        handler = functools.partial(handle_broadcast_client,
+                                    hub=BroadcastHub(pgn_index, args.delay, args.loop, args.queue_size, args.game))
+    else:
+        handler = handle_client
+    
     # Start the WebSocket server
     try:
         server = await websockets.serve(
-            handle_client, 
+            handler, 
             "0.0.0.0", 
             args.port,
             # Allow connections from any origin
@@ -298,6 +461,7 @@ async def main():
         logger.info(f"Starting PGN WebSocket server at ws://localhost:{args.port}")
         logger.info(f"Position delay: {args.delay} seconds")
         logger.info(f"Looping: {'enabled' if args.loop else 'disabled'}")
+        logger.info(f"Mode: {'broadcast (queue ' + str(args.queue_size) + ' messages per client)' if args.broadcast else 'replay per client'}")
         logger.info(f"PGN directory: {args.pgn_dir}")
         logger.info(f"Available games: {', '.join(pgn_files.keys())}")
         
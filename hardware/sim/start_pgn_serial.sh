@@ -32,8 +32,8 @@ if ! python -c "import chess" &> /dev/null; then
   echo "Chess module installed successfully."
 fi
 
-# Default to simulation mode if no --port is specified
-if [[ "$*" != *"--port"* ]]; then
+# Default to simulation mode if no --port (or --virtual pty, or --boards load mode) is specified
+if [[ "$*" != *"--port"* && "$*" != *"--virtual"* && "$*" != *"--boards"* ]]; then
   SIMULATE="--simulate"
 else
   SIMULATE=""
@@ -0,0 +1,97 @@
+import unittest
+import sys
+from pathlib import Path
+
+import chess
+
+# Add the parent directory to sys.path to import the module
+sys.path.append(str(Path(__file__).parent))
+
+from fault_injection import FaultInjector, PROFILES, parse_profile, expand_placement, collapse_placement
+
+FEN = chess.STARTING_FEN
+LINE = (FEN + "\n").encode("utf-8")
+
+def placement_diff(fen_a, fen_b):
+    a, b = expand_placement(fen_a.split(" ")[0]), expand_placement(fen_b.split(" ")[0])
+    return [i for i in range(64) if a[i] != b[i]]
+
+class TestFaultInjection(unittest.TestCase):
+    def test_parse_profile(self):
+        """Test named profiles, per-fault overrides and invalid specs"""
+        self.assertEqual(parse_profile("none"), {})
+        self.assertEqual(parse_profile("noisy"), PROFILES["noisy"])
+        rates = parse_profile("light, drop=0.5")
+        self.assertEqual(rates["drop"], 0.5)
+        self.assertEqual(rates["misread"], PROFILES["light"]["misread"])
+        self.assertEqual(parse_profile("misread=1"), {"misread": 1.0})
+        for spec in ("unknown", "flip=0.1", "drop=2"):
+            with self.assertRaises(ValueError):
+                parse_profile(spec)
+
+    def test_placement_round_trip(self):
+        board_fen = "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR"
+        self.assertEqual(collapse_placement(expand_placement(board_fen)), board_fen)
+
+    def test_no_faults_is_clean(self):
+        injector = FaultInjector({}, seed=1)
+        self.assertEqual([injector.payloads(FEN) for _ in range(5)], [[LINE]] * 5)
+        self.assertEqual(injector.flush(), [])
+        self.assertEqual(injector.summary(), "no faults")
+
+    def test_seed_reproduces_faults(self):
+        """Test that the same seed gives the same bytes and counts"""
+        def run(seed):
+            injector = FaultInjector(PROFILES["hostile"], seed)
+            return [injector.payloads(FEN) for _ in range(200)] + [injector.flush()], injector.counts
+        self.assertEqual(run(3), run(3))
+        self.assertNotEqual(run(3)[0], run(4)[0])
+
+    def test_drop_and_duplicate(self):
+        self.assertEqual(FaultInjector({"drop": 1}, seed=1).payloads(FEN), [])
+        self.assertEqual(FaultInjector({"duplicate": 1}, seed=1).payloads(FEN), [LINE, LINE])
+
+    def test_misread_changes_one_square(self):
+        injector = FaultInjector({"misread": 1}, seed=2)
+        for _ in range(50):
+            [payload] = injector.payloads(FEN)
+            fen = payload.decode("utf-8").rstrip("\n")
+            self.assertEqual(len(placement_diff(fen, FEN)), 1)
+            self.assertEqual(fen.split(" ")[1:], FEN.split(" ")[1:])
+
+    def test_lift_precedes_real_frame(self):
+        injector = FaultInjector({"lift": 1}, seed=3)
+        lifted, real = injector.payloads(FEN)
+        self.assertEqual(real, LINE)
+        [square] = placement_diff(lifted.decode("utf-8"), FEN)
+        self.assertEqual(expand_placement(lifted.decode("utf-8").split(" ")[0])[square], ".")
+
+    def test_partial_line_merges_with_next(self):
+        injector = FaultInjector({"partial": 1}, seed=4)
+        [prefix] = injector.payloads(FEN)
+        self.assertTrue(LINE.startswith(prefix))
+        self.assertNotIn(b"\n", prefix)
+
+    def test_garbage_line(self):
+        garbage, real = FaultInjector({"garbage": 1}, seed=5).payloads(FEN)
+        self.assertTrue(garbage.endswith(b"\n"))
+        self.assertEqual(real, LINE)
+
+    def test_burst_holds_then_releases(self):
+        """Test that a burst releases the held frames in one write, and flush() empties it"""
+        injector = FaultInjector({"burst": 1}, seed=6)
+        held = 0
+        while True:
+            payloads = injector.payloads(FEN)
+            held += 1
+            if payloads:
+                break
+        self.assertEqual(payloads, [LINE * held])
+        self.assertGreaterEqual(held, 2)
+
+        injector.payloads(FEN)
+        self.assertEqual(injector.flush(), [LINE])
+        self.assertEqual(injector.flush(), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the parent directory to sys.path to import the module
+sys.path.append(str(Path(__file__).parent))
+
+from pgn_index import PgnArchive, PgnIndex, INDEX_DIR, split_game_id
+from pgn_serial_emulator import load_pgn
+
+GAME = """[Event "Test Game"]
+[White "Player 1"]
+[Black "Player 2"]
+[Result "*"]
+
+1. e4 e5 2. Nf3 Nc6 *
+"""
+
+class TestPgnIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.pgn_path = os.path.join(self.temp_dir.name, "test_game.pgn")
+        with open(self.pgn_path, "w", encoding="utf-8") as f:
+            f.write(GAME)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_index_matches_pgn(self):
+        """Test that indexed headers, move count and positions match a full PGN replay"""
+        index = PgnIndex(self.temp_dir.name)
+        games = index.games()
+        self.assertEqual(list(games), ["test_game"])
+        self.assertEqual(games["test_game"]["headers"]["White"], "Player 1")
+        self.assertEqual(games["test_game"]["moves_count"], 4)
+        self.assertEqual(index.load("test_game"), load_pgn(self.pgn_path))
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir.name, INDEX_DIR, "index.json")))
+
+    def test_unchanged_files_are_not_parsed_again(self):
+        """Test that a fresh index over an unchanged directory reuses the stored entries"""
+        PgnIndex(self.temp_dir.name).games()
+        with patch("chess.pgn.read_game") as read_game:
+            index = PgnIndex(self.temp_dir.name)
+            self.assertEqual(index.games()["test_game"]["moves_count"], 4)
+            self.assertEqual(len(index.load("test_game")["positions"]), 5)
+        read_game.assert_not_called()
+
+    def test_changed_and_deleted_files(self):
+        """Test that a modified file is indexed again and a deleted one disappears"""
+        index = PgnIndex(self.temp_dir.name)
+        index.games()
+        with open(self.pgn_path, "w", encoding="utf-8") as f:
+            f.write(GAME.replace("2. Nf3 Nc6 ", ""))
+        self.assertEqual(PgnIndex(self.temp_dir.name).games()["test_game"]["moves_count"], 2)
+        os.remove(self.pgn_path)
+        self.assertEqual(PgnIndex(self.temp_dir.name).games(), {})
+
+    def test_multi_game_archive(self):
+        """Test that games of a multi-game file are addressed as <file>#N and read by offset"""
+        with open(os.path.join(self.temp_dir.name, "archive.pgn"), "w", encoding="utf-8") as f:
+            for number in range(1, 4):
+                f.write(GAME.replace("Test Game", f"Game {number}") + "\n")
+        index = PgnIndex(self.temp_dir.name)
+        self.assertEqual(index.games()["archive"]["games"], 3)
+        self.assertEqual(list(index.game_ids()), ["archive#1", "archive#2", "archive#3", "test_game"])
+        self.assertTrue(index.has_game("archive#3"))
+        self.assertFalse(index.has_game("archive#4"))
+        game = index.load("archive#3")
+        self.assertEqual(game["headers"]["Event"], "Game 3")
+        self.assertEqual(len(game["positions"]), 5)
+        self.assertEqual(index.load("archive#1"), index.load("archive"))
+
+    def test_offsets_are_persisted(self):
+        """Test that a second archive over an unchanged file maps the stored offsets instead of scanning"""
+        path = os.path.join(self.temp_dir.name, "archive.pgn")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\ufeff" + GAME + "\n" + GAME.replace("Test Game", "Second"))
+        first = PgnArchive(path)
+        self.assertEqual(len(first), 2)
+        first.close()
+        with patch("pgn_index.scan_offsets") as scan:
+            archive = PgnArchive(path)
+            self.assertEqual(archive.headers(1)["Event"], "Second")
+            self.assertEqual([h["Event"] for h in archive.iter_headers()], ["Test Game", "Second"])
+            archive.close()
+        scan.assert_not_called()
+
+    def test_truncated_offsets_are_rebuilt(self):
+        """Test that an offsets file with a valid header but a partial offset is rebuilt"""
+        path = os.path.join(self.temp_dir.name, "archive.pgn")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(GAME + "\n" + GAME.replace("Test Game", "Second"))
+        first = PgnArchive(path)
+        first.close()
+        with open(first.offsets_path, "ab") as f:
+            f.write(b"\x01\x02\x03")
+        archive = PgnArchive(path)
+        self.assertEqual(len(archive), 2)
+        self.assertEqual(archive.headers(1)["Event"], "Second")
+        archive.close()
+        self.assertEqual(os.path.getsize(first.offsets_path) % 8, 0)
+
+    def test_split_game_id(self):
+        """Test that only a positive number after the last # selects a game"""
+        self.assertEqual(split_game_id("twic#12"), ("twic", 12))
+        self.assertEqual(split_game_id("twic"), ("twic", None))
+        self.assertEqual(split_game_id("a#b"), ("a#b", None))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -109,6 +109,26 @@ class TestPGNSerialEmulator(unittest.TestCase):
         # Make sure it tried to write a FEN position
         mock_instance.write.assert_any_call(positions[0].encode('utf-8'))
     
+    def test_frame_schedule(self):
+        """Test that each position is followed by its idle duplicate frames"""
+        from pgn_serial_emulator import frame_schedule
+        frames = list(frame_schedule(["a", "b"], idle_frames=2))
+        self.assertEqual(frames, [(0, "a"), (0, "a"), (0, "a"), (1, "b"), (1, "b"), (1, "b")])
+
+    @unittest.skipUnless(hasattr(os, "openpty"), "pseudo-terminals are POSIX only")
+    def test_stream_over_virtual_port(self):
+        """Test that a game streamed to a virtual port is read back line by line from its device"""
+        import io
+        import serial
+        from contextlib import redirect_stdout
+        from pgn_serial_emulator import stream_fen_game
+        from virtual_serial import VirtualSerialPort
+        positions = load_pgn(self.pgn_path)["positions"][:3]
+        with VirtualSerialPort() as port, serial.Serial(port.port, 115200, timeout=1) as reader:
+            with redirect_stdout(io.StringIO()):
+                stream_fen_game(port, 0, positions, {})
+            self.assertEqual([reader.readline().decode().strip() for _ in positions], positions)
+    
     @patch('serial.tools.list_ports.comports')
     def test_get_available_ports(self, mock_comports):
         # Create mock port objects
@@ -11,6 +11,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
 from pgn_websocket_emulator import list_pgn_files, load_pgn
+from pgn_index import PgnIndex
 
 class TestPGNWebSocketEmulator(unittest.TestCase):
     def setUp(self):
@@ -89,5 +90,80 @@ class TestWebSocketServer(unittest.IsolatedAsyncioTestCase):
         except (ConnectionRefusedError, asyncio.TimeoutError):
             self.skipTest("WebSocket server not running. Start it with: python pgn_websocket_emulator.py --port 8765 --delay 0.1")
 
+class TestBroadcastHub(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.temp_dir.name, "short.pgn"), "w", encoding="utf-8") as f:
+            f.write('[Event "Short"]\n\n1. e4 e5 2. Nf3 *\n')
+        self.index = PgnIndex(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    async def test_clients_share_one_replay(self):
+        """Test that every client gets the same pre-encoded stream from a single replay"""
+        import functools
+        from pgn_websocket_emulator import BroadcastHub, handle_broadcast_client
+        hub = BroadcastHub(self.index, delay=0.05)
+        server = await websockets.serve(functools.partial(handle_broadcast_client, hub=hub), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        async def watch():
+            async with websockets.connect(f"ws://127.0.0.1:{port}") as websocket:
+                return [json.loads(message) async for message in websocket]
+
+        try:
+            first, second = await asyncio.wait_for(asyncio.gather(watch(), watch()), timeout=5)
+        finally:
+            server.close()
+            await server.wait_closed()
+        for messages in (first, second):
+            self.assertEqual(messages[0]["type"], "info")
+            self.assertEqual(messages[-1]["message"], "Game simulation complete")
+        self.assertEqual([m["move"] for m in second if m["type"] == "position"][-1], 3)
+        self.assertEqual(hub.published, 4)
+
+    async def test_slow_client_is_dropped(self):
+        """Test that a client whose queue fills is dropped while the others keep receiving"""
+        from pgn_websocket_emulator import BroadcastHub, Subscriber
+        hub = BroadcastHub(self.index, delay=0.01, queue_size=2)
+        channel = hub.channel("short")
+        slow = Subscriber(None, hub.queue_size)  # never drained
+        fast = Subscriber(None, hub.queue_size)
+        channel.subscribe(slow)
+        channel.subscribe(fast)
+        received = []
+        while channel.task is not None:
+            while not fast.queue.empty():
+                received.append(fast.queue.get_nowait())
+            await asyncio.sleep(0.001)
+        while not fast.queue.empty():
+            received.append(fast.queue.get_nowait())
+        self.assertTrue(slow.dropped.is_set())
+        self.assertFalse(fast.dropped.is_set())
+        self.assertEqual(hub.dropped, 1)
+        self.assertIsNone(received[-1])
+        self.assertEqual(len([m for m in received if m and '"position"' in m]), 4)
+
+    async def test_subscriber_sends_text(self):
+        """Test that a subscriber sends each message as text with the send() every websockets version has"""
+        from pgn_websocket_emulator import Subscriber, encode_message
+
+        class LegacyWebSocket:
+            def __init__(self):
+                self.sent = []
+
+            async def send(self, message):
+                self.sent.append(message)
+
+        websocket = LegacyWebSocket()
+        subscriber = Subscriber(websocket, 4)
+        message = encode_message({"type": "info", "message": "hello"})
+        subscriber.offer(message)
+        subscriber.offer(None)
+        await asyncio.wait_for(subscriber.run(), timeout=1)
+        self.assertEqual(websocket.sent, [message])
+        self.assertIsInstance(message, str)
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+import unittest
+from pathlib import Path
+
+import serial
+
+# Add the parent directory to sys.path to import the module
+sys.path.append(str(Path(__file__).parent))
+
+from virtual_serial import VirtualSerialPort
+
+@unittest.skipUnless(hasattr(os, "openpty"), "pseudo-terminals are POSIX only")
+class TestVirtualSerialPort(unittest.TestCase):
+    def test_waits_for_reader(self):
+        """Test that the port reports a reader only while its device is open"""
+        with VirtualSerialPort() as port:
+            self.assertFalse(port.has_reader)
+            self.assertFalse(port.wait_for_reader(timeout=0.05))
+            with serial.Serial(port.port, 115200, timeout=1):
+                self.assertTrue(port.wait_for_reader(timeout=1))
+            self.assertFalse(port.has_reader)
+
+    def test_round_trip(self):
+        """Test that lines pass both ways between the emulator and the reader"""
+        with VirtualSerialPort() as port, serial.Serial(port.port, 115200, timeout=1) as reader:
+            port.write(b"8/8/8/8/8/8/8/8 w - - 0 1\n")
+            self.assertEqual(reader.readline(), b"8/8/8/8/8/8/8/8 w - - 0 1\n")
+            reader.write(b"L e3 e4\n")
+            reader.flush()
+            received = b""
+            deadline = time.monotonic() + 1
+            while not received.endswith(b"\n") and time.monotonic() < deadline:
+                received += port.read_all()
+            self.assertEqual(received, b"L e3 e4\n")
+
+    def test_close(self):
+        """Test that a closed port is no longer open"""
+        port = VirtualSerialPort()
+        port.close()
+        self.assertFalse(port.is_open)
+        port.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Pseudo-terminal serial ports for the emulators.
+
+A VirtualSerialPort is the board end of a pty pair. The emulator writes FEN
+lines to it and the server opens `port` (the slave device path) exactly like
+a USB serial port, so the whole ingest path runs on a Linux box without
+hardware or socat. Writes made before anything has opened the slave are
+lost, as with an unplugged cable; wait_for_reader() blocks until the server
+has connected.
+"""
+import os
+import select
+import time
+
+
+class VirtualSerialPort:
+    """Master side of a pty pair with the subset of the pyserial API the emulators use"""
+
+    def __init__(self):
+        import tty  # POSIX only
+        self.fd, slave = os.openpty()
+        try:
+            tty.setraw(slave)
+            self.port = os.ttyname(slave)
+        finally:
+            # The reader opens the slave by path; while nothing has it open the master reports a hangup
+            os.close(slave)
+        self._poll = select.poll()
+        self._poll.register(self.fd, select.POLLIN | select.POLLHUP)
+
+    @property
+    def is_open(self):
+        return self.fd is not None
+
+    @property
+    def has_reader(self):
+        """Whether something (the server) has the slave device open"""
+        return not any(events & select.POLLHUP for _, events in self._poll.poll(0))
+
+    def wait_for_reader(self, timeout=None, interval=0.01):
+        """Block until the slave is opened; returns False if `timeout` seconds pass first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.has_reader:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+        return True
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            written = os.write(self.fd, view)
+            view = view[written:]
+        return len(data)
+
+    def read_all(self):
+        """Whatever the reader has written back (e.g. LED guidance), without blocking"""
+        chunks = []
+        while any(events & select.POLLIN for _, events in self._poll.poll(0)):
+            try:
+                chunk = os.read(self.fd, 4096)
+            except OSError:  # EIO once the reader has closed the slave
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def close(self):
+        if self.fd is not None:
+            self._poll.unregister(self.fd)
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,132 +1,286 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, g
 from flask_cors import CORS
 import serial
 import serial.tools.list_ports
-import re
 import threading
 import time
 import uuid
 import json
 from chessClass import ChessGame
+from fenValidator import FenError
+from diffStream import DiffStream
+from moveDecoder import PROBABILITIES, parse_probabilities
+from liftTracker import guidance_line
+from jsonCodec import dumps
+from frameFilter import StabilityFilter
+from sessionCapture import SessionCapture, capture_path
+import metrics
+from profiler import PROFILER, INGEST
+from logConfig import get_logger, setup_logging
+
+setup_logging()
+serial_log = get_logger('serial')
+http_log = get_logger('http')
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Global state for serial port connection
-serial_connection = None
-serial_thread = None
-active_game = None
-stop_thread = False
+POLL_INTERVAL = 0.1  # default seconds read_serial_data waits for input before an idle cycle
+MIN_POLL_MS = 1  # a shorter wait would spin the reader thread while the board is idle
+MAX_LINE_BYTES = 4096  # a partial line longer than this is passed on as it is (and rejected)
 
-# FEN regex pattern (basic validation)
-FEN_PATTERN = re.compile(r"^[1-8pnbrqkPNBRQK/]+ [wb] [KQkq-]+ [a-h1-8-]+ \d+ \d+$")
+class BoardConnection:
+    """One connected board: its serial port, active game and ingest state"""
 
-def read_serial_data():
-    global serial_connection, active_game, stop_thread
-    
+    def __init__(self, serial_connection, game, frame_filter, poll_interval=POLL_INTERVAL):
+        self.serial_connection = serial_connection
+        self.game = game
+        self.frame_filter = frame_filter  # StabilityFilter for this board, configured on connect
+        self.diff_stream = DiffStream()  # decodes the board's FEN, keyframe and diff lines
+        self.stop_thread = False
+        self.thread = None
+        self.capture = None  # SessionCapture of the raw lines read, when connected with "capture": true
+        self.poll_interval = poll_interval  # bounds stable_ms settling and stopping; shorter costs more idle wake-ups
+
+    @property
+    def is_open(self):
+        return self.serial_connection is not None and self.serial_connection.is_open
+
+    @property
+    def port(self):
+        return self.serial_connection.port if self.is_open else None
+
+    def close_capture(self):
+        if self.capture:
+            self.capture.close()
+
+    def send_guidance(self, squares):
+        """Write a lifted piece's destinations back to the board for its LEDs"""
+        if self.is_open:
+            try:
+                self.serial_connection.write((guidance_line(squares) + '\n').encode('ascii'))
+            except serial.SerialException as e:
+                serial_log.warning("Could not send LED guidance", extra={'game_id': self.game.game_id, 'error': str(e)})
+
+# Connected boards by game id; a board that lost its port stays here until disconnected
+connections = {}
+# Ports being opened, by game id; reserved so a concurrent connect cannot take the game or port
+connecting = {}
+connections_lock = threading.Lock()
+
+def retire_connection(connection):
+    """Stop a board's reader, close its port and save its game; the caller removed it from connections"""
+    connection.stop_thread = True
+    if connection.thread and connection.thread.is_alive():
+        connection.thread.join(2.0)  # Wait up to 2 seconds
+    if connection.serial_connection:
+        connection.serial_connection.close()
+    connection.serial_connection = None
+    connection.close_capture()
+    # Process remaining items in the queue and save to database
+    game = connection.game
+    game.lift_tracker.on_guidance = None
+    game.process_queue()
+    game.save_to_db()
+
+def find_connection(game_id=None):
+    """The connection for game_id, or the only connection when game_id is None"""
+    with connections_lock:
+        if game_id is not None:
+            return connections.get(game_id)
+        if len(connections) == 1:
+            return next(iter(connections.values()))
+    return None
+
+def json_response(body, status=200):
+    """Wrap an already-serialized JSON body in a response"""
+    return app.response_class(body, status=status, mimetype='application/json')
+
+def _queue_depth():
+    with connections_lock:
+        return sum(len(connection.game.processing_queue) for connection in connections.values())
+
+def _connected_boards():
+    with connections_lock:
+        return sum(1 for connection in connections.values() if connection.is_open)
+
+metrics.queue_depth.set_function(_queue_depth)
+metrics.connected_boards.set_function(_connected_boards)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    capture = PROFILER.current(request.url_rule.rule) if request.url_rule else None
+    if capture:
+        g.profile_section = capture.start_section()
+
+@app.teardown_request
+def end_request_profile(exc):
+    section = g.pop('profile_section', None)
+    if section:
+        section.end(frames=1)
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.request_duration.observe(time.perf_counter() - started, method=request.method, route=route)
+    return response
+
+def read_serial_data(connection):
+    serial_connection = connection.serial_connection
+    active_game = connection.game
+    frame_filter = connection.frame_filter
+    diff_stream = connection.diff_stream
+    session_capture = connection.capture
     last_malformed_line_logged = None  # Keep track of the last logged malformed line (as string)
+    partial = b''  # start of a line whose newline has not arrived yet
+    if serial_connection and serial_connection.timeout != connection.poll_interval:
+        # Reads wait on the port's timeout; set once, as reconfiguring a real port costs a tcsetattr
+        serial_connection.timeout = connection.poll_interval
     
-    while not stop_thread and serial_connection and serial_connection.is_open:
-        raw_lines_read = [] # Store raw bytes read
-        data_to_process = [] # Store valid FEN strings
+    while not connection.stop_thread and serial_connection and serial_connection.is_open:
+        raw_lines_read = [] # Store raw bytes read, with the time.monotonic() each was read at
+        data_to_process = [] # Store validated ParsedFen frames
+        classified = [] # Store (placement, confidence, received_at) of classified frames for the move decoder
         read_limit_hit = False
+        # On-demand profiling of this read cycle; a dict lookup when nothing is armed
+        capture = PROFILER.current(INGEST)
+        section = capture.start_section() if capture else None
         
         try:
-            # --- Phase 1: Read all available lines as raw bytes --- 
-            if serial_connection.in_waiting > 0:
-                read_count = 0
-
-                while serial_connection.in_waiting > 0:
-                    try:
-                        # Read raw bytes, keep newline
-                        raw_line = serial_connection.readline()
-                        if not raw_line: # Break if readline returns empty (e.g., timeout)
-                            break 
-                        raw_lines_read.append(raw_line)
-                        read_count += 1
-                    except serial.SerialException as ser_e:
-                        print(f"Serial error during read: {ser_e}")
-                        # Attempt to clear buffer on serial error
-                        try: serial_connection.reset_input_buffer() 
-                        except: pass
-                        last_malformed_line_logged = None
-                        raw_lines_read = [] # Discard potentially corrupted data
-                        break # Exit inner read loop
-                    except Exception as read_e:
-                        print(f"Unexpected error during readline: {read_e}")
-                        break # Exit inner read loop
+            # --- Phase 1: Wait for input, then read everything waiting as raw lines ---
+            # read(1) blocks up to poll_interval (the port's timeout), so a frame is read as it
+            # arrives; the rest is read in one call, not byte by byte as pyserial's readline does.
+            # An error on this first read means the port is gone
+            data = serial_connection.read(1)
+            if data:
+                try:
+                    waiting = serial_connection.in_waiting
+                    if waiting:
+                        data += serial_connection.read(waiting)
+                    # Stamped per read, so stable_ms and the latency metrics are not tied to the poll cycle
+                    received_at = time.monotonic()
+                    *lines, partial = (partial + data).split(b'\n')
+                    raw_lines_read = [(line + b'\n', received_at) for line in lines]
+                    if len(partial) > MAX_LINE_BYTES:
+                        raw_lines_read.append((partial, received_at))
+                        partial = b''
+                    if session_capture:
+                        for raw_line, _ in raw_lines_read:
+                            session_capture.record(raw_line, received_at)
+                except serial.SerialException as ser_e:
+                    serial_log.error("Serial error during read", extra={'error': str(ser_e)})
+                    # Attempt to clear buffer on serial error
+                    try: serial_connection.reset_input_buffer() 
+                    except: pass
+                    last_malformed_line_logged = None
+                    raw_lines_read = [] # Discard potentially corrupted data
+                    partial = b''
 
             # --- Phase 2: Decode and Validate collected raw lines --- 
-            processed_any_line = False # Did we attempt to process anything?
             if raw_lines_read:
-                print(f"Decoding and validating {len(raw_lines_read)} lines read from serial.")
-                for raw_line in raw_lines_read:
-                    processed_any_line = True
+                if session_capture:
+                    session_capture.flush()
+                serial_log.debug("Decoding and validating lines read from serial", extra={'lines': len(raw_lines_read)})
+                for raw_line, received_at in raw_lines_read:
                     try:
                         line = raw_line.decode('utf-8', errors='replace').strip()
                         
-                        if line:  # Skip empty lines after stripping
-                            # More thorough FEN validation
-                            if FEN_PATTERN.match(line):
-                                position_part = line.split(' ')[0]
-                                rows = position_part.split('/')
-                                
-                                if len(rows) == 8:
-                                    data_to_process.append(line)
-                                    last_malformed_line_logged = None # Valid data resets the error logging
-                                else:
-                                    # Log only if it's a NEW malformed line
-                                    if line != last_malformed_line_logged:
-                                        print(f"Malformed FEN (wrong number of rows): {line}")
-                                        last_malformed_line_logged = line
-                            else:
+                        if line.startswith(PROBABILITIES + " "):
+                            # Noisy per-square readings: the move decoder debounces them itself
+                            try:
+                                classified.append(parse_probabilities(line) + (received_at,))
+                                last_malformed_line_logged = None
+                            except ValueError as prob_e:
+                                metrics.frames_malformed.inc(reason='invalid_probabilities')
+                                if line != last_malformed_line_logged:
+                                    serial_log.warning("Invalid probability frame", extra={'reason': str(prob_e), 'line': line})
+                                    last_malformed_line_logged = line
+                        elif line:  # Skip empty lines after stripping
+                            # Structural FEN validation (or a diff applied to the live placement);
+                            # the placement is reused by move inference
+                            try:
+                                was_synced = diff_stream.synced
+                                frame = diff_stream.decode(line)
+                                if frame is None:
+                                    metrics.frames_malformed.inc(reason='out_of_sync')
+                                    if was_synced:
+                                        serial_log.warning("Diff out of sequence, waiting for a keyframe", extra={'line': line})
+                                    continue
+                                frame.received_at = received_at
+                                data_to_process.append(frame)
+                                last_malformed_line_logged = None # Valid data resets the error logging
+                            except FenError as fen_e:
+                                metrics.frames_malformed.inc(reason='invalid_fen')
+                                if active_game and diff_stream.placement:
+                                    # Not a legal position (e.g. a king in the air) but still a lift to guide
+                                    active_game.track_lift(diff_stream.placement, received_at)
                                 # Log only if it's a NEW invalid line
                                 if line != last_malformed_line_logged:
-                                    print(f"Invalid FEN format: {line}")
+                                    serial_log.warning("Invalid FEN", extra={'reason': str(fen_e), 'line': line})
                                     last_malformed_line_logged = line
                         else:
                              last_malformed_line_logged = None # Treat empty lines as resetting error state
                              
                     except UnicodeDecodeError as decode_e:
+                         metrics.frames_malformed.inc(reason='decode_error')
                          # Log only if it's a NEW decode error
                          err_repr = repr(raw_line) # Get representation of failing bytes
                          if err_repr != last_malformed_line_logged:
-                            print(f"Error decoding serial data: {decode_e} - Bytes: {err_repr}")
+                            serial_log.warning("Error decoding serial data", extra={'error': str(decode_e), 'bytes': err_repr})
                             last_malformed_line_logged = err_repr
                     except Exception as proc_e:
-                        print(f"Unexpected error processing line: {proc_e}")
+                        metrics.frames_malformed.inc(reason='error')
+                        serial_log.error("Unexpected error processing line", extra={'error': str(proc_e)})
                         last_malformed_line_logged = None # Reset on unexpected error
             
-            # Reset error tracking if we processed lines and didn't end on an error
-            if processed_any_line and data_to_process and data_to_process[-1] == line:
-                 last_malformed_line_logged = None
-                 
             # --- Phase 3: Flush buffer if read limit was hit --- 
             if read_limit_hit:
-                print("Flushing input buffer after hitting read limit.")
+                serial_log.warning("Flushing input buffer after hitting read limit")
                 try: 
                     # Clear any remaining data
                     serial_connection.reset_input_buffer() 
                 except: pass
                 last_malformed_line_logged = None # Reset after flush
                 
-            # --- Phase 4: Process valid data --- 
-            if data_to_process and active_game:
-                print(f"Processing {len(data_to_process)} valid FEN positions")
-                for fen in data_to_process:
-                    active_game.add_to_queue(fen)
-                active_game.process_queue() # Process the whole batch at once
-
-            # --- Phase 5: Small sleep --- 
-            time.sleep(0.1) # Prevent CPU hogging
-            
+            # --- Phase 4: Debounce and process valid data --- 
+            if data_to_process or classified:
+                metrics.frame_rate.mark(len(data_to_process) + len(classified))
+            if active_game:
+                for placement, confidence, received_at in classified:
+                    active_game.submit_square_probabilities(placement, confidence, received_at)
+                now = time.monotonic()
+                for frame in data_to_process:
+                    # Lift guidance reacts to every frame; only committing is debounced
+                    active_game.track_lift(frame.placement, frame.received_at)
+                    stable = frame_filter.offer(frame, frame.received_at) if frame_filter else frame
+                    if stable:
+                        active_game.add_to_queue(stable)
+                if frame_filter:
+                    # A frame that settled without further frames arriving
+                    stable = frame_filter.poll(now)
+                    if stable:
+                        active_game.add_to_queue(stable)
+                if active_game.processing_queue:
+                    serial_log.debug("Processing valid FEN positions", extra={'frames': len(active_game.processing_queue)})
+                    active_game.process_queue() # Process the whole batch at once
+
+            if section:
+                section.end(frames=len(raw_lines_read))
+
         except serial.SerialException as outer_ser_e:
-            print(f"Serial connection error: {outer_ser_e}. Stopping thread.")
-            serial_connection = None # Assume connection is lost
-            stop_thread = True # Signal thread stop
+            if section:
+                section.end()
+            serial_log.error("Serial connection error, stopping thread", extra={'game_id': active_game.game_id, 'error': str(outer_ser_e)})
+            connection.serial_connection = serial_connection = None # Assume connection is lost
+            connection.stop_thread = True # Signal thread stop
             last_malformed_line_logged = None
-        except Exception as e:
-            print(f"Error in serial reading loop: {e}")
+        except Exception:
+            if section:
+                section.end()
+            serial_log.exception("Error in serial reading loop")
             # Attempt recovery
             try:
                 if serial_connection and serial_connection.is_open:
@@ -134,12 +288,81 @@ def read_serial_data():
                     last_malformed_line_logged = None # Reset after error
                 else:
                      # If connection closed unexpectedly, stop thread
-                     stop_thread = True
+                     connection.stop_thread = True
             except:
-                 stop_thread = True # Stop if recovery fails
+                 connection.stop_thread = True # Stop if recovery fails
             time.sleep(1)  # Wait a bit longer before trying again
     
-    print("Serial reading thread stopped")
+    connection.close_capture()
+    serial_log.info("Serial reading thread stopped", extra={'game_id': active_game.game_id})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose ingest and HTTP metrics in Prometheus text format"""
+    return app.response_class(metrics.REGISTRY.render(), status=200, content_type=metrics.CONTENT_TYPE)
+
+@app.route('/admin/profile', methods=['POST'])
+def start_profile():
+    """Arm a cProfile or sampling capture for the ingest loop or one HTTP route"""
+    try:
+        data = request.json or {}
+        target = data.get('target', INGEST)
+        routes = {rule.rule for rule in app.url_map.iter_rules()}
+        if target != INGEST and target not in routes:
+            return jsonify({
+                'status': 'error',
+                'message': f"Unknown target {target}. Use '{INGEST}' or a route such as /games/<game_id>/state"
+            }), 400
+
+        try:
+            capture = PROFILER.start(
+                target,
+                mode=data.get('mode', 'cprofile'),
+                seconds=data.get('seconds'),
+                frames=data.get('frames'),
+                interval=data.get('interval_ms', 5) / 1000.0
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+
+        return jsonify({
+            'status': 'success',
+            'message': f'Profiling {target}',
+            'capture': capture.status()
+        }), 202
+            
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@app.route('/admin/profile', methods=['GET', 'DELETE'])
+def get_profile():
+    """Collapsed stacks of a finished capture (DELETE stops a running one first)"""
+    try:
+        target = request.args.get('target', INGEST)
+        capture = PROFILER.stop(target) if request.method == 'DELETE' else PROFILER.get(target)
+        if not capture:
+            return jsonify({
+                'status': 'error',
+                'message': f'No profile capture for {target}'
+            }), 404
+        if not capture.done.is_set():
+            return jsonify({
+                'status': 'running',
+                'capture': capture.status()
+            }), 202
+        return app.response_class(capture.output, status=200, mimetype='text/plain')
+            
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
 
 @app.route('/games', methods=['POST'])
 def create_game():
@@ -185,43 +408,24 @@ def create_game():
 
 @app.route('/games/<game_id>', methods=['GET'])
 def get_game(game_id):
-    """Get a game from database by ID"""
+    """Get a game by ID: a connected board's live game, otherwise the game as saved"""
     try:
-        game = ChessGame.load_from_db(game_id)
-        
-        if not game:
-            return jsonify({
-                'status': 'error',
-                'message': f'Game with ID {game_id} not found'
-            }), 404
+        board = find_connection(game_id)
+        if board:
+            with board.game.lock:
+                body = board.game.to_json()
+        else:
+            # Kept loaded until the game is saved again, so its moves' JSON is not rebuilt per request
+            game = ChessGame.load_cached(game_id)
+            if not game:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Game with ID {game_id} not found'
+                }), 404
+            body = game.to_json()
             
-        # Format game data for response
-        moves = []
-        for move in game.master_state:
-            moves.append({
-                'move_id': move.move_id,
-                'fen': move.fen,
-                'player': move.player,
-                'timestamp': move.timestamp.isoformat() if move.timestamp else None,
-                'algebraic': move.algebraic,
-                'uci': move.uci,
-                'is_legal': move.is_legal
-            })
-            
-        return jsonify({
-            'status': 'success',
-            'game': {
-                'game_id': game.game_id,
-                'event': game.event,
-                'site': game.site,
-                'date': game.date,
-                'round': game.round,
-                'white': game.white,
-                'black': game.black,
-                'result': game.result,
-                'moves': moves
-            }
-        }), 200
+        # Moves are serialized once and cached, so only the header is encoded per request
+        return json_response('{"status":"success","game":' + body + '}', 200)
             
     except Exception as e:
         return jsonify({
@@ -283,8 +487,6 @@ def list_ports():
 @app.route('/serial/connect', methods=['POST'])
 def connect_serial():
     """Connect to a serial port"""
-    global serial_connection, serial_thread, active_game, stop_thread
-    
     try:
         data = request.json
         if not data or 'port' not in data or 'game_id' not in data:
@@ -297,44 +499,89 @@ def connect_serial():
         game_id = data['game_id']
         baud_rate = data.get('baud_rate', 115200)
         
-        # Check if already connected
-        if serial_connection and serial_connection.is_open:
+        # Per-board debounce tuning; both 0 passes every new position straight through
+        try:
+            board_filter = StabilityFilter(
+                stable_ms=data.get('stable_ms', 0),
+                stable_frames=data.get('stable_frames', 0)
+            )
+        except (TypeError, ValueError) as e:
             return jsonify({
                 'status': 'error',
-                'message': f'Already connected to {serial_connection.port}. Disconnect first.'
+                'message': f'Invalid debounce settings: {str(e)}'
             }), 400
-            
-        # Load or create game
-        game = ChessGame.load_from_db(game_id)
-        if not game:
-            # Create new game if not found
-            game = ChessGame(game_id)
-            game.save_to_db()
         
-        # Check if game is already completed
-        if game.result != '*':
+        poll_ms = data.get('poll_ms', POLL_INTERVAL * 1000)
+        if not isinstance(poll_ms, (int, float)) or isinstance(poll_ms, bool) or poll_ms < MIN_POLL_MS:
             return jsonify({
                 'status': 'error',
-                'message': f'Cannot connect to a completed game with result {game.result}. Only in-progress games can be connected to.'
+                'message': f'poll_ms must be a number of at least {MIN_POLL_MS}'
             }), 400
-            
-        # Set as active game
-        active_game = game
         
-        # Connect to serial port
-        serial_connection = serial.Serial(port, baud_rate, timeout=1)
+        # Each game reads from one board and each port feeds one game; both stay reserved
+        # until the new connection is in connections
+        with connections_lock:
+            taken = [(board.game.game_id, board.port) for board in connections.values() if board.is_open]
+            for taken_game_id, taken_port in taken + list(connecting.items()):
+                if taken_game_id == game_id or taken_port == port:
+                    return jsonify({
+                        'status': 'error',
+                        'message': f'Game {taken_game_id} is already connected to {taken_port}. Disconnect first.'
+                    }), 400
+            connecting[game_id] = port
+            stale = connections.pop(game_id, None)  # the game's board lost its port
+        
+        try:
+            if stale:
+                # Its moves since the last save are only in memory: save them and carry on with that game
+                retire_connection(stale)
+                game = stale.game
+            else:
+                # Load or create game
+                game = ChessGame.load_from_db(game_id)
+                if not game:
+                    # Create new game if not found
+                    game = ChessGame(game_id)
+                    game.save_to_db()
+            
+            # Check if game is already completed
+            if game.result != '*':
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Cannot connect to a completed game with result {game.result}. Only in-progress games can be connected to.'
+                }), 400
+                
+            # Connect to serial port
+            connection = BoardConnection(serial.Serial(port, baud_rate, timeout=poll_ms / 1000), game, board_filter, poll_ms / 1000)
+            if data.get('capture'):
+                # Raw lines and their read times, for replaying the session (pgn_serial_emulator.py --replay)
+                try:
+                    connection.capture = SessionCapture(capture_path(game_id))
+                except OSError as e:
+                    connection.serial_connection.close()
+                    return jsonify({
+                        'status': 'error',
+                        'message': f'Could not create capture file: {str(e)}'
+                    }), 500
+            # Optionally echo lift guidance ("L e3 e4") to the board for its LEDs
+            game.lift_tracker.on_guidance = connection.send_guidance if data.get('led_guidance') else None
+            with connections_lock:
+                connections[game_id] = connection
+        finally:
+            with connections_lock:
+                del connecting[game_id]
         
         # Start reading thread
-        stop_thread = False
-        serial_thread = threading.Thread(target=read_serial_data)
-        serial_thread.daemon = True
-        serial_thread.start()
+        connection.thread = threading.Thread(target=read_serial_data, args=(connection,))
+        connection.thread.daemon = True
+        connection.thread.start()
         
         return jsonify({
             'status': 'success',
             'message': f'Connected to {port} for game {game_id}',
             'port': port,
-            'game_id': game_id
+            'game_id': game_id,
+            'capture': connection.capture.path if connection.capture else None
         }), 200
             
     except serial.SerialException as e:
@@ -350,44 +597,49 @@ def connect_serial():
 
 @app.route('/serial/disconnect', methods=['POST'])
 def disconnect_serial():
-    """Disconnect from serial port"""
-    global serial_connection, serial_thread, active_game, stop_thread
-    
+    """Disconnect a board (by game_id, or the only connected board) from its serial port"""
     try:
-        if not serial_connection or not serial_connection.is_open:
+        data = request.get_json(silent=True) or {}
+        game_id = data.get('game_id')
+        with connections_lock:
+            if game_id is not None:
+                connection = connections.pop(game_id, None)
+            else:
+                # Without a game_id, the only open board, or else the only board that lost its port
+                open_boards = [board for board in connections.values() if board.is_open]
+                if len(open_boards) > 1:
+                    return jsonify({
+                        'status': 'error',
+                        'message': 'Several boards are connected; game_id is required'
+                    }), 400
+                candidates = open_boards or list(connections.values())
+                connection = candidates[0] if len(candidates) == 1 else None
+                if connection:
+                    del connections[connection.game.game_id]
+        if not connection:
             return jsonify({
                 'status': 'error',
-                'message': 'Not connected to any serial port'
+                'message': 'Not connected to any serial port' if game_id is None
+                           else f'Game {game_id} is not connected to a serial port'
             }), 400
             
-        # Stop the reading thread
-        stop_thread = True
-        if serial_thread and serial_thread.is_alive():
-            serial_thread.join(2.0)  # Wait up to 2 seconds
+        # Stop the reader, close the port and save; a board whose port was lost is only removed and saved
+        port = connection.port
+        game = connection.game
+        retire_connection(connection)
             
-        # Close the connection
-        port = serial_connection.port
-        serial_connection.close()
-        serial_connection = None
-        
-        # Process remaining items in the queue
-        if active_game:
-            game_id = active_game.game_id
-            active_game.process_queue()
-            
-            # Save to database
-            active_game.save_to_db()
-            active_game = None
-            
-            return jsonify({
-                'status': 'success',
-                'message': f'Disconnected from {port} and saved game {game_id}'
-            }), 200
-        else:
-            return jsonify({
-                'status': 'success',
-                'message': f'Disconnected from {port}'
-            }), 200
+        response = {
+            'status': 'success',
+            'message': f'Disconnected from {port} and saved game {game.game_id}' if port
+                       else f'Removed game {game.game_id}, whose port was lost, and saved it'
+        }
+        if connection.capture:
+            response['capture'] = {
+                'path': connection.capture.path,
+                'lines': connection.capture.lines,
+                'bytes': connection.capture.bytes
+            }
+        return jsonify(response), 200
             
     except Exception as e:
         return jsonify({
@@ -398,46 +650,25 @@ def disconnect_serial():
 @app.route('/games/<game_id>/state', methods=['GET'])
 def get_game_state(game_id):
     """Get the current state of an active game"""
-    global active_game, serial_connection
-    
     try:
-        if not active_game or active_game.game_id != game_id:
+        board = find_connection(game_id)
+        if not board:
             return jsonify({
                 'status': 'error',
                 'message': f'Game {game_id} is not active'
             }), 400
             
-        # Format game data for response
-        moves = []
-        for move in active_game.master_state:
-            moves.append({
-                'move_id': move.move_id,
-                'fen': move.fen,
-                'player': move.player,
-                'timestamp': move.timestamp.isoformat() if move.timestamp else None,
-                'algebraic': move.algebraic,
-                'uci': move.uci,
-                'is_legal': move.is_legal
-            })
-            
-        return jsonify({
-            'status': 'success',
-            'game': {
-                'game_id': active_game.game_id,
-                'event': active_game.event,
-                'site': active_game.site,
-                'date': active_game.date,
-                'round': active_game.round,
-                'white': active_game.white,
-                'black': active_game.black,
-                'result': active_game.result,
-                'moves': moves
-            },
-            'connection': {
-                'connected': serial_connection is not None and serial_connection.is_open,
-                'port': serial_connection.port if serial_connection and serial_connection.is_open else None
-            }
-        }), 200
+        connection = {
+            'connected': board.is_open,
+            'port': board.port,
+            'capture': board.capture.path if board.capture else None
+        }
+        with board.game.lock:  # the reader thread commits moves under it
+            body = board.game.to_json()
+        return json_response(
+            '{"status":"success","game":' + body + ',"connection":' + dumps(connection) + '}',
+            200
+        )
             
     except Exception as e:
         return jsonify({
@@ -449,52 +680,52 @@ def get_game_state(game_id):
 def update_game_result(game_id):
     """Update the result of a game"""
     try:
-        print(f"[DEBUG] Received request to update result for game {game_id}")
+        http_log.debug("Received request to update result", extra={'game_id': game_id})
         data = request.json
-        print(f"[DEBUG] Request data: {data}")
+        http_log.debug("Request data", extra={'data': data})
         
         if not data or 'result' not in data:
-            print("[ERROR] Missing 'result' in request data")
+            http_log.warning("Missing 'result' in request data", extra={'game_id': game_id})
             return jsonify({
                 'status': 'error',
                 'message': 'Result is required'
             }), 400
             
         result = data['result']
-        print(f"[DEBUG] Updating game {game_id} result to: {result}")
+        http_log.debug("Updating game result", extra={'game_id': game_id, 'result': result})
         
         # Load the game
         game = ChessGame.load_from_db(game_id)
         if not game:
-            print(f"[ERROR] Game with ID {game_id} not found")
+            http_log.warning("Game not found", extra={'game_id': game_id})
             return jsonify({
                 'status': 'error',
                 'message': f'Game with ID {game_id} not found'
             }), 404
             
         # Update the result
-        print(f"[DEBUG] Current result: {game.result}, New result: {result}")
+        http_log.debug("Replacing game result", extra={'game_id': game_id, 'old_result': game.result, 'result': result})
         game.result = result
         
         # Save to database
         success = game.save_to_db()
         
         if success:
-            print(f"[INFO] Successfully updated game {game_id} result to {result}")
+            http_log.info("Updated game result", extra={'game_id': game_id, 'result': result})
             return jsonify({
                 'status': 'success',
                 'message': f'Game result updated to {result}',
                 'game_id': game_id
             }), 200
         else:
-            print(f"[ERROR] Failed to save game {game_id} with new result {result}")
+            http_log.error("Failed to save game with new result", extra={'game_id': game_id, 'result': result})
             return jsonify({
                 'status': 'error',
                 'message': 'Failed to update game result'
             }), 500
             
     except Exception as e:
-        print(f"[ERROR] Exception in update_game_result: {str(e)}")
+        http_log.exception("Exception in update_game_result", extra={'game_id': game_id})
         return jsonify({
             'status': 'error',
             'message': str(e)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Move accuracy and ingest throughput of read_serial_data under injected faults.
+
+Replays the emulator PGNs through pgn_serial_emulator's fault injector onto a
+virtual (pty) serial port that a read_serial_data thread is reading, as a
+connected board would. Every fault profile is run with each StabilityFilter
+setting, with the same seed, so runs are comparable across changes to the
+ingest path. Reports per profile and setting:
+
+- moves: positions of the game committed in order (skipped ones are missed);
+- spurious: other committed positions, and illegal: commits that were not legal moves;
+- final: games whose last committed placement is the game's final position;
+- frames/s and ingest CPU per frame (the reader thread's CPU time);
+- the frames_malformed counts by reason.
+
+POSIX only (pseudo-terminals). Run from the server directory:
+
+    python benchFaults.py --profile light --profile hostile --seed 7
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+
+import serial
+
+SIM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hardware', 'sim')
+sys.path.append(SIM_DIR)
+
+import app as server
+import metrics
+from chessClass import ChessGame
+from frameFilter import StabilityFilter
+from fault_injection import FaultInjector, PROFILES, parse_profile
+from pgn_index import PgnIndex
+from pgn_serial_emulator import frame_schedule
+
+# (stable_ms, stable_frames). read_serial_data reads and stamps each line as it arrives, but a frame
+# that settles before the next one arrives is only released when the wait for input times out, so
+# stable_ms needs a poll interval well under the frame interval (see --poll-ms).
+SETTINGS = [(0, 0), (0, 2), (0, 3), (15, 0)]
+REASONS = ['invalid_fen', 'out_of_sync', 'decode_error', 'error']
+SETTLE = 0.5  # seconds for the reader to drain the port after the last frame
+
+
+def ingest(connection, cpu):
+    """read_serial_data on this thread, recording the thread's CPU time"""
+    started = time.thread_time()
+    server.read_serial_data(connection)
+    cpu.append(time.thread_time() - started)
+
+
+def replay(positions, rates, seed, stable_ms, stable_frames, fps, idle_frames, poll_interval):
+    """Stream one game with faults to a reader thread; returns the game and the run's counters"""
+    from virtual_serial import VirtualSerialPort
+
+    injector = FaultInjector(rates, seed)
+    game = ChessGame("fault-bench")
+    frame_filter = StabilityFilter(stable_ms, stable_frames) if stable_ms or stable_frames else None
+    frames = 0
+    cpu = []
+    with VirtualSerialPort() as port:
+        connection = server.BoardConnection(serial.Serial(port.port, 115200, timeout=1), game, frame_filter,
+                                            poll_interval)
+        reader = threading.Thread(target=ingest, args=(connection, cpu), daemon=True)
+        reader.start()
+        started = time.monotonic()
+        next_frame = started
+        try:
+            for _, fen in frame_schedule(positions, idle_frames):
+                delay = next_frame - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_frame += 1.0 / fps
+                for payload in injector.payloads(fen):
+                    port.write(payload)
+                frames += 1
+            for payload in injector.flush():
+                port.write(payload)
+            elapsed = time.monotonic() - started
+            time.sleep(SETTLE)
+        finally:
+            connection.stop_thread = True
+            reader.join(2)
+            connection.serial_connection.close()
+    return game, {'frames': frames, 'elapsed': elapsed, 'cpu': sum(cpu), 'faults': injector.counts}
+
+
+def score(game, positions):
+    """(matched, spurious, illegal, final position reached) of a replayed game"""
+    expected = [fen.split(' ')[0] for fen in positions[1:]]
+    matched = 0
+    for move in game.master_state[1:]:
+        if matched < len(expected) and move.board_fen == expected[matched]:
+            matched += 1
+    spurious = len(game.master_state) - 1 - matched
+    illegal = sum(1 for move in game.master_state if move.is_legal is False)
+    final = bool(game.master_state) and game.master_state[-1].board_fen == positions[-1].split(' ')[0]
+    return matched, spurious, illegal, final
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure ingest accuracy and throughput under injected faults")
+    parser.add_argument("--pgn-dir", default=os.path.join(SIM_DIR, 'pgn'), help="Directory containing PGN files")
+    parser.add_argument("--profile", action="append",
+                        help=f"Fault profile or rates (repeatable; default {', '.join(PROFILES)})")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the injected faults")
+    parser.add_argument("--fps", type=float, default=100, help="Frames per second sent by the board")
+    parser.add_argument("--idle-frames", type=int, default=4, help="Repeated frames of each position")
+    parser.add_argument("--poll-ms", type=float, default=2, help="read_serial_data wait for input before an idle cycle")
+    args = parser.parse_args()
+    logging.getLogger('chesslink').setLevel(logging.CRITICAL)  # every fault logs a warning otherwise
+
+    index = PgnIndex(args.pgn_dir)
+    index.games()
+    games = [index.load(game_id)["positions"] for game_id in index.game_ids()]
+    games = [positions for positions in games if positions]
+    total_moves = sum(len(positions) - 1 for positions in games)
+    print(f"{len(games)} games, {total_moves} moves at {args.fps:g} fps with {args.idle_frames} idle frames, "
+          f"{args.poll_ms:g} ms poll, seed {args.seed}")
+    print(f"{'profile':<10} {'ms':>4} {'frames':>6} {'moves':>11} {'spurious':>8} {'illegal':>7} {'final':>6} "
+          f"{'frames/s':>9} {'us/frame':>8}  malformed")
+    for spec in args.profile or list(PROFILES):
+        rates = parse_profile(spec)
+        for stable_ms, stable_frames in SETTINGS:
+            malformed_before = {reason: metrics.frames_malformed.value(reason=reason) for reason in REASONS}
+            matched = spurious = illegal = final = frames = 0
+            elapsed = cpu = 0.0
+            for number, positions in enumerate(games):
+                with redirect_stdout(io.StringIO()):
+                    game, run = replay(positions, rates, args.seed + number, stable_ms, stable_frames,
+                                       args.fps, args.idle_frames, args.poll_ms / 1000)
+                game_matched, game_spurious, game_illegal, game_final = score(game, positions)
+                matched += game_matched
+                spurious += game_spurious
+                illegal += game_illegal
+                final += game_final
+                frames += run['frames']
+                elapsed += run['elapsed']
+                cpu += run['cpu']
+            malformed = ", ".join(
+                f"{reason} {metrics.frames_malformed.value(reason=reason) - malformed_before[reason]:g}"
+                for reason in REASONS
+                if metrics.frames_malformed.value(reason=reason) > malformed_before[reason]
+            ) or "-"
+            print(f"{spec:<10} {stable_ms:>4} {stable_frames:>6} {matched:>5}/{total_moves:<5} {spurious:>8} {illegal:>7} "
+                  f"{final:>2}/{len(games):<3} {frames / elapsed:>9.0f} {cpu / frames * 1e6:>8.1f}  {malformed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Commit latency vs spurious-move trade-off of the StabilityFilter.
+
+Builds sensor sessions from the emulator PGNs: the board streams frames at a
+fixed rate and every move is preceded by the piece being lifted, slid across
+the squares in between and occasionally adjusted after it has been put down.
+Each session is replayed through StabilityFilter settings and the committed
+frames are fed into a ChessGame. Run from the server directory:
+
+    python benchFrameFilter.py --fps 20
+"""
+import argparse
+import glob
+import logging
+import os
+import random
+import statistics
+import chess
+import chess.pgn
+from chessClass import ChessGame
+from fenValidator import parse_fen, FenError
+from frameFilter import StabilityFilter
+
+DEFAULT_PGN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hardware', 'sim', 'pgn')
+SETTINGS = [
+    (0, 0),
+    (0, 2),
+    (0, 3),
+    (0, 5),
+    (100, 0),
+    (200, 0),
+    (300, 0),
+    (500, 0),
+    (200, 3),
+]
+
+
+def _frames_for(board, duration, fps, clock):
+    """Repeat the board's FEN for `duration` seconds at `fps`, advancing the clock"""
+    frames = []
+    fen = board.fen()
+    count = max(1, int(duration * fps))
+    for _ in range(count):
+        frames.append((clock[0], fen, False))
+        clock[0] += 1.0 / fps
+    return frames
+
+
+def synthesize_session(pgn_path, fps, seed):
+    """Return [(timestamp, fen, is_true_position)] for the first game in a PGN file"""
+    with open(pgn_path) as f:
+        game = chess.pgn.read_game(f)
+    rng = random.Random(seed)
+    clock = [0.0]
+    board = game.board()
+    session = _frames_for(board, 0.5, fps, clock)
+    session[0] = (session[0][0], session[0][1], True)
+
+    for move in game.mainline_moves():
+        session += _frames_for(board, rng.uniform(0.3, 1.5), fps, clock)  # thinking
+
+        hand = board.copy()
+        piece = hand.remove_piece_at(move.from_square)
+        if board.is_capture(move):
+            captured_square = move.to_square
+            if board.is_en_passant(move):
+                captured_square = move.to_square + (-8 if board.turn == chess.WHITE else 8)
+            hand.remove_piece_at(captured_square)
+        session += _frames_for(hand, rng.uniform(0.1, 0.4), fps, clock)  # lifted
+
+        # Sliding pieces touch the empty squares between from and to
+        if piece.piece_type in (chess.BISHOP, chess.ROOK, chess.QUEEN):
+            for square in chess.SquareSet.between(move.from_square, move.to_square):
+                if hand.piece_at(square) is None:
+                    hand.set_piece_at(square, piece)
+                    session += _frames_for(hand, rng.uniform(0.03, 0.12), fps, clock)
+                    hand.remove_piece_at(square)
+
+        board.push(move)
+        placed = _frames_for(board, 0.05, fps, clock)
+        placed[0] = (placed[0][0], placed[0][1], True)
+        session += placed
+        if rng.random() < 0.2:  # adjust the piece after putting it down
+            adjusted = board.copy()
+            adjusted.remove_piece_at(move.to_square)
+            session += _frames_for(adjusted, rng.uniform(0.05, 0.15), fps, clock)
+            session += _frames_for(board, 0.05, fps, clock)
+
+    session += _frames_for(board, 1.0, fps, clock)
+    return session
+
+
+def replay(session, stable_ms, stable_frames):
+    """Replay a session through one filter setting and measure the outcome"""
+    stability = StabilityFilter(stable_ms=stable_ms, stable_frames=stable_frames)
+    game = ChessGame("filter-bench")
+    true_fens = set()
+    first_seen = {}
+    latencies = {}  # board_fen -> delay until its first commit
+    spurious = 0
+
+    for timestamp, fen, is_true in session:
+        board_fen = fen.split(' ')[0]
+        if is_true:
+            true_fens.add(board_fen)
+            first_seen.setdefault(board_fen, timestamp)
+        try:
+            frame = parse_fen(fen)
+        except FenError:
+            frame = None  # rejected at validation, e.g. a lifted king
+        stable = stability.offer(frame, timestamp) if frame else stability.poll(timestamp)
+        if stable is None:
+            continue
+        game.add_to_queue(stable)
+        game.process_queue()
+        if stable.board_fen in first_seen:
+            latencies.setdefault(stable.board_fen, timestamp - first_seen[stable.board_fen])
+        else:
+            spurious += 1
+
+    committed = {move.board_fen for move in game.master_state}
+    return {
+        'spurious': spurious,
+        'illegal': sum(1 for move in game.master_state if move.is_legal is False),
+        'missed': len(true_fens - committed),
+        'moves': len(true_fens) - 1,
+        'latencies': list(latencies.values()),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate debounce settings on synthesized board sessions")
+    parser.add_argument("--pgn-dir", default=DEFAULT_PGN_DIR, help="Directory containing PGN files")
+    parser.add_argument("--fps", type=float, default=20, help="Frames per second streamed by the board")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the handling noise")
+    args = parser.parse_args()
+    logging.getLogger('chesslink').setLevel(logging.ERROR)  # spurious frames log a warning each
+
+    sessions = [
+        synthesize_session(path, args.fps, args.seed + i)
+        for i, path in enumerate(sorted(glob.glob(os.path.join(args.pgn_dir, "*.pgn"))))
+    ]
+    print(f"{len(sessions)} sessions, {sum(len(s) for s in sessions)} frames at {args.fps:g} fps")
+    print(f"{'stable_ms':>9} {'frames':>6} {'moves':>6} {'spurious':>8} {'illegal':>7} {'missed':>6} {'mean ms':>8} {'p95 ms':>7}")
+    for stable_ms, stable_frames in SETTINGS:
+        totals = {'spurious': 0, 'illegal': 0, 'missed': 0, 'moves': 0, 'latencies': []}
+        for session in sessions:
+            result = replay(session, stable_ms, stable_frames)
+            for key in totals:
+                totals[key] += result[key]
+        latencies = sorted(totals['latencies'])
+        mean = statistics.mean(latencies) * 1000 if latencies else float('nan')
+        p95 = latencies[int(0.95 * (len(latencies) - 1))] * 1000 if latencies else float('nan')
+        print(f"{stable_ms:>9} {stable_frames:>6} {totals['moves']:>6} {totals['spurious']:>8} "
+              f"{totals['illegal']:>7} {totals['missed']:>6} {mean:>8.0f} {p95:>7.0f}")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Benchmark serving /games/<id>/state and /games/<id> for a 300-ply game 1000 times.
+
+Compares the previous per-request dict building + jsonify against the cached
+per-move fragments. /games/<id> is served from a temporary database, where it
+used to load the game on every request. Run from the server directory:
+python benchGameJson.py
+"""
+import argparse
+import logging
+import random
+import tempfile
+import time
+import chess
+from flask import jsonify
+import app as server
+from chessClass import ChessGame
+from jsonCodec import orjson
+
+
+def build_game(plies, seed=0):
+    """Play a seeded random game of exactly `plies` half-moves through the ingest path"""
+    while True:
+        rng = random.Random(seed)
+        board = chess.Board()
+        fens = []
+        while len(fens) < plies and not board.is_game_over():
+            board.push(rng.choice(list(board.legal_moves)))
+            fens.append(board.fen())
+        if len(fens) == plies:
+            break
+        seed += 1
+
+    game = ChessGame(f"bench-{plies}")
+    for fen in fens:
+        game.add_to_queue(fen)
+    game.process_queue()
+    return game
+
+
+def legacy_state(game):
+    """The state response as it was built before moves cached their JSON"""
+    moves = []
+    for move in game.master_state:
+        moves.append({
+            'move_id': move.move_id,
+            'fen': move.fen,
+            'player': move.player,
+            'timestamp': move.timestamp.isoformat() if move.timestamp else None,
+            'algebraic': move.algebraic,
+            'uci': move.uci,
+            'is_legal': move.is_legal
+        })
+    return jsonify({
+        'status': 'success',
+        'game': dict(game.metadata(), moves=moves),
+        'connection': {'connected': False, 'port': None}
+    }), 200
+
+
+def run(label, serve, requests):
+    with server.app.test_request_context():
+        serve()  # warm up
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = serve()
+        elapsed = time.perf_counter() - start
+    if isinstance(response, tuple):
+        response = response[0]
+    size = len(response.get_data())
+    print(f"{label:<10} {elapsed * 1000:9.1f} ms total  {elapsed / requests * 1e6:8.1f} us/request  {size} bytes")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark game state serialization")
+    parser.add_argument("--plies", type=int, default=300, help="Number of half-moves in the game")
+    parser.add_argument("--requests", type=int, default=1000, help="Number of times the state is served")
+    args = parser.parse_args()
+    logging.getLogger('chesslink').setLevel(logging.WARNING)  # every load and save logs at INFO
+
+    game = build_game(args.plies)
+    server.connections[game.game_id] = server.BoardConnection(None, game, None)
+    print(f"Game with {len(game.master_state)} states, encoder: {'orjson' if orjson else 'json'}")
+
+    legacy = run("legacy", lambda: legacy_state(game), args.requests)
+    cached = run("cached", lambda: server.get_game_state(game.game_id), args.requests)
+    print(f"speedup    {legacy / cached:.1f}x")
+    del server.connections[game.game_id]
+
+    from benchSuite import use_temporary_database
+    with tempfile.TemporaryDirectory() as temp_dir:
+        use_temporary_database(temp_dir)
+        game.save_to_db()
+        print("/games/<id> from the database:")
+        legacy = run("load", lambda: legacy_state(ChessGame.load_from_db(game.game_id)), args.requests // 10)
+        cached = run("cached", lambda: server.get_game(game.game_id), args.requests // 10)
+        print(f"speedup    {legacy / cached:.1f}x")
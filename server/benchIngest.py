@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Sustained frame rate, CPU per frame and commit latency of the ingest loop.
+
+Runs the real read_serial_data and ChessGame on a FakeSerial, so neither a
+port nor pyserial's byte-by-byte readline is in the measurement. A feeder
+replays the emulator PGNs as frames (every position plus --idle-frames
+repeats) at each --rates value, with 0 meaning as fast as possible, and for
+each --poll-ms reader wait. Reports per setting:
+
+- frames/s: frames fed divided by the time until the last move committed;
+- CPU per frame: the reader thread's CPU time divided by the frames;
+- commit latency percentiles, from feeding a position's first frame to its
+  move's commit timestamp;
+- moves committed out of those in the games.
+
+Run from the server directory:
+
+    python benchIngest.py --rates 20,200,2000,0 --poll-ms 100,10,1 --games 2
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+SIM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hardware', 'sim')
+sys.path.append(SIM_DIR)
+
+import app as server
+from benchFaults import ingest
+from chessClass import ChessGame
+from fakeSerial import FakeSerial
+from frameFilter import StabilityFilter
+from pgn_index import PgnIndex
+from pgn_serial_emulator import frame_schedule, percentile
+
+DRAIN_TIMEOUT = 10  # seconds to wait for the last moves to commit after the last frame
+
+
+def run(positions, rate, poll_interval, idle_frames, stable_frames):
+    """Feed one game to a reader thread; returns (frames, seconds, reader CPU seconds, latencies, moves)"""
+    game = ChessGame("ingest-bench")
+    fake = FakeSerial()
+    frame_filter = StabilityFilter(stable_frames=stable_frames) if stable_frames else None
+    connection = server.BoardConnection(fake, game, frame_filter, poll_interval)
+    cpu = []
+    reader = threading.Thread(target=ingest, args=(connection, cpu), daemon=True)
+    reader.start()
+
+    fed_at = {}  # position index -> wall time its first frame was fed
+    frames = 0
+    started = time.monotonic()
+    next_frame = started
+    for index, fen in frame_schedule(positions, idle_frames):
+        if rate:
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_frame += 1.0 / rate
+        fed_at.setdefault(index, time.time())
+        fake.feed((fen + '\n').encode('utf-8'))
+        frames += 1
+
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    while len(game.master_state) < len(positions) and time.monotonic() < deadline:
+        time.sleep(0.002)
+    elapsed = time.monotonic() - started
+    connection.stop_thread = True
+    reader.join(2 + poll_interval)
+    fake.close()
+
+    latencies = []
+    for index, move in enumerate(game.master_state[1:], start=1):
+        if index in fed_at and move.fen == positions[index]:
+            latencies.append(move.timestamp.timestamp() - fed_at[index])
+    return frames, elapsed, sum(cpu), latencies, len(game.master_state) - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure read_serial_data throughput and latency on a fake port")
+    parser.add_argument("--pgn-dir", default=os.path.join(SIM_DIR, 'pgn'), help="Directory containing PGN files")
+    parser.add_argument("--rates", default="50,500,0", help="Frame rates to feed (frames/s, 0 for max)")
+    parser.add_argument("--poll-ms", default="100,10,1", help="read_serial_data waits for input before an idle cycle")
+    parser.add_argument("--idle-frames", type=int, default=4, help="Repeated frames of each position")
+    parser.add_argument("--stable-frames", type=int, default=0, help="StabilityFilter stable_frames (0: off)")
+    parser.add_argument("--games", type=int, default=0, help="Games per setting (default: every PGN once)")
+    args = parser.parse_args()
+    logging.getLogger('chesslink').setLevel(logging.WARNING)
+
+    index = PgnIndex(args.pgn_dir)
+    index.games()
+    games = [game["positions"] for game in map(index.load, index.game_ids()) if game["positions"]]
+    if args.games:
+        games = [games[i % len(games)] for i in range(args.games)]
+    rates = [float(rate) for rate in args.rates.split(',')]
+    polls = [float(poll) for poll in args.poll_ms.split(',')]
+    print(f"{len(games)} games, {sum(len(p) - 1 for p in games)} moves, {args.idle_frames} idle frames per move")
+    print(f"{'rate':>6} {'poll ms':>7} {'frames/s':>9} {'us/frame':>8} {'p50 ms':>7} {'p90 ms':>7} "
+          f"{'p99 ms':>7} {'max ms':>7} {'moves':>9}")
+    for rate in rates:
+        for poll_ms in polls:
+            frames = committed = 0
+            elapsed = cpu = 0.0
+            latencies = []
+            for positions in games:
+                result = run(positions, rate, poll_ms / 1000, args.idle_frames, args.stable_frames)
+                frames += result[0]
+                elapsed += result[1]
+                cpu += result[2]
+                latencies += result[3]
+                committed += result[4]
+            latencies.sort()
+            line = f"{f'{rate:g}' if rate else 'max':>6} {poll_ms:>7g} {frames / elapsed:>9.0f} {cpu / frames * 1e6:>8.1f}"
+            if latencies:
+                line += "".join(f" {percentile(latencies, q) * 1000:>7.1f}" for q in (0.5, 0.9, 0.99))
+                line += f" {latencies[-1] * 1000:>7.1f}"
+            else:
+                line += f" {'-':>7}" * 4
+            print(line + f" {committed:>4}/{sum(len(p) - 1 for p in games):<4}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Stress determine_move with a seeded corpus of random legal games.
+
+Every game is played with random legal moves, and every (before, after)
+pair of positions goes through determine_move. The result must be the move
+that was played, with python-chess's SAN for it. Pure random play seldom
+reaches the rare cases, so with probability --rare-bias a move is picked
+among the rare ones whenever the position has any: promotions (including
+underpromotions), en passant captures, castling and captures of a rook on
+its corner square (which take away castling rights). Reports correctness
+per category, including en passant that gives a discovered check, and
+determine_move calls per second. Games are split over --workers processes.
+Game i of a run with --seed s is always the same game, so any mismatch can
+be replayed from the printed seed and game number. Run from the server
+directory:
+
+    python benchMoveCorpus.py --games 2000
+    python benchMoveCorpus.py --games 1000000 --workers 16   # soak run
+"""
+import argparse
+import collections
+import multiprocessing
+import os
+import random
+import time
+import chess
+from getMove import determine_move
+
+MOVE_KINDS = ('quiet', 'capture', 'castling', 'en_passant')  # every move is exactly one of these
+CORNERS = (chess.A1, chess.H1, chess.A8, chess.H8)
+CHUNK = 50  # games per task
+MAX_MISMATCHES = 20  # mismatches kept for the report
+
+
+def is_rare(board, move):
+    return (move.promotion is not None or board.is_en_passant(move) or board.is_castling(move)
+            or (move.to_square in CORNERS and board.piece_type_at(move.to_square) == chess.ROOK))
+
+
+def categories(board, move, board_after):
+    """Categories of a move, given the boards before and after it"""
+    found = []
+    if board.is_castling(move):
+        found.append('castling')
+    elif board.is_en_passant(move):
+        found.append('en_passant')
+        if any(square != move.to_square for square in board_after.checkers()):
+            found.append('en_passant_discovered_check')
+    elif board.is_capture(move):
+        found.append('capture')
+        if move.to_square in CORNERS and board.piece_type_at(move.to_square) == chess.ROOK:
+            found.append('corner_rook_capture')
+    else:
+        found.append('quiet')
+    if move.promotion:
+        found.append('promotion' if move.promotion == chess.QUEEN else 'underpromotion')
+    if board_after.is_checkmate():
+        found.append('checkmate')
+    elif board_after.is_check():
+        found.append('check')
+    return found
+
+
+def play_games(task):
+    """Play games [start, start + count) of a seed; returns counts, mismatches and time in determine_move"""
+    seed, start, count, max_plies, rare_bias = task
+    checked = collections.Counter()
+    failed = collections.Counter()
+    mismatches = []
+    inference_time = 0.0
+    for number in range(start, start + count):
+        rng = random.Random(seed * 2 ** 32 + number)
+        board = chess.Board()
+        for _ in range(max_plies):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            rare = [move for move in moves if is_rare(board, move)] if rare_bias else []
+            move = rng.choice(rare if rare and rng.random() < rare_bias else moves)
+            board_after = board.copy(stack=False)
+            board_after.push(move)
+
+            started = time.perf_counter()
+            inferred, san = determine_move(board, board_after)
+            inference_time += time.perf_counter() - started
+
+            found = categories(board, move, board_after)
+            checked.update(found)
+            if inferred != move or san != board.san(move):
+                failed.update(found)
+                if len(mismatches) < MAX_MISMATCHES:
+                    mismatches.append((number, board.fen(), move.uci(), inferred.uci() if inferred else None, san))
+            board = board_after
+            if board.is_game_over(claim_draw=False):
+                break
+    return checked, failed, mismatches, inference_time
+
+
+def tasks(seed, games, max_plies, rare_bias):
+    for start in range(0, games, CHUNK):
+        yield seed, start, min(CHUNK, games - start), max_plies, rare_bias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check determine_move against a corpus of random legal games")
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-plies", type=int, default=200, help="Plies per game at most")
+    parser.add_argument("--rare-bias", type=float, default=0.3,
+                        help="Probability of picking among the rare moves when there are any")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes (1 runs in this one)")
+    args = parser.parse_args()
+
+    checked = collections.Counter()
+    failed = collections.Counter()
+    mismatches = []
+    inference_time = 0.0
+    done = 0
+    started = time.perf_counter()
+    work = tasks(args.seed, args.games, args.max_plies, args.rare_bias)
+    pool = multiprocessing.Pool(args.workers) if args.workers > 1 else None
+    try:
+        results = pool.imap_unordered(play_games, work) if pool else map(play_games, work)
+        for task_checked, task_failed, task_mismatches, task_time in results:
+            checked += task_checked
+            failed += task_failed
+            mismatches += task_mismatches
+            inference_time += task_time
+            done += 1
+            if done % max(1, args.games // CHUNK // 10) == 0:
+                elapsed = time.perf_counter() - started
+                print(f"  {min(done * CHUNK, args.games)}/{args.games} games, "
+                      f"{sum(checked[kind] for kind in MOVE_KINDS) / elapsed:,.0f} moves/s", flush=True)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    elapsed = time.perf_counter() - started
+
+    moves = sum(checked[kind] for kind in MOVE_KINDS)
+    print(f"{args.games} games, {moves} moves (seed {args.seed}, {args.workers} worker(s)) in {elapsed:.1f} s")
+    print(f"{'category':<28} {'moves':>10} {'wrong':>7}")
+    for category in MOVE_KINDS + ('en_passant_discovered_check', 'corner_rook_capture',
+                                  'promotion', 'underpromotion', 'check', 'checkmate'):
+        print(f"{category:<28} {checked[category]:>10} {failed[category]:>7}")
+    wrong = sum(failed[kind] for kind in MOVE_KINDS)
+    print(f"correct: {moves - wrong}/{moves} ({(moves - wrong) / max(moves, 1):.4%})")
+    print(f"determine_move: {moves / inference_time:,.0f} calls/s per process "
+          f"({inference_time / max(moves, 1) * 1e6:.1f} us each), {moves / elapsed:,.0f} moves/s overall")
+    for number, fen, played, inferred, san in mismatches:
+        print(f"  game {number}: {fen}  played {played}, inferred {inferred} ({san})")
+    if wrong:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
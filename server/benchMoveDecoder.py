@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Frames needed to commit a move: exact matching vs the probabilistic MoveDecoder.
+
+Replays the emulator PGNs as classified sensor frames: every square is
+misread with probability --error, with a lower reported confidence when it
+is. Before each move the board shows the old position for a few frames, then
+the new one. Exact matching (what infer_move needs) commits at the first
+frame that is entirely correct; the decoder commits once its posterior
+passes the threshold. Run from the server directory:
+
+    python benchMoveDecoder.py --error 0.02
+"""
+import argparse
+import glob
+import os
+import random
+import statistics
+import time
+import chess
+import chess.pgn
+from getMove import board_placement
+from moveDecoder import MoveDecoder
+
+DEFAULT_PGN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hardware', 'sim', 'pgn')
+SYMBOLS = '.PNBRQKpnbrqk'
+MAX_FRAMES = 50  # give up on a move after this many frames
+
+
+def noisy_frame(placement, error, rng):
+    """(placement, confidence) as a classifier would report it"""
+    cells = list(placement)
+    confidence = []
+    for square in range(64):
+        if rng.random() < error:
+            cells[square] = rng.choice([symbol for symbol in SYMBOLS if symbol != placement[square]])
+            confidence.append(rng.uniform(0.4, 0.8))
+        else:
+            confidence.append(rng.uniform(0.7, 0.99))
+    return ''.join(cells), confidence
+
+
+def replay(games, error, threshold, window, before_frames, rng):
+    exact_frames, decoder_frames = [], []
+    wrong = early = gave_up = 0
+    decode_time = 0.0
+    observed = 0
+    for game in games:
+        board = game.board()
+        for move in game.mainline_moves():
+            decoder = MoveDecoder(board, window=window, threshold=threshold)
+            before = board_placement(board)
+            board.push(move)
+            after = board_placement(board)
+
+            committed = None
+            started = time.perf_counter()
+            for _ in range(before_frames):
+                committed, _ = decoder.observe(*noisy_frame(before, error, rng))
+                observed += 1
+                if committed:
+                    early += 1
+                    break
+            frames = 0
+            while committed is None and frames < MAX_FRAMES:
+                frames += 1
+                committed, _ = decoder.observe(*noisy_frame(after, error, rng))
+                observed += 1
+            decode_time += time.perf_counter() - started
+            if committed is None:
+                gave_up += 1
+            else:
+                decoder_frames.append(frames)
+                if committed != move:
+                    wrong += 1
+
+            # Exact matching waits for a frame with no misread square
+            frames = 1
+            while noisy_frame(after, error, rng)[0] != after and frames < MAX_FRAMES:
+                frames += 1
+            exact_frames.append(frames)
+
+    moves = len(exact_frames)
+    print(f"error {error:.3f}: {moves} moves")
+    print(f"  exact match   mean {statistics.mean(exact_frames):6.2f} frames  p95 {_p95(exact_frames):3d}")
+    print(f"  decoder       mean {statistics.mean(decoder_frames):6.2f} frames  p95 {_p95(decoder_frames):3d}  "
+          f"wrong {wrong}  before the move {early}  gave up {gave_up}  {decode_time / observed * 1e6:.0f} us/frame")
+
+
+def _p95(values):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frames to commit a move: exact matching vs MoveDecoder")
+    parser.add_argument('--pgn-dir', default=DEFAULT_PGN_DIR)
+    parser.add_argument('--error', type=float, action='append', help="Per-square misread probability (repeatable)")
+    parser.add_argument('--threshold', type=float, default=0.95)
+    parser.add_argument('--window', type=int, default=6)
+    parser.add_argument('--before-frames', type=int, default=3, help="Frames of the old position before each move")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    games = []
+    for path in sorted(glob.glob(os.path.join(args.pgn_dir, '*.pgn'))):
+        with open(path) as f:
+            game = chess.pgn.read_game(f)
+        if game:
+            games.append(game)
+    for error in args.error or [0.005, 0.02, 0.05]:
+        replay(games, error, args.threshold, args.window, args.before_frames, random.Random(args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Replay a captured board session into read_serial_data as a regression benchmark.
+
+Plays a capture recorded with /serial/connect {"capture": true} back through
+a virtual (pty) serial port into a read_serial_data thread, byte for byte. At
+--speed 0 (the default) the lines go out as fast as the reader takes them;
+--speed 1 keeps the captured timing. Reports lines/s, the reader thread's
+CPU per line, the moves committed and a digest of them. Replays of the same
+capture commit the same moves, unless a --stable-ms filter is timing
+dependent, so a changed digest flags a change in ingest behaviour.
+
+POSIX only (pseudo-terminals). Run from the server directory:
+
+    python benchReplay.py captures/game-20261019-101500.clcap --repeat 3
+"""
+import argparse
+import hashlib
+import io
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+
+import serial
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hardware', 'sim'))
+
+import app as server
+from benchFaults import ingest
+from chessClass import ChessGame
+from frameFilter import StabilityFilter
+from sessionCapture import read_capture
+
+SETTLE = 0.5  # seconds for the reader to drain the port after the last line
+
+
+def replay(records, speed, stable_ms, stable_frames):
+    """Replay a capture into a reader thread; returns the game, elapsed seconds and reader CPU seconds"""
+    from pgn_serial_emulator import replay_capture
+    from virtual_serial import VirtualSerialPort
+
+    game = ChessGame("replay-bench")
+    frame_filter = StabilityFilter(stable_ms, stable_frames) if stable_ms or stable_frames else None
+    cpu = []
+    with VirtualSerialPort() as port:
+        connection = server.BoardConnection(serial.Serial(port.port, 115200, timeout=1), game, frame_filter)
+        reader = threading.Thread(target=ingest, args=(connection, cpu), daemon=True)
+        reader.start()
+        port.wait_for_reader(5)
+        started = time.monotonic()
+        try:
+            with redirect_stdout(io.StringIO()):
+                replay_capture(port, records, speed)
+            # Done once the reader has drained the port
+            while port.has_reader and connection.serial_connection.in_waiting:
+                time.sleep(0.01)
+            elapsed = time.monotonic() - started
+            time.sleep(SETTLE)
+        finally:
+            connection.stop_thread = True
+            reader.join(2)
+            connection.serial_connection.close()
+    return game, elapsed, sum(cpu)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a session capture into the ingest path")
+    parser.add_argument("capture", help="Capture file (.clcap)")
+    parser.add_argument("--speed", type=float, default=0, help="1 for captured timing, N for N times faster, 0 for max")
+    parser.add_argument("--repeat", type=int, default=1, help="Replays, to check that results are stable")
+    parser.add_argument("--stable-ms", type=float, default=0)
+    parser.add_argument("--stable-frames", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger('chesslink').setLevel(logging.CRITICAL)
+
+    started_at, records = read_capture(args.capture)
+    duration = records[-1][0] if records else 0
+    print(f"{args.capture}: {len(records)} lines, {sum(len(line) for _, line in records)} bytes "
+          f"over {duration:.1f} s, speed {args.speed:g}")
+    for run in range(args.repeat):
+        game, elapsed, cpu = replay(records, args.speed, args.stable_ms, args.stable_frames)
+        moves = [move.uci or '-' for move in game.master_state[1:]]
+        digest = hashlib.sha1(' '.join(moves).encode('utf-8')).hexdigest()[:12]
+        illegal = sum(1 for move in game.master_state if move.is_legal is False)
+        print(f"run {run + 1}: {len(records) / elapsed:8.0f} lines/s  {cpu / max(len(records), 1) * 1e6:6.1f} us/line  "
+              f"{len(moves)} moves ({illegal} illegal)  digest {digest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""Benchmark suite for the core game operations, compared against stored baselines.
+
+Cases:
+
+- determine_move/*: one move of each kind (quiet, capture, castling, en
+  passant, promotion) plus a placement no legal move produces;
+- process_fen/*: _process_fen per frame while replaying a game, and for a
+  repeated (duplicate) frame;
+- manual_edit/*: changing an early and a late move of a long game, which
+  reprocesses every move after it;
+- save_to_db/N, load_from_db/N: games of N plies, in a temporary database;
+- state/*: /games/<id>/state for a 300-ply game, as a view call and through
+  the Flask test client.
+
+Each case is timed in batches of at least --min-time seconds, --repeat times,
+each batch right after one of a reference workload (legal move generation
+over fixed positions). A case's cost relative to the reference, rather than
+its raw time, is compared with the baseline file, which cancels most of the
+drift in the machine's speed between and within runs. A case more than
+--threshold costlier than its baseline is flagged, and the exit status is
+then 1. The database cases include SQLite file I/O and vary the most.
+Baselines depend on the machine, so record them with --save on the machine
+that compares against them. Run from the server directory:
+
+    python benchSuite.py --save          # record baselines
+    python benchSuite.py                 # compare against them
+    python benchSuite.py --filter determine_move --threshold 0.1
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+import chess
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+import app as server
+import chessClass
+from benchGameJson import build_game
+from chessClass import ChessGame
+from fenValidator import parse_fen
+from getMove import determine_move
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchBaselines.json')
+
+# (case, FEN before, UCI of the move; None for a placement that matches no legal move)
+MOVES = [
+    ('quiet', "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3", "f1c4"),
+    ('capture', "rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2", "e4d5"),
+    ('castling', "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4", "e1g1"),
+    ('en_passant', "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3", "e5f6"),
+    ('promotion', "8/4P1k1/8/8/8/8/8/K7 w - - 0 1", "e7e8q"),
+    ('unmatched', chess.STARTING_FEN, None),
+]
+
+
+def determine_move_case(fen, uci):
+    board_before = chess.Board(fen)
+    if uci is None:
+        # The e2 pawn jumps to e5: two changed squares that no legal move explains
+        board_after = board_before.copy()
+        board_after.set_piece_at(chess.E5, board_after.remove_piece_at(chess.E2))
+    else:
+        board_after = board_before.copy()
+        board_after.push_uci(uci)
+    move, _ = determine_move(board_before, board_after)
+    assert (move.uci() if move and move in board_before.legal_moves else None) == uci, (fen, uci, move)
+    return lambda: determine_move(board_before, board_after), 1
+
+
+def process_fen_case(plies):
+    frames = [parse_fen(move.fen) for move in build_game(plies).master_state[1:]]
+
+    def replay():
+        game = ChessGame("bench-process")
+        for frame in frames:
+            game._process_fen(frame)
+    return replay, len(frames)
+
+
+def duplicate_frame_case():
+    game = build_game(40)
+    frame = parse_fen(game.master_state[-1].fen)
+    return lambda: game._process_fen(frame), 1
+
+
+def manual_edit_case(plies, index):
+    game = build_game(plies)
+    index = index % len(game.master_state)
+    fen = game.master_state[index].fen
+    # Changing a move to its own position leaves the game as it was, so the edit can be repeated
+    return lambda: game.manual_edit(fen, index=index, action="change"), 1
+
+
+def save_case(plies):
+    game = build_game(plies)
+    game.game_id = f"bench-save-{plies}"
+    return game.save_to_db, 1
+
+
+def load_case(plies):
+    game = build_game(plies)
+    game.game_id = f"bench-load-{plies}"
+    assert game.save_to_db()
+    return lambda: ChessGame.load_from_db(game.game_id), 1
+
+
+def state_view_case(plies):
+    game = build_game(plies)
+    server.connections[game.game_id] = server.BoardConnection(None, game, None)
+
+    def serve():
+        with server.app.test_request_context():
+            return server.get_game_state(game.game_id)
+    return serve, 1
+
+
+def state_http_case(plies):
+    game = build_game(plies)
+    server.connections[game.game_id] = server.BoardConnection(None, game, None)
+    client = server.app.test_client()
+    path = f'/games/{game.game_id}/state'
+    assert client.get(path).status_code == 200
+    return lambda: client.get(path), 1
+
+
+CASES = [(f'determine_move/{name}', lambda fen=fen, uci=uci: determine_move_case(fen, uci)) for name, fen, uci in MOVES]
+CASES += [
+    ('process_fen/frame', lambda: process_fen_case(100)),
+    ('process_fen/duplicate', duplicate_frame_case),
+    ('manual_edit/early-300', lambda: manual_edit_case(300, 1)),
+    ('manual_edit/late-300', lambda: manual_edit_case(300, -2)),
+]
+for plies in (10, 100, 500):
+    CASES += [
+        (f'save_to_db/{plies}', lambda plies=plies: save_case(plies)),
+        (f'load_from_db/{plies}', lambda plies=plies: load_case(plies)),
+    ]
+CASES += [
+    ('state/view-300', lambda: state_view_case(300)),
+    ('state/http-300', lambda: state_http_case(300)),
+]
+
+
+def reference_case():
+    """Fixed CPU-bound work that does not change with the code under test"""
+    rng = random.Random(0)
+    board = chess.Board()
+    boards = []
+    for _ in range(40):
+        board.push(rng.choice(list(board.legal_moves)))
+        boards.append(board.copy(stack=False))
+    return lambda: [sum(1 for _ in b.legal_moves) for b in boards], 1
+
+
+def use_temporary_database(directory):
+    """Point ChessGame's sessions at a fresh SQLite file instead of chess_games.db"""
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    chessClass.Base.metadata.create_all(engine)
+    chessClass.Session = scoped_session(sessionmaker(bind=engine))
+
+
+def calibrate(operation, min_time):
+    """Loops of operation taking at least min_time: 1, 2, 5, 10, 20, 50, ... as timeit.autorange does"""
+    operation()  # warm up
+    for loops in (base * 10 ** power for power in range(10) for base in (1, 2, 5)):
+        if timed(operation, loops) >= min_time:
+            return loops
+    return loops
+
+
+def timed(operation, loops):
+    started = time.perf_counter()
+    for _ in range(loops):
+        operation()
+    return time.perf_counter() - started
+
+
+def measure(operation, units, reference, repeat, min_time):
+    """(median, min) seconds per unit, and the median cost relative to the reference workload.
+
+    Every batch of the operation follows a batch of the reference, so the
+    ratio of the two is taken over the same second or so of machine time.
+    """
+    loops = calibrate(operation, min_time)
+    reference_loops = calibrate(reference, min_time / 2)
+    per_unit, relative = [], []
+    for _ in range(repeat):
+        reference_time = timed(reference, reference_loops) / reference_loops
+        per_unit.append(timed(operation, loops) / (loops * units))
+        relative.append(per_unit[-1] / reference_time)
+    return statistics.median(per_unit), min(per_unit), statistics.median(relative)
+
+
+def machine():
+    return f"{platform.node()} {platform.machine()} Python {platform.python_version()}"
+
+
+def load_baselines(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def format_time(seconds):
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.1f} us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark core game operations against stored baselines")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file to compare against or save")
+    parser.add_argument("--save", action="store_true", help="Record this run as the baseline (merged by case)")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Flag cases slower than their baseline by more than this fraction")
+    parser.add_argument("--filter", default=None, help="Only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed batches per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per batch")
+    args = parser.parse_args()
+    logging.getLogger('chesslink').setLevel(logging.ERROR)  # unmatched moves and DB saves log at INFO/WARNING
+
+    baselines = load_baselines(args.baseline)
+    compare = baselines is not None and not args.save
+    if compare and baselines.get('machine') != machine():
+        print(f"Warning: baselines were recorded on {baselines.get('machine')}, this is {machine()}")
+    results = {}
+    regressions = []
+    reference, _ = reference_case()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        use_temporary_database(temp_dir)
+        print(f"{'case':<26} {'median':>10} {'min':>10} {'relative':>9} {'baseline':>9} {'change':>8}")
+        for name, setup in CASES:
+            if args.filter and args.filter not in name:
+                continue
+            operation, units = setup()
+            median, best, relative = measure(operation, units, reference, args.repeat, args.min_time)
+            results[name] = {'median': median, 'min': best, 'relative': relative}
+            line = f"{name:<26} {format_time(median):>10} {format_time(best):>10} {relative:>9.4f}"
+            baseline = baselines['cases'].get(name) if compare else None
+            if baseline and 'relative' in baseline:
+                change = relative / baseline['relative'] - 1
+                line += f" {baseline['relative']:>9.4f} {change:>+7.1%}"
+                if change > args.threshold:
+                    regressions.append(name)
+                    line += "  REGRESSION"
+            print(line, flush=True)
+        chessClass.Session.remove()
+
+    if args.save:
+        cases = dict(baselines['cases']) if baselines else {}
+        cases.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': machine(), 'saved_at': datetime.now().isoformat(timespec='seconds'),
+                       'cases': cases}, f, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} baselines to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} case(s) more than {args.threshold:.0%} slower than baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
 import chess
+import collections
 from datetime import datetime
 import uuid
 import threading
-from getMove import determine_move
+import time
+import metrics
+from logConfig import get_logger
+from getMove import determine_move, infer_move, board_placement
+from moveDecoder import MoveDecoder
+from liftTracker import LiftTracker
+from fenValidator import parse_fen, expand_board_fen
+from jsonCodec import dumps, join_array
 from sqlalchemy import create_engine, Column, String, DateTime, Boolean, Integer, ForeignKey, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker, scoped_session
 
+ingest_log = get_logger('ingest')
+db_log = get_logger('db')
+
 Base = declarative_base()
 
 class ChessMoveModel(Base):
@@ -47,6 +58,12 @@ Base.metadata.create_all(engine)
 session_factory = sessionmaker(bind=engine)
 Session = scoped_session(session_factory)
 
+# Games returned by ChessGame.load_cached, kept until the game is saved or deleted again
+LOADED_GAMES = 64
+_loaded_games = collections.OrderedDict()  # game_id -> ChessGame, least recently served first
+_db_writes = collections.Counter()  # game_id -> saves and deletes, so a load racing a save is not kept
+_loaded_lock = threading.Lock()
+
 class ChessMove:
     def __init__(
         self,
@@ -57,7 +74,8 @@ class ChessMove:
         algebraic=None,
         uci=None,
         move_obj=None,
-        is_legal=None  # NEW
+        is_legal=None,  # NEW
+        placement=None  # 64-character placement, when the caller already has it expanded
     ):
         self.move_id = move_id
         self.fen = fen
@@ -68,6 +86,19 @@ class ChessMove:
         self.uci = uci
         self.move_obj = move_obj
         self.is_legal = is_legal
+        self._placement = placement
+        self._json = None
+
+    @property
+    def board_fen(self):
+        return self.fen.split(' ', 1)[0]
+
+    @property
+    def placement(self):
+        """64-character placement of this move's position, expanded once"""
+        if self._placement is None:
+            self._placement = expand_board_fen(self.board_fen)
+        return self._placement
 
     def __repr__(self):
         legality = "✅" if self.is_legal else "❌" if self.is_legal is not None else "?"
@@ -75,6 +106,24 @@ class ChessMove:
             return f"{self.player}: {self.algebraic} ({self.uci}) [{legality}]"
         return f"{self.player}: [unparsed move] [{legality}]"
 
+    def to_dict(self):
+        """Serializable form of the move used by the game endpoints"""
+        return {
+            'move_id': self.move_id,
+            'fen': self.fen,
+            'player': self.player,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'algebraic': self.algebraic,
+            'uci': self.uci,
+            'is_legal': self.is_legal
+        }
+
+    def to_json(self):
+        """JSON fragment for this move, serialized once and cached (moves are never mutated)"""
+        if self._json is None:
+            self._json = dumps(self.to_dict())
+        return self._json
+
     def to_model(self, game_id, move_index):
         """Convert ChessMove to database model"""
         return ChessMoveModel(
@@ -107,7 +156,9 @@ class ChessGame:
         self.game_id = game_id
         self.master_state = []  # list of ChessMove
         self.processing_queue = []  # list of FENs
-        self.lock = threading.Lock()
+        self.move_decoder = None  # MoveDecoder for probabilistic frames, built on first use
+        self.lift_tracker = LiftTracker()
+        self.lock = threading.RLock()  # manual edits re-enter it (_reprocess_from -> _replace_move)
 
         self.event = "Casual Game"
         self.site = "?"
@@ -134,7 +185,28 @@ class ChessGame:
         self.master_state = [initial_move]
 
 
+    def metadata(self):
+        """Game header fields as a serializable dict"""
+        return {
+            'game_id': self.game_id,
+            'event': self.event,
+            'site': self.site,
+            'date': self.date,
+            'round': self.round,
+            'white': self.white,
+            'black': self.black,
+            'result': self.result
+        }
+
+    def to_json(self):
+        """Game JSON assembled from the header and the cached per-move fragments"""
+        header = dumps(self.metadata())
+        return header[:-1] + ',"moves":' + join_array(move.to_json() for move in self.master_state) + '}'
+
     def add_to_queue(self, fen):
+        """Queue a ParsedFen (or a FEN string, which is validated here)"""
+        if isinstance(fen, str):
+            fen = parse_fen(fen)
         self.processing_queue.append(fen)
 
     def get_latest_board(self):
@@ -147,52 +219,114 @@ class ChessGame:
             next_fen = self.processing_queue.pop(0)
             self._process_fen(next_fen)
 
-    def _process_fen(self, next_fen):
+    def track_lift(self, placement, received_at=None):
+        """Update lift tracking (and LED guidance) from a frame ahead of debouncing and validation.
+
+        Returns True while a piece is in the air. Frames still go through
+        add_to_queue for committing; this only reacts sooner.
+        """
         with self.lock:
-            board_before = self.get_latest_board()
-            board_after = chess.Board(next_fen)
-            board_after_fen_only = board_after.board_fen()
+            if not self.master_state:
+                return False
+            before_placement = self.master_state[-1].placement
+            changed = [sq for sq in range(64) if before_placement[sq] != placement[sq]]
+            if not changed:
+                self.lift_tracker.reset()
+                return False
+            return self.lift_tracker.observe(self.master_state[-1].fen, placement, before_placement, changed, received_at)
+
+    def submit_square_probabilities(self, placement, confidence, received_at=None):
+        """Feed one classified frame (placement plus per-square confidence) to the move decoder.
+
+        read_serial_data calls this for each 'P' line from the board. Commits
+        the decoded move once its posterior passes the decoder's threshold
+        and returns the new ChessMove, otherwise None.
+        """
+        with self.lock:
+            board = self.get_latest_board()
+            if self.move_decoder is None or self.move_decoder.fen != board.fen():
+                self.move_decoder = MoveDecoder(board)
+            move, _ = self.move_decoder.observe(placement, confidence)
+            if move is None:
+                return None
+            frame = self.move_decoder.frame(move)
+            frame.received_at = received_at
+            self._apply_frame(frame)
+            return self.master_state[-1]
 
-            if self.master_state:
-                last_board_fen = chess.Board(self.master_state[-1].fen).board_fen()
-                if last_board_fen == board_after_fen_only:
-                    print(f"[SKIP] No piece movement detected (board unchanged).")
-                    return
+    def _process_fen(self, parsed):
+        with self.lock:
+            self._apply_frame(parsed)
 
-            move_obj, algebraic = determine_move(board_before, board_after)
+    def _apply_frame(self, parsed):
+        """Commit one frame; the caller holds self.lock"""
+        last_move = self.master_state[-1] if self.master_state else None
 
-            if move_obj is None:
-                print(f"[WARN] Could not determine move for FEN:\n{next_fen}")
-                new_move = ChessMove(
-                move_id=str(uuid.uuid4()),
+        if last_move and last_move.placement == parsed.placement:
+            metrics.frames_duplicate.inc()
+            ingest_log.debug("No piece movement detected (board unchanged)")
+            self.lift_tracker.reset()  # a lifted piece was put back
+            return
+
+        board_before = self.get_latest_board()
+        before_placement = last_move.placement if last_move else board_placement(board_before)
+        # A diff-stream frame knows its changed squares when it follows the committed position
+        if parsed.changed is not None and parsed.previous == before_placement:
+            changed = parsed.changed
+        else:
+            changed = [sq for sq in range(64) if before_placement[sq] != parsed.placement[sq]]
+        before_fen = last_move.fen if last_move else board_before.fen()
+        if self.lift_tracker.observe(before_fen, parsed.placement, before_placement, changed, parsed.received_at):
+            ingest_log.debug("Piece lifted", extra={'game_id': self.game_id, 'squares': len(self.lift_tracker.guidance)})
+            return
+        with metrics.determine_move_duration.time():
+            move_obj, algebraic = infer_move(
+                board_before, parsed.placement, before_placement, changed, self.lift_tracker.candidates
+            )
+        self.lift_tracker.reset()
+        next_fen = parsed.fen
+
+        if move_obj is None:
+            ingest_log.warning("Could not determine move", extra={'game_id': self.game_id, 'fen': next_fen})
+            new_move = ChessMove(
+            move_id=str(uuid.uuid4()),
+            fen=next_fen,
+            player="White" if board_before.turn == chess.WHITE else "Black",
+            timestamp=datetime.now(),
+            is_legal=False,
+            placement=parsed.placement
+            )
+        else:
+            new_move = ChessMove(
+                move_id = str(uuid.uuid4()),
                 fen=next_fen,
+                algebraic=algebraic,
+                uci=move_obj.uci(),
                 player="White" if board_before.turn == chess.WHITE else "Black",
                 timestamp=datetime.now(),
-                is_legal=False
-                )
-            else:
-                new_move = ChessMove(
-                    move_id = str(uuid.uuid4()),
-                    fen=next_fen,
-                    algebraic=algebraic,
-                    uci=move_obj.uci(),
-                    player="White" if board_before.turn == chess.WHITE else "Black",
-                    timestamp=datetime.now(),
-                    move_obj=move_obj,
-                    is_legal=move_obj in board_before.legal_moves
-                )
+                move_obj=move_obj,
+                is_legal=move_obj in board_before.legal_moves,
+                placement=parsed.placement
+            )
 
-            self.master_state.append(new_move)
+        new_move.to_json()
+        self.master_state.append(new_move)
+
+        if not new_move.is_legal:
+            metrics.frames_illegal.inc()
+        if parsed.received_at is not None:
+            metrics.frame_commit_latency.observe(time.monotonic() - parsed.received_at)
 
     def _create_move_from_fen(self, new_fen, board_before):
         board_after = chess.Board(new_fen)
-        move_obj, algebraic = determine_move(board_before, board_after)
+        with metrics.determine_move_duration.time():
+            move_obj, algebraic = determine_move(board_before, board_after)
         move_id = str(uuid.uuid4())
         player = "White" if board_before.turn == chess.WHITE else "Black"
         timestamp = datetime.now()
         is_legal = move_obj in board_before.legal_moves if move_obj else False
 
-        return ChessMove(
+        new_move = ChessMove(
             move_id=move_id,
             fen=new_fen,
             algebraic=algebraic if move_obj else None,
@@ -202,6 +336,8 @@ class ChessGame:
             move_obj=move_obj,
             is_legal=is_legal
         )
+        new_move.to_json()
+        return new_move
 
     def _replace_move(self, index, new_fen, board_before):
         with self.lock:
@@ -224,9 +360,14 @@ class ChessGame:
 
     def manual_edit(self, new_fen, index=None, move_id=None, action="change"):
         if index is None and move_id is None:
-            print("[ERROR] Must specify index or move_id.")
+            ingest_log.error("Must specify index or move_id")
             return
+        with self.lock:
+            self.lift_tracker.reset()  # its candidates belong to the position being edited
+            self._manual_edit(new_fen, index, move_id, action)
 
+    def _manual_edit(self, new_fen, index, move_id, action):
+        """Apply one manual edit; the caller holds self.lock"""
         # Resolve target index
         if index is None:
             for i, move in enumerate(self.master_state):
@@ -234,17 +375,17 @@ class ChessGame:
                     index = i
                     break
             if not index:
-                print(f"[ERROR] Move with ID {move_id} not found.")
+                ingest_log.error("Move not found", extra={'move_id': move_id})
                 return
 
         if index == 0:
-            print("[ERROR] Cannot modify the initial board state.")
+            ingest_log.error("Cannot modify the initial board state")
             return
 
         prev_board = chess.Board(self.master_state[index - 1].fen)
 
         if action == "delete":
-            print(f"[INFO] Deleting move at index {index}")
+            ingest_log.info("Deleting move", extra={'index': index})
             del self.master_state[index]
             # Reprocess the move at this index (previously the next move)
             if index < len(self.master_state):
@@ -252,24 +393,28 @@ class ChessGame:
             return
 
         elif action == "change":
-            print(f"[INFO] Changing move at index {index}")
+            ingest_log.info("Changing move", extra={'index': index})
             self._replace_move(index, new_fen, prev_board)
             if index + 1 < len(self.master_state):
                 self._reprocess_from(index + 1)
             return
 
         elif action == "insert":
-            print(f"[INFO] Inserting move after index {index}")
+            ingest_log.info("Inserting move after index", extra={'index': index})
             self._insert_move(index + 1, new_fen, prev_board)
             if index + 2 < len(self.master_state):
                 self._reprocess_from(index + 2)
             return
 
         else:
-            print(f"[ERROR] Unknown action '{action}'")
+            ingest_log.error("Unknown action", extra={'action': action})
 
     def save_to_db(self):
         """Save the game and all its moves to the database"""
+        with metrics.save_to_db_duration.time():
+            return self._save_to_db()
+
+    def _save_to_db(self):
         session = Session()
         try:
             # Check if game already exists
@@ -277,7 +422,7 @@ class ChessGame:
             
             if existing_game:
                 # Update existing game record with current values
-                print(f"[DEBUG] Updating existing game: {self.game_id}, new result: {self.result}")
+                db_log.debug("Updating existing game", extra={'game_id': self.game_id, 'result': self.result})
                 existing_game.event = self.event
                 existing_game.site = self.site
                 existing_game.date = self.date
@@ -290,7 +435,7 @@ class ChessGame:
                 session.query(ChessMoveModel).filter_by(game_id=self.game_id).delete()
             else:
                 # Create new game record
-                print(f"[DEBUG] Creating new game: {self.game_id}, result: {self.result}")
+                db_log.debug("Creating new game", extra={'game_id': self.game_id, 'result': self.result})
                 game_model = ChessGameModel(
                     game_id=self.game_id,
                     event=self.event,
@@ -310,11 +455,12 @@ class ChessGame:
                 session.add(move_model)
                 
             session.commit()
-            print(f"[INFO] Game {self.game_id} saved to database, result: {self.result}")
+            self._forget_loaded(self.game_id)
+            db_log.info("Game saved to database", extra={'game_id': self.game_id, 'result': self.result, 'moves': len(self.master_state)})
             return True
         except Exception as e:
             session.rollback()
-            print(f"[ERROR] Failed to save game to database: {str(e)}")
+            db_log.error("Failed to save game to database", extra={'game_id': self.game_id, 'error': str(e)})
             return False
         finally:
             session.close()
@@ -327,7 +473,7 @@ class ChessGame:
             game_model = session.query(ChessGameModel).filter_by(game_id=game_id).first()
             
             if not game_model:
-                print(f"[ERROR] Game with ID {game_id} not found in database")
+                db_log.warning("Game not found in database", extra={'game_id': game_id})
                 return None
                 
             game = cls(game_id)
@@ -352,14 +498,42 @@ class ChessGame:
                 chess_move = ChessMove.from_model(move_model)
                 game.master_state.append(chess_move)
                 
-            print(f"[INFO] Game {game_id} loaded from database with {len(game.master_state)} moves")
+            db_log.info("Game loaded from database", extra={'game_id': game_id, 'moves': len(game.master_state)})
             return game
         except Exception as e:
-            print(f"[ERROR] Failed to load game from database: {str(e)}")
+            db_log.error("Failed to load game from database", extra={'game_id': game_id, 'error': str(e)})
             return None
         finally:
             session.close()
             
+    @classmethod
+    def load_cached(cls, game_id):
+        """load_from_db, reusing the game loaded last time until it is saved or deleted.
+
+        The game (and its moves' cached JSON) is shared between callers, so
+        it must only be read; load_from_db gives a game to change.
+        """
+        with _loaded_lock:
+            game = _loaded_games.get(game_id)
+            if game:
+                _loaded_games.move_to_end(game_id)
+                return game
+            writes = _db_writes[game_id]
+        game = cls.load_from_db(game_id)
+        if game:
+            with _loaded_lock:
+                if _db_writes[game_id] == writes:
+                    _loaded_games[game_id] = game
+                    if len(_loaded_games) > LOADED_GAMES:
+                        _loaded_games.popitem(last=False)
+        return game
+
+    @staticmethod
+    def _forget_loaded(game_id):
+        with _loaded_lock:
+            _db_writes[game_id] += 1
+            _loaded_games.pop(game_id, None)
+
     @classmethod
     def list_games(cls):
         """List all games in the database"""
@@ -368,7 +542,7 @@ class ChessGame:
             games = session.query(ChessGameModel).order_by(ChessGameModel.created_at.desc()).all()
             return [(g.game_id, g.white, g.black, g.date, g.result) for g in games]
         except Exception as e:
-            print(f"[ERROR] Failed to list games: {str(e)}")
+            db_log.error("Failed to list games", extra={'error': str(e)})
             return []
         finally:
             session.close()
@@ -382,11 +556,12 @@ class ChessGame:
             # Delete game
             session.query(ChessGameModel).filter_by(game_id=self.game_id).delete()
             session.commit()
-            print(f"[INFO] Game {self.game_id} deleted from database")
+            self._forget_loaded(self.game_id)
+            db_log.info("Game deleted from database", extra={'game_id': self.game_id})
             return True
         except Exception as e:
             session.rollback()
-            print(f"[ERROR] Failed to delete game from database: {str(e)}")
+            db_log.error("Failed to delete game from database", extra={'game_id': self.game_id, 'error': str(e)})
             return False
         finally:
             session.close()
@@ -0,0 +1,111 @@
+import chess
+from fenValidator import (
+    EMPTY, PIECE_SYMBOLS, FenError, ParsedFen, parse_fen, check_placement, check_state,
+    expand_board_fen, placement_board_fen,
+)
+
+KEYFRAME = "K"
+DIFF = "D"
+SQUARES = {name: index for index, name in enumerate(chess.SQUARE_NAMES)}
+
+
+class DiffStream:
+    """Decoder for one board's serial lines: plain FENs, keyframes and square diffs.
+
+        K <version> <fen>
+        D <version> <turn> <castling> <ep> <halfmove> <fullmove> <square><piece> ...
+
+    A keyframe replaces the live placement; a diff lists only the squares that
+    changed since the previous version ('.' for empty), e.g. "D 7 b KQkq - 0 1
+    e2. e4P". Diffs are applied to the live placement without re-parsing a
+    FEN and the frame carries the changed squares for move inference. A diff
+    whose version does not follow the last one means a line was lost: the
+    stream is out of sync and diffs are dropped until the next keyframe.
+    Lines without a prefix are parsed as plain FENs and also resync.
+
+    Positions that are not legal boards (a king lifted off the board) still
+    update the live placement before FenError is raised, so the stream stays
+    in sync through them and lift tracking can see them.
+    """
+
+    def __init__(self):
+        self.placement = None  # live placement, None until a keyframe or FEN arrives
+        self.version = None
+        self.dropped = 0  # diffs discarded while out of sync
+
+    @property
+    def synced(self):
+        return self.placement is not None
+
+    def decode(self, line):
+        """ParsedFen for a line, or None for a diff dropped while out of sync; raises FenError"""
+        kind = line[:2]
+        if kind == DIFF + " ":
+            return self._apply_diff(line)
+        if kind == KEYFRAME + " ":
+            version, _, fen = line[2:].partition(" ")
+            version = self._parse_version(version)
+            try:
+                frame = parse_fen(fen)
+            except FenError:
+                self.placement = self._loose_placement(fen)
+                self.version = version if self.placement else None
+                raise
+            self.version = version
+        else:
+            self.version = None
+            try:
+                frame = parse_fen(line)
+            except FenError:
+                self.placement = self._loose_placement(line)
+                raise
+        frame.previous = self.placement
+        self.placement = frame.placement
+        return frame
+
+    def _loose_placement(self, fen):
+        """Placement of a well-formed but invalid position, or None if the field is malformed"""
+        board_fen = fen.split(" ", 1)[0]
+        try:
+            placement = expand_board_fen(board_fen)
+        except (IndexError, ValueError):
+            return None
+        if len(placement) != 64 or placement_board_fen(placement) != board_fen or \
+                not set(placement) <= PIECE_SYMBOLS | {EMPTY}:
+            return None
+        return placement
+
+    def _parse_version(self, version):
+        if not (version.isascii() and version.isdigit()):
+            raise FenError(f"invalid version {version!r}")
+        return int(version)
+
+    def _apply_diff(self, line):
+        fields = line.split(" ")
+        if len(fields) < 8:
+            raise FenError(f"expected at least 8 diff fields, found {len(fields)}")
+        version = self._parse_version(fields[1])
+        if self.placement is None or self.version is None or version != self.version + 1:
+            self.placement = None
+            self.dropped += 1
+            return None
+
+        cells = list(self.placement)
+        changed = []
+        for change in fields[7:]:
+            square = SQUARES.get(change[:2])
+            piece = change[2:]
+            if square is None or len(change) != 3 or (piece != EMPTY and piece not in PIECE_SYMBOLS):
+                self.placement = None  # a corrupt line: its changes are unknown
+                raise FenError(f"invalid square change {change!r}")
+            if cells[square] != piece:
+                cells[square] = piece
+                changed.append(square)
+        placement = "".join(cells)
+        previous = self.placement
+        self.placement = placement
+        self.version = version
+
+        turn = check_state(*fields[2:7])
+        check_placement(placement)
+        return ParsedFen(None, None, placement, turn, state=" ".join(fields[2:7]), changed=changed, previous=previous)
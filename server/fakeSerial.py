@@ -0,0 +1,57 @@
+import threading
+
+
+class FakeSerial:
+    """In-memory stand-in for serial.Serial, for driving read_serial_data without a port.
+
+    Bytes given to feed() are read back through in_waiting, readline() and
+    read(), which block up to `timeout` seconds like pyserial's. readline()
+    returns a partial line once the timeout passes without a newline, as a
+    real port does. Anything the server writes (LED guidance) is kept in
+    `written`.
+    """
+
+    def __init__(self, port="fake", timeout=1):
+        self.port = port
+        self.timeout = timeout
+        self.is_open = True
+        self.written = bytearray()
+        self._buffer = bytearray()
+        self._ready = threading.Condition()
+
+    def feed(self, data):
+        with self._ready:
+            self._buffer += data
+            self._ready.notify_all()
+
+    @property
+    def in_waiting(self):
+        return len(self._buffer)
+
+    def readline(self):
+        with self._ready:
+            self._ready.wait_for(lambda: b"\n" in self._buffer or not self.is_open, self.timeout)
+            end = self._buffer.find(b"\n") + 1 or len(self._buffer)
+            line = bytes(self._buffer[:end])
+            del self._buffer[:end]
+            return line
+
+    def read(self, size=1):
+        with self._ready:
+            self._ready.wait_for(lambda: len(self._buffer) >= size or not self.is_open, self.timeout)
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return data
+
+    def reset_input_buffer(self):
+        with self._ready:
+            self._buffer.clear()
+
+    def write(self, data):
+        self.written += data
+        return len(data)
+
+    def close(self):
+        with self._ready:
+            self.is_open = False
+            self._ready.notify_all()
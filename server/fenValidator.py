@@ -0,0 +1,192 @@
+import re
+import chess
+
+PIECE_SYMBOLS = frozenset("pnbrqkPNBRQK")
+CASTLING_ORDER = "KQkq"
+EMPTY = "."
+_EMPTY_RUN = re.compile(r"\.+")
+
+
+class FenError(ValueError):
+    """Raised when a line is not a structurally valid FEN"""
+
+
+class ParsedFen:
+    """A validated FEN together with its compact placement.
+
+    `placement` is a 64-character string indexed by python-chess square
+    number (a1 = 0, h8 = 63) holding a piece symbol or '.' for empty squares,
+    so move inference can diff two positions without building a Board.
+    `received_at` is the time.monotonic() at which the line was read, when known.
+
+    Frames decoded from a diff stream are built from a placement and the
+    remaining FEN fields (`state`); their `board_fen` and `fen` strings are
+    only assembled when first read. They also carry `changed`, the squares
+    that differ from `previous`, the placement of the frame before them.
+    """
+
+    __slots__ = ("_fen", "_board_fen", "placement", "turn", "state", "changed", "previous", "received_at")
+
+    def __init__(self, fen, board_fen, placement, turn, received_at=None, state=None, changed=None, previous=None):
+        self._fen = fen
+        self._board_fen = board_fen
+        self.placement = placement
+        self.turn = turn
+        self.state = state
+        self.changed = changed
+        self.previous = previous
+        self.received_at = received_at
+
+    @property
+    def board_fen(self):
+        if self._board_fen is None:
+            self._board_fen = placement_board_fen(self.placement)
+        return self._board_fen
+
+    @property
+    def fen(self):
+        if self._fen is None:
+            self._fen = f"{self.board_fen} {self.state}"
+        return self._fen
+
+    def __repr__(self):
+        return f"ParsedFen({self.fen!r})"
+
+
+def expand_board_fen(board_fen):
+    """Expand a trusted placement field into the 64-character placement (no validation)"""
+    cells = [EMPTY] * 64
+    rank = 7
+    file = 0
+    for char in board_fen:
+        if char == "/":
+            rank -= 1
+            file = 0
+        elif char.isdigit():
+            file += int(char)
+        else:
+            cells[rank * 8 + file] = char
+            file += 1
+    return "".join(cells)
+
+
+def placement_board_fen(placement):
+    """Inverse of expand_board_fen: the FEN placement field of a 64-character placement"""
+    rows = []
+    for start in range(56, -1, -8):
+        row = placement[start:start + 8]
+        if EMPTY in row:
+            row = _EMPTY_RUN.sub(lambda run: str(len(run.group())), row)
+        rows.append(row)
+    return "/".join(rows)
+
+
+def check_placement(placement):
+    """Apply parse_fen's piece checks to a 64-character placement; raises FenError"""
+    counts = {piece: placement.count(piece) for piece in PIECE_SYMBOLS}
+    _check_counts(counts, "White", "PNBRQK")
+    _check_counts(counts, "Black", "pnbrqk")
+    for start in (0, 56):
+        rank = placement[start:start + 8]
+        if "P" in rank or "p" in rank:
+            raise FenError(f"pawn on rank {start // 8 + 1}")
+
+
+def _check_counts(counts, color_name, pieces):
+    pawn, knight, bishop, rook, queen, king = (counts.get(p, 0) for p in pieces)
+    if king != 1:
+        raise FenError(f"{color_name} must have exactly one king, found {king}")
+    if pawn + knight + bishop + rook + queen + king > 16:
+        raise FenError(f"{color_name} has more than 16 pieces")
+    if pawn > 8:
+        raise FenError(f"{color_name} has more than 8 pawns")
+    promoted = max(0, queen - 1) + max(0, rook - 2) + max(0, bishop - 2) + max(0, knight - 2)
+    if pawn + promoted > 8:
+        raise FenError(f"{color_name} has more promoted pieces than missing pawns")
+
+
+def parse_fen(line):
+    """Validate a FEN line in a single scan and return a ParsedFen.
+
+    Checks field syntax, that every rank is exactly eight squares wide, piece
+    counts (one king per side, at most 16 pieces and 8 pawns, promotions
+    accounted for by missing pawns) and that no pawn sits on the back ranks.
+    Raises FenError describing the first problem found.
+    """
+    fields = line.split(" ")
+    if len(fields) != 6:
+        raise FenError(f"expected 6 fields, found {len(fields)}")
+    board_fen, turn, castling, ep_square, halfmove, fullmove = fields
+
+    cells = [EMPTY] * 64
+    counts = {}
+    rank = 7
+    file = 0
+    previous_digit = False
+    for char in board_fen:
+        if char == "/":
+            if file != 8:
+                raise FenError(f"rank {rank + 1} is {file} squares wide")
+            rank -= 1
+            if rank < 0:
+                raise FenError("more than 8 ranks")
+            file = 0
+            previous_digit = False
+        elif "1" <= char <= "8":
+            if previous_digit:
+                raise FenError(f"consecutive digits in rank {rank + 1}")
+            file += ord(char) - 48
+            if file > 8:
+                raise FenError(f"rank {rank + 1} is wider than 8 squares")
+            previous_digit = True
+        elif char in PIECE_SYMBOLS:
+            if file >= 8:
+                raise FenError(f"rank {rank + 1} is wider than 8 squares")
+            if (char == "P" or char == "p") and (rank == 0 or rank == 7):
+                raise FenError(f"pawn on rank {rank + 1}")
+            cells[rank * 8 + file] = char
+            counts[char] = counts.get(char, 0) + 1
+            file += 1
+            previous_digit = False
+        else:
+            raise FenError(f"invalid placement character {char!r}")
+    if rank != 0:
+        raise FenError(f"expected 8 ranks, found {8 - rank}")
+    if file != 8:
+        raise FenError(f"rank 1 is {file} squares wide")
+
+    _check_counts(counts, "White", "PNBRQK")
+    _check_counts(counts, "Black", "pnbrqk")
+
+    color = check_state(turn, castling, ep_square, halfmove, fullmove)
+    return ParsedFen(line, board_fen, "".join(cells), color)
+
+
+def check_state(turn, castling, ep_square, halfmove, fullmove):
+    """Validate the FEN fields after the placement; returns the side to move"""
+    if turn == "w":
+        color = chess.WHITE
+    elif turn == "b":
+        color = chess.BLACK
+    else:
+        raise FenError(f"invalid side to move {turn!r}")
+
+    if castling != "-":
+        position = 0
+        for char in castling:
+            index = CASTLING_ORDER.find(char, position)
+            if index < 0:
+                raise FenError(f"invalid castling field {castling!r}")
+            position = index + 1
+
+    # The pawn that just moved two squares is the opponent's: its skipped square is on rank 6 when White is to move
+    if ep_square != "-" and not (
+        len(ep_square) == 2 and "a" <= ep_square[0] <= "h" and ep_square[1] == ("6" if color == chess.WHITE else "3")
+    ):
+        raise FenError(f"invalid en passant square {ep_square!r}")
+
+    if not (halfmove.isascii() and halfmove.isdigit()):
+        raise FenError(f"invalid halfmove clock {halfmove!r}")
+    if not (fullmove.isascii() and fullmove.isdigit()):
+        raise FenError(f"invalid fullmove number {fullmove!r}")
+    return color
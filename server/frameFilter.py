@@ -0,0 +1,78 @@
+import time
+
+
+class StabilityFilter:
+    """Debounce stage in front of ChessGame.add_to_queue.
+
+    Sliding or adjusting a piece produces short-lived intermediate positions.
+    A frame is only passed on once its placement has been seen for
+    `stable_frames` consecutive frames or has persisted for `stable_ms`
+    milliseconds, whichever comes first. A criterion set to 0 is disabled;
+    with both disabled every new placement passes through immediately, which
+    matches the unfiltered behaviour. The frame criterion relies on the board
+    streaming frames continuously; boards that only send on change should use
+    stable_ms, which poll() releases without further frames.
+    """
+
+    def __init__(self, stable_ms=0, stable_frames=0):
+        if stable_ms < 0 or stable_frames < 0:
+            raise ValueError("stable_ms and stable_frames must not be negative")
+        self.stable_ms = stable_ms
+        self.stable_frames = stable_frames
+        self.candidate = None  # latest ParsedFen not yet committed
+        self.candidate_count = 0
+        self.candidate_since = None
+        self.committed_placement = None
+        self.suppressed = 0  # placements that changed before becoming stable
+
+    def _is_stable(self, now):
+        if self.stable_frames <= 0 and self.stable_ms <= 0:
+            return True
+        if self.stable_frames > 0 and self.candidate_count >= self.stable_frames:
+            return True
+        if self.stable_ms > 0 and (now - self.candidate_since) * 1000 >= self.stable_ms:
+            return True
+        return False
+
+    def _commit(self):
+        frame = self.candidate
+        self.committed_placement = frame.placement
+        self.candidate = None
+        self.candidate_count = 0
+        self.candidate_since = None
+        return frame
+
+    def offer(self, frame, now=None):
+        """Feed one ParsedFen; returns the frame to commit, or None while it is settling"""
+        if now is None:
+            now = time.monotonic()
+
+        if self.candidate is not None and self.candidate.placement == frame.placement:
+            self.candidate = frame
+            self.candidate_count += 1
+        else:
+            if self.candidate is not None:
+                self.suppressed += 1
+            if frame.placement == self.committed_placement:
+                # Back to the committed position (e.g. a piece lifted and put back)
+                self.candidate = None
+                self.candidate_count = 0
+                self.candidate_since = None
+                return None
+            self.candidate = frame
+            self.candidate_count = 1
+            self.candidate_since = now
+
+        if self._is_stable(now):
+            return self._commit()
+        return None
+
+    def poll(self, now=None):
+        """Release the pending frame once it has been stable long enough without new frames"""
+        if self.candidate is None:
+            return None
+        if now is None:
+            now = time.monotonic()
+        if self._is_stable(now):
+            return self._commit()
+        return None
@@ -1,17 +1,71 @@
+import itertools
 import chess
+from fenValidator import EMPTY
+
+
+def board_placement(board: chess.Board) -> str:
+    """64-character placement (a1..h8, '.' for empty) of a board"""
+    return "".join(piece.symbol() if piece else EMPTY for piece in map(board.piece_at, chess.SQUARES))
+
 
 def determine_move(board_before: chess.Board, board_after: chess.Board):
-    changed = [sq for sq in range(64) if board_before.piece_at(sq) != board_after.piece_at(sq)]
+    return infer_move(board_before, board_placement(board_after))
+
+
+def move_result(board: chess.Board, move: chess.Move):
+    """{square: symbol or '.'} for every square the move changes, without pushing it"""
+    piece = board.piece_at(move.from_square)
+    symbol = chess.piece_symbol(move.promotion) if move.promotion else piece.symbol().lower()
+    if piece.color == chess.WHITE:
+        symbol = symbol.upper()
+    if board.is_castling(move):
+        rank = chess.square_rank(move.from_square)
+        kingside = chess.square_file(move.to_square) > chess.square_file(move.from_square)
+        rook = "R" if piece.color == chess.WHITE else "r"
+        return {
+            move.from_square: EMPTY,
+            chess.square(7 if kingside else 0, rank): EMPTY,
+            chess.square(6 if kingside else 2, rank): symbol,
+            chess.square(5 if kingside else 3, rank): rook,
+        }
+    result = {move.from_square: EMPTY, move.to_square: symbol}
+    if board.is_en_passant(move):
+        result[chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square))] = EMPTY
+    return result
+
+
+def infer_move(board_before: chess.Board, placement: str, before_placement: str = None, changed=None, candidates=None):
+    """Match a target placement against the moves available from board_before.
+
+    `placement` describes the position after the move, as produced by
+    fenValidator.parse_fen, so a frame from the board never has to be turned
+    into a chess.Board. Passing `before_placement` skips rebuilding it from
+    board_before, and `changed` (the squares that differ between the two, as
+    a diff stream reports them) skips comparing them. `candidates` are legal
+    moves to try before the rest, e.g. those of a lifted piece.
+    """
+    if before_placement is None:
+        before_placement = board_placement(board_before)
+    if changed is None:
+        changed = [sq for sq in range(64) if before_placement[sq] != placement[sq]]
 
     # Disallow ambiguous changes
     if len(changed) < 2 or len(changed) > 4:
         return None, "(ambiguous or unsupported change)"
 
-    # Check legal moves first, including e.p. and castling
-    for move in board_before.legal_moves:
-        temp_board = board_before.copy()
-        temp_board.push(move)
-        if temp_board.board_fen() == board_after.board_fen():
+    # Check legal moves first, including e.p. and castling. Every legal move
+    # vacates its from-square, so only moves starting on a changed square can
+    # match, and a move matches when the squares it changes are exactly the
+    # changed squares and end up as in the placement.
+    changed_set = set(changed)
+    for move in itertools.chain(candidates or (), board_before.legal_moves):
+        if move.from_square not in changed_set:
+            continue
+        result = move_result(board_before, move)
+        matched = len(result) == len(changed_set) and all(
+            placement[sq] == symbol and sq in changed_set for sq, symbol in result.items()
+        )
+        if matched:
             try:
                 san = board_before.san(move)
             except:
@@ -26,12 +80,12 @@ def determine_move(board_before: chess.Board, board_after: chess.Board):
     from_sq = None
     to_sq = None
     for sq in changed:
-        before_piece = board_before.piece_at(sq)
-        after_piece = board_after.piece_at(sq)
+        before_symbol = before_placement[sq]
+        after_symbol = placement[sq]
 
-        if before_piece and not after_piece:
+        if before_symbol != EMPTY and after_symbol == EMPTY:
             from_sq = sq
-        elif after_piece and (not before_piece or before_piece.color != after_piece.color):
+        elif after_symbol != EMPTY and (before_symbol == EMPTY or before_symbol.isupper() != after_symbol.isupper()):
             to_sq = sq
 
     if from_sq is None or to_sq is None:
@@ -41,9 +95,9 @@ def determine_move(board_before: chess.Board, board_after: chess.Board):
     promotion = None
     moved_piece = board_before.piece_at(from_sq)
     if moved_piece.piece_type == chess.PAWN and chess.square_rank(to_sq) in [0, 7]:
-        promoted_piece = board_after.piece_at(to_sq)
-        if promoted_piece:
-            promotion = promoted_piece.piece_type
+        promoted_symbol = placement[to_sq]
+        if promoted_symbol != EMPTY:
+            promotion = chess.Piece.from_symbol(promoted_symbol).piece_type
 
     move = chess.Move(from_sq, to_sq, promotion=promotion)
 
@@ -0,0 +1,18 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library encoder
+    orjson = None
+
+
+def dumps(obj):
+    """Serialize obj to a compact JSON string, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def join_array(fragments):
+    """Assemble pre-serialized JSON fragments into a JSON array"""
+    return '[' + ','.join(fragments) + ']'
@@ -0,0 +1,89 @@
+import time
+import chess
+import metrics
+from fenValidator import EMPTY
+from getMove import move_result
+
+IDLE = 'idle'
+LIFTED = 'lifted'
+
+
+def guidance_line(squares):
+    """'L <square> ...' line for the board's LEDs ('L' alone clears them)"""
+    return ' '.join(['L'] + [chess.square_name(square) for square in squares])
+
+
+class LiftTracker:
+    """Lift/place state machine in front of move inference.
+
+    A frame that only empties squares relative to the committed position
+    (a piece in the air, or a captured piece taken off first) is not a move.
+    The tracker narrows the legal moves to those that change every lifted
+    square, publishes the squares they lead to for LED guidance, and
+    ChessGame tries those candidates first when the piece comes down. Putting
+    the piece back returns to idle.
+
+    Each move's changed squares are computed once per committed position, on
+    the first lift. `on_guidance(squares)` receives the guidance squares
+    (chess square numbers, ascending; empty when the guidance is cleared).
+    """
+
+    def __init__(self, on_guidance=None):
+        self.on_guidance = on_guidance
+        self.state = IDLE
+        self.lifted = ()
+        self.candidates = None  # moves consistent with the lifted squares, or None when idle
+        self.guidance = ()
+        self._fen = None
+        self._results = None  # [(move, frozenset of squares it changes)] for the position at _fen
+
+    def _move_squares(self, fen):
+        if self._fen != fen:
+            board = chess.Board(fen)
+            self._fen = fen
+            self._results = [(move, frozenset(move_result(board, move))) for move in board.legal_moves]
+        return self._results
+
+    def observe(self, fen, placement, before_placement, changed, received_at=None):
+        """Track a frame that differs from the committed position (`fen`) on `changed`.
+
+        Returns True when the frame is a lift (nothing to commit), False when
+        something was put down and the frame should go to move inference.
+        """
+        lifted = []
+        for square in changed:
+            if before_placement[square] == EMPTY or placement[square] != EMPTY:
+                return False
+            lifted.append(square)
+        if not lifted or len(lifted) > 2:
+            return False
+
+        lifted = tuple(lifted)
+        if self.state == LIFTED and lifted == self.lifted:
+            return True  # the same piece is still in the air
+        self.state = LIFTED
+        self.lifted = lifted
+        lifted_set = set(lifted)
+        self.candidates = [move for move, squares in self._move_squares(fen) if lifted_set <= squares]
+        destinations = set()
+        for move, squares in self._results:
+            if lifted_set <= squares:
+                destinations |= squares
+        self._publish(tuple(sorted(destinations - lifted_set)))
+        if received_at is not None:
+            metrics.lift_guidance_latency.observe(time.monotonic() - received_at)
+        return True
+
+    def reset(self):
+        """Back to idle after a commit or when the piece is put back"""
+        if self.state == IDLE:
+            return
+        self.state = IDLE
+        self.lifted = ()
+        self.candidates = None
+        self._publish(())
+
+    def _publish(self, squares):
+        self.guidance = squares
+        if self.on_guidance:
+            self.on_guidance(squares)
@@ -0,0 +1,185 @@
+"""Structured, leveled logging for the server.
+
+Every module logs through a category logger (`get_logger('serial')` etc.)
+under the `chesslink` namespace. Records are filtered in the calling thread
+(level, sampling, rate limiting) and then handed to a queue, so the serial
+and request threads never block on stdout; a QueueListener thread formats
+and writes them.
+
+Configuration comes from the environment:
+
+    CHESSLINK_LOG_LEVEL=INFO                   default level for all categories
+    CHESSLINK_LOG_LEVELS=serial=DEBUG,db=WARNING
+    CHESSLINK_LOG_SAMPLE=ingest=10             keep 1 in N records below WARNING
+    CHESSLINK_LOG_RATE=5                       repeats per second per message below WARNING (0 disables)
+    CHESSLINK_LOG_BURST=20
+    CHESSLINK_LOG_FORMAT=text|json
+
+Log calls in the hot path must pass values as %-style args or `extra` fields
+rather than f-strings: rate limiting and sampling key on the unformatted
+message, and formatting only happens on the listener thread.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from jsonCodec import dumps
+
+ROOT = 'chesslink'
+CATEGORIES = ('serial', 'ingest', 'db', 'http')
+
+# Attributes every LogRecord has; anything else came from `extra` and is a structured field
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def get_logger(category):
+    """Logger for one category, e.g. get_logger('serial')"""
+    return logging.getLogger(f"{ROOT}.{category}")
+
+
+def _fields(record):
+    return {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRS}
+
+
+class StructuredFormatter(logging.Formatter):
+    """`time level category message key=value ...` lines, or one JSON object per line"""
+
+    def __init__(self, as_json=False):
+        super().__init__(datefmt='%Y-%m-%dT%H:%M:%S')
+        self.as_json = as_json
+
+    def format(self, record):
+        fields = _fields(record)
+        if self.as_json:
+            entry = {
+                'time': self.formatTime(record, self.datefmt),
+                'level': record.levelname,
+                'category': record.name,
+                'message': record.getMessage(),
+            }
+            entry.update({key: str(value) for key, value in fields.items()})
+            if record.exc_info:
+                entry['exception'] = self.formatException(record.exc_info)
+            return dumps(entry)
+
+        line = f"{self.formatTime(record, self.datefmt)} {record.levelname:<7} {record.name} {record.getMessage()}"
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value!r}" if isinstance(value, str) else f"{key}={value}"
+                                   for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in `every` records below WARNING, counted per message"""
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.every <= 1 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+        return seen % self.every == 0
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per (category, message) so a repeating message cannot flood the log.
+
+    Only records below WARNING are limited: a burst of warnings or errors
+    (a failing port) is what the log is for. The number of records dropped
+    since the last one that passed is attached to the next passing record as
+    the `suppressed` field.
+    """
+
+    def __init__(self, rate, burst):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}  # key -> [tokens, last refill, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.rate <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now, 0]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that defers all formatting to the listener thread"""
+
+    def prepare(self, record):
+        return record
+
+
+def _parse_mapping(value):
+    mapping = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        name, _, setting = item.partition('=')
+        mapping[name.strip()] = setting.strip()
+    return mapping
+
+
+def setup_logging(environ=None, stream=None):
+    """Install the queue handler and listener once; later calls are no-ops"""
+    global _listener
+    environ = os.environ if environ is None else environ
+    with _setup_lock:
+        if _listener is not None:
+            return
+        root = logging.getLogger(ROOT)
+        root.setLevel(environ.get('CHESSLINK_LOG_LEVEL', 'INFO').upper())
+        root.propagate = False
+
+        levels = _parse_mapping(environ.get('CHESSLINK_LOG_LEVELS'))
+        samples = _parse_mapping(environ.get('CHESSLINK_LOG_SAMPLE'))
+        for category in set(CATEGORIES) | set(levels) | set(samples):
+            logger = get_logger(category)
+            if category in levels:
+                logger.setLevel(levels[category].upper())
+            if category in samples:
+                logger.addFilter(SamplingFilter(int(samples[category])))
+
+        records = queue.SimpleQueue()
+        handler = _EnqueueHandler(records)
+        handler.addFilter(RateLimitFilter(
+            rate=float(environ.get('CHESSLINK_LOG_RATE', 5)),
+            burst=float(environ.get('CHESSLINK_LOG_BURST', 20))
+        ))
+        root.addHandler(handler)
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(StructuredFormatter(as_json=environ.get('CHESSLINK_LOG_FORMAT') == 'json'))
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)
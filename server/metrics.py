@@ -0,0 +1,247 @@
+import bisect
+import collections
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or is computed when scraped"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, function=None):
+        super().__init__(name, documentation)
+        self._value = 0
+        self._function = function
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, function):
+        """Compute the value from `function()` at scrape time"""
+        self._function = function
+
+    def value(self):
+        return self._function() if self._function else self._value
+
+    def _samples(self):
+        return [f"{self.name} {_format_value(self.value())}"]
+
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed cumulative buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels):
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class RateMeter:
+    """Events per second over a sliding window of one-second buckets"""
+
+    def __init__(self, window=10):
+        self.window = window
+        self._buckets = collections.deque()  # [second, count]
+        self._lock = threading.Lock()
+
+    def mark(self, count=1, now=None):
+        second = int(time.monotonic() if now is None else now)
+        with self._lock:
+            if self._buckets and self._buckets[-1][0] == second:
+                self._buckets[-1][1] += count
+            else:
+                self._buckets.append([second, count])
+            self._trim(second)
+
+    def _trim(self, second):
+        while self._buckets and self._buckets[0][0] <= second - self.window:
+            self._buckets.popleft()
+
+    def rate(self, now=None):
+        second = int(time.monotonic() if now is None else now)
+        with self._lock:
+            self._trim(second)
+            return sum(count for _, count in self._buckets) / self.window
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Ingest pipeline
+frame_commit_latency = REGISTRY.register(Histogram(
+    'chesslink_frame_commit_latency_seconds',
+    'Time from a frame arriving on the serial port to committing its move'))
+determine_move_duration = REGISTRY.register(Histogram(
+    'chesslink_determine_move_seconds',
+    'Time spent inferring a move from a frame'))
+lift_guidance_latency = REGISTRY.register(Histogram(
+    'chesslink_lift_guidance_latency_seconds',
+    'Time from a lift frame arriving on the serial port to publishing its LED guidance',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)))
+save_to_db_duration = REGISTRY.register(Histogram(
+    'chesslink_save_to_db_seconds',
+    'Time spent saving a game to the database'))
+request_duration = REGISTRY.register(Histogram(
+    'chesslink_http_request_duration_seconds',
+    'HTTP request latency by route',
+    labelnames=('method', 'route')))
+
+frames_malformed = REGISTRY.register(Counter(
+    'chesslink_frames_malformed_total',
+    'Serial lines rejected before reaching the game',
+    labelnames=('reason',)))
+for _reason in ('invalid_fen', 'invalid_probabilities', 'out_of_sync', 'decode_error', 'error'):
+    frames_malformed.inc(0, reason=_reason)
+frames_duplicate = REGISTRY.register(Counter(
+    'chesslink_frames_duplicate_total',
+    'Frames whose placement matched the last committed position'))
+frames_illegal = REGISTRY.register(Counter(
+    'chesslink_frames_illegal_total',
+    'Frames committed as illegal or unrecognised moves'))
+
+queue_depth = REGISTRY.register(Gauge(
+    'chesslink_queue_depth',
+    'Frames waiting in the active game processing queue'))
+connected_boards = REGISTRY.register(Gauge(
+    'chesslink_connected_boards',
+    'Boards with an open serial connection'))
+frames_per_second = REGISTRY.register(Gauge(
+    'chesslink_frames_per_second',
+    'Valid frames read from the serial port per second, averaged over 10 seconds'))
+
+frame_rate = RateMeter()
+frames_per_second.set_function(frame_rate.rate)
@@ -0,0 +1,138 @@
+import collections
+import math
+import chess
+from fenValidator import EMPTY, PIECE_SYMBOLS, ParsedFen
+from getMove import board_placement, move_result
+
+CLASSES = 13  # empty plus the twelve piece symbols
+MIN_CONFIDENCE = 1.0 / CLASSES
+MAX_CONFIDENCE = 0.999
+PROBABILITIES = "P"  # serial line prefix of a classified frame
+
+
+def parse_probabilities(line):
+    """(placement, confidence) of a classified frame line; raises ValueError.
+
+        P <placement> <confidence>
+
+    The placement lists a1..h8 ('.' empty) as the classifier reported them,
+    legal or not, and the confidence is two hex digits per square (00 to ff
+    for 0 to 1).
+    """
+    fields = line.split(" ")
+    if len(fields) != 3 or fields[0] != PROBABILITIES:
+        raise ValueError(f"expected 'P <placement> <confidence>', found {len(fields)} fields")
+    placement, hex_confidence = fields[1], fields[2]
+    if len(placement) != 64 or not set(placement) <= PIECE_SYMBOLS | {EMPTY}:
+        raise ValueError(f"invalid placement {placement!r}")
+    try:
+        confidence = [byte / 255 for byte in bytes.fromhex(hex_confidence)]
+    except ValueError:
+        raise ValueError(f"invalid confidence {hex_confidence!r}") from None
+    if len(confidence) != 64 or len(hex_confidence) != 128:
+        raise ValueError(f"expected 64 confidence bytes, found {len(hex_confidence)} digits")
+    return placement, confidence
+
+
+def probabilities_line(placement, confidence):
+    """The 'P' line for a classified frame, as parse_probabilities reads it"""
+    digits = bytes(round(min(1.0, max(0.0, c)) * 255) for c in confidence).hex()
+    return f"{PROBABILITIES} {placement} {digits}"
+
+
+def _logaddexp(a, b):
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+
+class MoveDecoder:
+    """Scores the legal moves from one position against noisy classified frames.
+
+    Each frame is a 64-character placement (a1..h8, '.' empty) with the
+    classifier's confidence per square: the reported symbol is taken to be
+    right with that probability and any of the 12 other symbols otherwise.
+    The hidden state is "no move yet" or one of the legal moves; a move
+    happens between frames with probability `move_rate` and then stays made.
+    The forward algorithm over the last `window` frames gives a posterior per
+    move, and observe() returns the best move once its posterior reaches
+    `threshold`.
+
+    Moves only change two to four squares, so a frame is scored once against
+    the current position and each move adds the difference on its own squares.
+    """
+
+    def __init__(self, board, window=6, threshold=0.95, move_rate=0.2):
+        if window < 1 or not 0 < threshold < 1 or not 0 < move_rate < 1:
+            raise ValueError("window must be positive and threshold, move_rate within (0, 1)")
+        self.window = window
+        self.threshold = threshold
+        self.move_rate = move_rate
+        self.reset(board)
+
+    def reset(self, board):
+        """Start over from a new position"""
+        self.board = board.copy(stack=False)
+        self.fen = board.fen()
+        self.placement = board_placement(board)
+        self.moves = list(board.legal_moves)
+        self.results = [list(move_result(board, move).items()) for move in self.moves]
+        self.frames = collections.deque(maxlen=self.window)
+        self.posterior = [1.0] + [0.0] * len(self.moves)
+
+    def _score(self, placement, confidence):
+        """Per-hypothesis log-likelihood of one frame relative to "no move" (index 0)"""
+        current = self.placement
+        scores = [0.0]
+        for result in self.results:
+            delta = 0.0
+            for square, symbol in result:
+                observed = placement[square]
+                c = min(MAX_CONFIDENCE, max(MIN_CONFIDENCE, confidence[square]))
+                miss = math.log((1.0 - c) / (CLASSES - 1))
+                hit = math.log(c)
+                delta += (hit if observed == symbol else miss) - (hit if observed == current[square] else miss)
+            scores.append(delta)
+        return scores
+
+    def _forward(self):
+        moves = len(self.moves)
+        stay = math.log(1.0 - self.move_rate)
+        start = math.log(self.move_rate / moves)
+        alpha = None
+        for scores in self.frames:
+            if alpha is None:
+                alpha = [stay] + [start] * moves
+            else:
+                previous = alpha[0]
+                alpha = [previous + stay] + [_logaddexp(a, previous + start) for a in alpha[1:]]
+            alpha = [a + s for a, s in zip(alpha, scores)]
+        total = alpha[0]
+        for a in alpha[1:]:
+            total = _logaddexp(total, a)
+        return [math.exp(a - total) for a in alpha]
+
+    def observe(self, placement, confidence):
+        """Add a frame; returns (move, posterior) once a move is confident, else (None, its posterior)"""
+        if not self.moves:
+            return None, 0.0
+        self.frames.append(self._score(placement, confidence))
+        self.posterior = self._forward()
+        best = max(range(1, len(self.posterior)), key=self.posterior.__getitem__)
+        if self.posterior[best] >= self.threshold:
+            return self.moves[best - 1], self.posterior[best]
+        return None, self.posterior[best]
+
+    def frame(self, move):
+        """ParsedFen of the position after `move`, for ChessGame to commit"""
+        cells = list(self.placement)
+        changed = []
+        for square, symbol in move_result(self.board, move).items():
+            cells[square] = symbol
+            changed.append(square)
+        self.board.push(move)
+        fen = self.board.fen()
+        self.board.pop()
+        board_fen, _, state = fen.partition(" ")
+        turn = chess.BLACK if self.board.turn == chess.WHITE else chess.WHITE
+        return ParsedFen(fen, board_fen, "".join(cells), turn, state=state, changed=changed, previous=self.placement)
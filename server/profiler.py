@@ -0,0 +1,229 @@
+import collections
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+
+MODES = ('cprofile', 'sampling')
+INGEST = 'ingest'
+
+
+def _label(filename, name):
+    if filename == '~':
+        label = name  # builtins have no file
+    else:
+        label = f"{os.path.basename(filename)}:{name}"
+    return label.replace(';', ',').replace(' ', '_')
+
+
+def collapse_frame(frame):
+    """Root-to-leaf collapsed stack for a live frame"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(_label(code.co_filename, code.co_name))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def collapse_stats(stats):
+    """Approximate collapsed stacks (values in microseconds) from pstats data.
+
+    cProfile only records caller/callee pairs, so each function's own time is
+    spread over its call paths in proportion to the time each caller spent in it.
+    """
+    children = collections.defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller in callers:
+            children[caller].append(func)
+    roots = [func for func, entry in stats.items() if not entry[4]]
+    stacks = collections.Counter()
+
+    def walk(func, path, fraction):
+        cc, nc, tt, ct, callers = stats[func]
+        label = _label(func[0], func[2])
+        stack = f"{path};{label}" if path else label
+        own = int(tt * fraction * 1e6)
+        if own:
+            stacks[stack] += own
+        for child in children.get(func, ()):
+            child_ct = stats[child][3]
+            edge = stats[child][4].get(func)
+            if not edge or not child_ct or f";{_label(child[0], child[2])};" in f";{stack};":
+                continue
+            walk(child, stack, fraction * min(1.0, edge[3] / child_ct))
+
+    for root in roots:
+        walk(root, '', 1.0)
+    return stacks
+
+
+class Section:
+    """One profiled unit of work (a read cycle or a request); end() is idempotent"""
+    __slots__ = ('capture', 'profiled', 'thread_id', 'open')
+
+    def __init__(self, capture, profiled, thread_id):
+        self.capture = capture
+        self.profiled = profiled
+        self.thread_id = thread_id
+        self.open = True
+
+    def end(self, frames=0):
+        if self.open:
+            self.open = False
+            self.capture._end_section(self, frames)
+
+
+class Capture:
+    """A cProfile or stack-sampling capture bounded by a time window and/or a frame count"""
+
+    def __init__(self, target, mode='cprofile', seconds=None, frames=None, interval=0.005, on_finish=None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if seconds is None and frames is None:
+            seconds = 10
+        if (seconds is not None and seconds <= 0) or (frames is not None and frames <= 0) or interval <= 0:
+            raise ValueError("seconds, frames and interval must be positive")
+        self.target = target
+        self.mode = mode
+        self.started = time.monotonic()
+        self.deadline = self.started + seconds if seconds is not None else None
+        self.frame_limit = frames
+        self.frames = 0
+        self.sections = 0
+        self.interval = interval
+        self.done = threading.Event()
+        self.output = None
+        self._on_finish = on_finish
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()  # one thread at a time may run under cProfile
+        self._stacks = collections.Counter()
+        self._threads = set()
+        if mode == 'cprofile':
+            self._profile = cProfile.Profile()
+        else:
+            self._sampler = threading.Thread(target=self._sample, name=f"profile-sampler-{target}", daemon=True)
+            self._sampler.start()
+
+    def start_section(self):
+        thread_id = threading.get_ident()
+        profiled = False
+        if self.mode == 'cprofile':
+            profiled = self._profile_lock.acquire(blocking=False)
+            if profiled:
+                self._profile.enable()
+        else:
+            with self._lock:
+                self._threads.add(thread_id)
+        return Section(self, profiled, thread_id)
+
+    def _end_section(self, section, frames):
+        if self.mode == 'cprofile':
+            if not section.profiled:
+                return  # another thread held the profiler; this section was not measured
+            self._profile.disable()
+            self._profile_lock.release()
+        else:
+            with self._lock:
+                self._threads.discard(section.thread_id)
+        with self._lock:
+            self.sections += 1
+            self.frames += frames
+        self.check()
+
+    def _sample(self):
+        while not self.done.is_set():
+            with self._lock:
+                threads = list(self._threads)
+            if threads:
+                current = sys._current_frames()
+                for thread_id in threads:
+                    frame = current.get(thread_id)
+                    if frame is not None:
+                        self._stacks[collapse_frame(frame)] += 1
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.finish()
+                break
+            time.sleep(self.interval)
+
+    def check(self):
+        """Finish the capture once its window or frame budget is used up"""
+        if self.done.is_set():
+            return
+        if (self.frame_limit is not None and self.frames >= self.frame_limit) or \
+                (self.deadline is not None and time.monotonic() >= self.deadline):
+            self.finish()
+
+    def finish(self):
+        with self._lock:
+            if self.done.is_set():
+                return
+            self.done.set()
+        if self.mode == 'cprofile':
+            # Wait for a section still running under the profiler
+            with self._profile_lock:
+                stats = pstats.Stats(self._profile).stats if self._profile.getstats() else {}
+            self._stacks = collapse_stats(stats)
+        self.output = ''.join(f"{stack} {count}\n" for stack, count in sorted(self._stacks.items()))
+        if self._on_finish:
+            self._on_finish(self)
+
+    def status(self):
+        return {
+            'target': self.target,
+            'mode': self.mode,
+            'done': self.done.is_set(),
+            'elapsed': round(time.monotonic() - self.started, 3),
+            'sections': self.sections,
+            'frames': self.frames,
+            'frame_limit': self.frame_limit,
+        }
+
+
+class Profiler:
+    """Registry of on-demand captures keyed by target.
+
+    The target is INGEST for the serial read loop or a Flask route rule such as
+    '/games/<game_id>/state'. Hot paths only do `current(target)`, a dict
+    lookup that returns None while nothing is armed.
+    """
+
+    def __init__(self):
+        self.active = {}
+        self.finished = {}
+        self._lock = threading.Lock()
+
+    def start(self, target, **options):
+        with self._lock:
+            if target in self.active:
+                raise ValueError(f"A capture for {target} is already running")
+            capture = Capture(target, on_finish=self._finished, **options)
+            self.active[target] = capture
+            self.finished.pop(target, None)
+        return capture
+
+    def _finished(self, capture):
+        with self._lock:
+            if self.active.get(capture.target) is capture:
+                del self.active[capture.target]
+            self.finished[capture.target] = capture
+
+    def current(self, target):
+        return self.active.get(target)
+
+    def get(self, target):
+        capture = self.active.get(target)
+        if capture is not None:
+            capture.check()  # a window can expire without any work arriving
+        return self.active.get(target) or self.finished.get(target)
+
+    def stop(self, target):
+        capture = self.active.get(target)
+        if capture is not None:
+            capture.finish()
+        return self.finished.get(target)
+
+
+PROFILER = Profiler()
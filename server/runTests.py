@@ -1,6 +1,17 @@
 #!/usr/bin/env python3
 import unittest
 from testGetMove import TestDetermineMove
+from testFenValidator import TestParseFen
+from testFrameFilter import TestStabilityFilter
+from testMetrics import TestMetrics
+from testLogConfig import TestLogConfig
+from testProfiler import TestProfiler
+from testDiffStream import TestDiffStream
+from testMoveDecoder import TestMoveDecoder
+from testLiftTracker import TestLiftTracker, TestGameLift
+from testSerialIngest import TestSerialIngest, TestFakeSerialIngest
+from testSessionCapture import TestSessionCapture
+from testChessGame import TestManualEdit, TestLoadedGames
 
 if __name__ == "__main__":
-    unittest.main() 
\ No newline at end of file
+    unittest.main() 
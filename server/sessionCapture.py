@@ -0,0 +1,118 @@
+"""Raw serial session capture, for replaying real board sessions.
+
+A capture file holds every raw line read from a board, exactly as readline()
+returned it, with the monotonic time it was read. The layout is a header
+(magic, wall-clock start time) followed by one record per line:
+
+    varint microseconds since the previous line | varint length | raw bytes
+
+so a FEN frame costs two or three bytes on top of the line itself.
+Captures are written by the server when /serial/connect is called with
+`"capture": true`, into CHESSLINK_CAPTURE_DIR (default ./captures), and are
+played back by the serial emulator's --replay option. This module only
+uses the standard library, so the emulators can import it.
+"""
+import os
+import re
+import struct
+import time
+from datetime import datetime
+
+MAGIC = b"CLCAP001"
+HEADER = struct.Struct("<8sd")  # magic, wall-clock time of the first record's zero (epoch seconds)
+EXTENSION = ".clcap"
+
+
+class CaptureError(ValueError):
+    pass
+
+
+def capture_dir(environ=None):
+    environ = os.environ if environ is None else environ
+    return environ.get('CHESSLINK_CAPTURE_DIR', 'captures')
+
+
+def capture_path(game_id, directory=None, now=None):
+    """A new capture file name for a game: <game_id>-<YYYYmmdd-HHMMSS><EXTENSION>"""
+    safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', game_id).lstrip('.') or 'game'
+    stamp = (now or datetime.now()).strftime('%Y%m%d-%H%M%S')
+    return os.path.join(directory or capture_dir(), f"{safe_id}-{stamp}{EXTENSION}")
+
+
+def _varint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _read_varint(f):
+    value = shift = 0
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        value |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+class SessionCapture:
+    """Appends raw lines with their monotonic read time to a capture file"""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, time.time()))
+        self._started = time.monotonic()
+        self._last_us = 0
+        self.lines = 0
+        self.bytes = 0
+
+    def record(self, raw_line, at=None):
+        """Append one line read at monotonic time `at` (now by default)"""
+        offset_us = max(self._last_us, int(((time.monotonic() if at is None else at) - self._started) * 1e6))
+        self._file.write(_varint(offset_us - self._last_us) + _varint(len(raw_line)) + raw_line)
+        self._last_us = offset_us
+        self.lines += 1
+        self.bytes += len(raw_line)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_capture(path):
+    """(started_at, records): the capture's wall-clock start and a list of (seconds, raw line)"""
+    records = []
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or not header.startswith(MAGIC):
+            raise CaptureError(f"{path} is not a session capture")
+        _, started_at = HEADER.unpack(header)
+        offset_us = 0
+        while True:
+            delta = _read_varint(f)
+            length = _read_varint(f) if delta is not None else None
+            raw_line = f.read(length) if length is not None else b''
+            if length is None or len(raw_line) < length:
+                # End of file, or the server stopped mid-record: keep the records before it
+                break
+            offset_us += delta
+            records.append((offset_us / 1e6, raw_line))
+    return started_at, records
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import threading
+import unittest
+import chess
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+import app as server
+import chessClass
+from chessClass import ChessGame
+
+UCI_MOVES = ["e2e4", "e7e5", "g1f3", "b8c6", "f1b5", "a7a6"]
+AFTER_NF3 = "rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2"
+
+class TestManualEdit(unittest.TestCase):
+    def setUp(self):
+        self.game = ChessGame("edit-test")
+        board = chess.Board()
+        for uci in UCI_MOVES:
+            board.push_uci(uci)
+            self.game.add_to_queue(board.fen())
+        self.game.process_queue()
+
+    def edit(self, *args, **kwargs):
+        """manual_edit on a thread, failing instead of hanging if it deadlocks"""
+        worker = threading.Thread(target=self.game.manual_edit, args=args, kwargs=kwargs, daemon=True)
+        worker.start()
+        worker.join(5)
+        self.assertFalse(worker.is_alive(), "manual_edit did not return")
+
+    def test_change_reprocesses_later_moves(self):
+        """Test that changing an early move re-derives every move after it"""
+        board = chess.Board()
+        board.push_uci("d2d4")
+        self.edit(board.fen(), index=1, action="change")
+        self.assertEqual(self.game.master_state[1].uci, "d2d4")
+        self.assertEqual(len(self.game.master_state), len(UCI_MOVES) + 1)
+        self.assertFalse(self.game.master_state[2].is_legal)  # e7e5 no longer follows from d4's position
+
+    def test_unchanged_edit_keeps_game(self):
+        before = [move.uci for move in self.game.master_state]
+        self.edit(self.game.master_state[2].fen, index=2, action="change")
+        self.assertEqual([move.uci for move in self.game.master_state], before)
+
+    def test_delete_reprocesses_next_move(self):
+        self.edit(None, index=len(UCI_MOVES), action="delete")
+        self.assertEqual([move.uci for move in self.game.master_state[1:]], UCI_MOVES[:-1])
+
+class TestLoadedGames(unittest.TestCase):
+    def setUp(self):
+        """Point ChessGame at a fresh SQLite file instead of chess_games.db"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        engine = create_engine(f"sqlite:///{os.path.join(self.temp_dir.name, 'test.db')}")
+        chessClass.Base.metadata.create_all(engine)
+        self.session = chessClass.Session
+        chessClass.Session = scoped_session(sessionmaker(bind=engine))
+        self.game = ChessGame("cache-test")
+        board = chess.Board()
+        for uci in UCI_MOVES[:2]:
+            board.push_uci(uci)
+            self.game.add_to_queue(board.fen())
+        self.game.process_queue()
+        self.assertTrue(self.game.save_to_db())
+
+    def tearDown(self):
+        chessClass.Session.remove()
+        chessClass.Session = self.session
+        self.temp_dir.cleanup()
+
+    def test_loaded_game_kept_until_saved(self):
+        """Test that load_cached reuses a loaded game until the game is saved or deleted"""
+        loaded = ChessGame.load_cached("cache-test")
+        self.assertIs(ChessGame.load_cached("cache-test"), loaded)
+        self.assertEqual(len(loaded.master_state), 3)
+
+        self.game.add_to_queue(AFTER_NF3)
+        self.game.process_queue()
+        self.assertTrue(self.game.save_to_db())
+        reloaded = ChessGame.load_cached("cache-test")
+        self.assertIsNot(reloaded, loaded)
+        self.assertEqual(len(reloaded.master_state), 4)
+
+        self.assertTrue(self.game.delete_from_db())
+        self.assertIsNone(ChessGame.load_cached("cache-test"))
+
+    def test_get_game_serves_live_board(self):
+        """Test that /games/<id> serves a connected board's unsaved moves and the saved game otherwise"""
+        client = server.app.test_client()
+        self.assertEqual(len(client.get('/games/cache-test').get_json()['game']['moves']), 3)
+        live = ChessGame.load_from_db("cache-test")
+        live.add_to_queue(AFTER_NF3)
+        live.process_queue()
+        with server.connections_lock:
+            server.connections["cache-test"] = server.BoardConnection(None, live, None)
+        try:
+            self.assertEqual(len(client.get('/games/cache-test').get_json()['game']['moves']), 4)
+        finally:
+            with server.connections_lock:
+                del server.connections["cache-test"]
+        self.assertEqual(len(client.get('/games/cache-test').get_json()['game']['moves']), 3)
+
+if __name__ == "__main__":
+    unittest.main()
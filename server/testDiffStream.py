@@ -0,0 +1,78 @@
+import unittest
+import chess
+from fenValidator import FenError
+from diffStream import DiffStream
+from getMove import infer_move
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+E4_FEN = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+
+class TestDiffStream(unittest.TestCase):
+    def test_diff_after_keyframe(self):
+        """Test that a diff updates the live placement and reports its changed squares"""
+        stream = DiffStream()
+        start = stream.decode(f"K 1 {START_FEN}")
+        frame = stream.decode("D 2 b KQkq - 0 1 e2. e4P")
+        self.assertEqual(frame.fen, E4_FEN)
+        self.assertEqual(sorted(frame.changed), [chess.E2, chess.E4])
+        self.assertEqual(frame.previous, start.placement)
+        self.assertEqual(stream.placement, frame.placement)
+
+    def test_infer_move_from_diff_mask(self):
+        """Test that move inference accepts the diff's changed squares"""
+        stream = DiffStream()
+        start = stream.decode(f"K 1 {START_FEN}")
+        frame = stream.decode("D 2 b KQkq - 0 1 e2. e4P")
+        move, san = infer_move(chess.Board(), frame.placement, start.placement, frame.changed)
+        self.assertEqual(move, chess.Move.from_uci("e2e4"))
+        self.assertEqual(san, "e4")
+
+    def test_gap_waits_for_keyframe(self):
+        """Test that a missing version drops diffs until the next keyframe"""
+        stream = DiffStream()
+        stream.decode(f"K 1 {START_FEN}")
+        self.assertIsNone(stream.decode("D 3 b KQkq - 0 1 e2. e4P"))
+        self.assertIsNone(stream.decode("D 4 w KQkq - 0 2 e7. e5p"))
+        self.assertFalse(stream.synced)
+        self.assertEqual(stream.dropped, 2)
+        frame = stream.decode(f"K 5 {E4_FEN}")
+        self.assertEqual(frame.fen, E4_FEN)
+        self.assertIsNotNone(stream.decode("D 6 w KQkq - 0 2 e7. e5p"))
+
+    def test_stays_in_sync_through_invalid_positions(self):
+        """Test that a rejected position still moves the live placement forward"""
+        stream = DiffStream()
+        stream.decode(f"K 1 {START_FEN}")
+        with self.assertRaises(FenError):
+            stream.decode("D 2 w KQkq - 0 1 e1.")  # king lifted
+        frame = stream.decode("D 3 w - - 0 1 e1K")
+        self.assertEqual(frame.fen, "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w - - 0 1")
+        with self.assertRaises(FenError):
+            stream.decode("K 4 rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQ1BNR w - - 0 1")
+        self.assertTrue(stream.synced)
+        self.assertIsNotNone(stream.decode("D 5 w - - 0 1 e1K"))
+
+    def test_plain_fen_lines(self):
+        """Test that plain FEN lines still decode"""
+        stream = DiffStream()
+        self.assertEqual(stream.decode(START_FEN).fen, START_FEN)
+        self.assertEqual(stream.decode(E4_FEN).fen, E4_FEN)
+
+    def test_rejects_bad_diffs(self):
+        """Test that malformed diffs and impossible positions raise FenError"""
+        bad_lines = [
+            "D 2 b KQkq - 0 1 e2. e9P",  # square
+            "D 2 b KQkq - 0 1 e2. e4X",  # piece
+            "D 2 x KQkq - 0 1 e2. e4P",  # side to move
+            "D 2 b KQkq - 0 1 e1.",  # no white king
+            "D x b KQkq - 0 1 e2. e4P",  # version
+        ]
+        for line in bad_lines:
+            with self.subTest(line=line):
+                stream = DiffStream()
+                stream.decode(f"K 1 {START_FEN}")
+                with self.assertRaises(FenError):
+                    stream.decode(line)
+
+if __name__ == "__main__":
+    unittest.main()
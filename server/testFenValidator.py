@@ -0,0 +1,60 @@
+import unittest
+import chess
+from fenValidator import parse_fen, FenError, expand_board_fen
+from getMove import infer_move, board_placement
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+class TestParseFen(unittest.TestCase):
+    def test_start_position(self):
+        """Test that the starting position parses into the expected placement"""
+        parsed = parse_fen(START_FEN)
+        self.assertEqual(parsed.board_fen, "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR")
+        self.assertEqual(parsed.turn, chess.WHITE)
+        self.assertEqual(parsed.placement, board_placement(chess.Board()))
+        self.assertEqual(parsed.placement[chess.E1], "K")
+        self.assertEqual(parsed.placement[chess.E8], "k")
+
+    def test_expand_matches_parse(self):
+        """Test that the unchecked expander agrees with the validator"""
+        fen = "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 2 2"
+        self.assertEqual(expand_board_fen(fen.split(" ")[0]), parse_fen(fen).placement)
+
+    def test_rejects_bad_structure(self):
+        """Test boards the old regex accepted but that are not real positions"""
+        bad_lines = [
+            "rnbqkbnr/pppppppp/99/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",  # row too wide
+            "rnbqkbnr/pppppppp/7/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",  # row too narrow
+            "rnbqkbnr/pppppppp/44/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",  # consecutive digits
+            "rnbqkbnr/pppppppp/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",  # 7 ranks
+            "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQ1BNR w kq - 0 1",  # no white king
+            "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBKKBNR w kq - 0 1",  # two white kings
+            "rnbqkbnr/pppppppp/8/8/8/P7/PPPPPPPP/RNBQKBNR w KQkq - 0 1",  # 9 pawns
+            "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/QNBQKBNQ w kq - 0 1",  # extra queens with full pawns
+            "Pnbqkbnr/1ppppppp/8/8/8/8/PPPPPPP1/RNBQKBNR w KQkq - 0 1",  # pawn on the back rank
+            "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1",  # side to move
+            "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w QK - 0 1",  # castling order
+            "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e4 0 1",  # en passant rank
+            "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e3 0 1",  # en passant rank of the side to move
+            "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e6 0 2",
+            "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - x 1",  # halfmove clock
+            "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0",  # missing field
+        ]
+        for line in bad_lines:
+            with self.subTest(line=line):
+                with self.assertRaises(FenError):
+                    parse_fen(line)
+        # The en passant squares above are fine with the other side to move
+        self.assertEqual(parse_fen("rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2").turn, chess.WHITE)
+
+    def test_infer_move_from_parsed(self):
+        """Test that move inference works directly from the parsed placement"""
+        board_before = chess.Board()
+        parsed = parse_fen("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1")
+        move, san = infer_move(board_before, parsed.placement)
+        self.assertEqual(move, chess.Move.from_uci("e2e4"))
+        self.assertEqual(san, "e4")
+        self.assertEqual(board_before.fen(), START_FEN)
+
+if __name__ == "__main__":
+    unittest.main()
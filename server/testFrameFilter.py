@@ -0,0 +1,49 @@
+import unittest
+from fenValidator import parse_fen
+from frameFilter import StabilityFilter
+
+START = parse_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+E4 = parse_fen("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")
+LIFTED = parse_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPP1PPP/RNBQKBNR w KQkq - 0 1")
+
+class TestStabilityFilter(unittest.TestCase):
+    def test_pass_through_by_default(self):
+        """Test that an unconfigured filter commits every new placement immediately"""
+        stability = StabilityFilter()
+        self.assertIs(stability.offer(LIFTED, 0.0), LIFTED)
+        self.assertIs(stability.offer(E4, 0.01), E4)
+
+    def test_consecutive_frames(self):
+        """Test that a transient frame is suppressed until a placement repeats"""
+        stability = StabilityFilter(stable_frames=3)
+        self.assertIsNone(stability.offer(LIFTED, 0.0))
+        self.assertIsNone(stability.offer(E4, 0.1))
+        self.assertIsNone(stability.offer(E4, 0.2))
+        self.assertIs(stability.offer(E4, 0.3), E4)
+        self.assertEqual(stability.suppressed, 1)
+        # Repeats of the committed placement are not committed again
+        self.assertIsNone(stability.offer(E4, 0.4))
+
+    def test_stable_ms_released_by_poll(self):
+        """Test that a settled frame is released by poll without further frames"""
+        stability = StabilityFilter(stable_ms=200)
+        self.assertIsNone(stability.offer(E4, 1.0))
+        self.assertIsNone(stability.poll(1.1))
+        self.assertIs(stability.poll(1.25), E4)
+        self.assertIsNone(stability.poll(1.5))
+
+    def test_return_to_committed_position(self):
+        """Test that lifting a piece and putting it back commits nothing"""
+        stability = StabilityFilter(stable_frames=2)
+        stability.offer(START, 0.0)
+        self.assertIs(stability.offer(START, 0.1), START)
+        self.assertIsNone(stability.offer(LIFTED, 0.2))
+        self.assertIsNone(stability.offer(START, 0.3))
+        self.assertIsNone(stability.poll(5.0))
+
+    def test_rejects_negative_settings(self):
+        with self.assertRaises(ValueError):
+            StabilityFilter(stable_ms=-1)
+
+if __name__ == "__main__":
+    unittest.main()
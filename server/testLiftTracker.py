@@ -0,0 +1,94 @@
+import unittest
+import chess
+from chessClass import ChessGame
+from getMove import board_placement
+from liftTracker import LiftTracker, guidance_line, IDLE, LIFTED
+
+def lifted(board, *squares):
+    cells = list(board_placement(board))
+    for square in squares:
+        cells[square] = "."
+    return "".join(cells)
+
+def observe(tracker, board, placement):
+    before = board_placement(board)
+    changed = [sq for sq in range(64) if before[sq] != placement[sq]]
+    return tracker.observe(board.fen(), placement, before, changed)
+
+class TestLiftTracker(unittest.TestCase):
+    def test_lift_publishes_destinations(self):
+        """Test that lifting a knight lights the squares it can move to"""
+        board = chess.Board()
+        published = []
+        tracker = LiftTracker(on_guidance=published.append)
+        self.assertTrue(observe(tracker, board, lifted(board, chess.G1)))
+        self.assertEqual(tracker.state, LIFTED)
+        self.assertEqual(tracker.guidance, (chess.F3, chess.H3))
+        self.assertEqual(published, [(chess.F3, chess.H3)])
+        self.assertEqual(guidance_line(tracker.guidance), "L f3 h3")
+
+    def test_same_lift_publishes_once(self):
+        """Test that repeated frames of the same lift do not republish guidance"""
+        board = chess.Board()
+        published = []
+        tracker = LiftTracker(on_guidance=published.append)
+        for _ in range(3):
+            observe(tracker, board, lifted(board, chess.E2))
+        self.assertEqual(published, [(chess.E3, chess.E4)])
+
+    def test_reset_clears_guidance(self):
+        """Test that putting the piece back clears the LEDs"""
+        board = chess.Board()
+        published = []
+        tracker = LiftTracker(on_guidance=published.append)
+        observe(tracker, board, lifted(board, chess.E2))
+        tracker.reset()
+        self.assertEqual(tracker.state, IDLE)
+        self.assertIsNone(tracker.candidates)
+        self.assertEqual(published[-1], ())
+
+    def test_captured_piece_lifted_first(self):
+        """Test that taking the captured piece off first narrows to the captures of it"""
+        board = chess.Board("rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2")
+        tracker = LiftTracker()
+        self.assertTrue(observe(tracker, board, lifted(board, chess.D5)))
+        self.assertEqual([move.uci() for move in tracker.candidates], ["e4d5"])
+        self.assertEqual(tracker.guidance, (chess.E4,))
+
+    def test_castling_rook_lift(self):
+        """Test that lifting the rook includes castling among the candidates"""
+        board = chess.Board("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+        tracker = LiftTracker()
+        observe(tracker, board, lifted(board, chess.H1))
+        self.assertIn(chess.Move.from_uci("e1g1"), tracker.candidates)
+        self.assertIn(chess.G1, tracker.guidance)
+
+    def test_placement_is_not_a_lift(self):
+        """Test that a frame with a piece put down goes on to move inference"""
+        board = chess.Board()
+        after = board.copy()
+        after.push_uci("e2e4")
+        tracker = LiftTracker()
+        self.assertFalse(observe(tracker, board, board_placement(after)))
+        self.assertEqual(tracker.state, IDLE)
+
+class TestGameLift(unittest.TestCase):
+    def test_lift_then_move(self):
+        """Test that a lift frame is not committed and the put-down commits the move"""
+        game = ChessGame("lift-test")
+        board = chess.Board()
+        start = len(game.master_state)
+        lift = board.copy()
+        lift.remove_piece_at(chess.G1)
+        game.add_to_queue(lift.fen())
+        game.process_queue()
+        self.assertEqual(len(game.master_state), start)
+        self.assertEqual(game.lift_tracker.state, LIFTED)
+        board.push_uci("g1f3")
+        game.add_to_queue(board.fen())
+        game.process_queue()
+        self.assertEqual(game.master_state[-1].uci, "g1f3")
+        self.assertEqual(game.lift_tracker.state, IDLE)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import logging
+import threading
+import unittest
+from logConfig import RateLimitFilter, SamplingFilter, StructuredFormatter
+
+def make_record(msg, level=logging.INFO, **fields):
+    record = logging.LogRecord('chesslink.serial', level, __file__, 1, msg, (), None)
+    record.__dict__.update(fields)
+    return record
+
+class TestLogConfig(unittest.TestCase):
+    def test_rate_limit_reports_suppressed(self):
+        """Test that repeats beyond the burst are dropped and counted on the next record"""
+        limiter = RateLimitFilter(rate=1000, burst=2)
+        passed = [limiter.filter(make_record("Invalid FEN")) for _ in range(5)]
+        self.assertEqual(passed, [True, True, False, False, False])
+        # A different message has its own bucket
+        self.assertTrue(limiter.filter(make_record("Serial error")))
+        limiter._buckets[('chesslink.serial', "Invalid FEN")][0] = 1
+        record = make_record("Invalid FEN")
+        self.assertTrue(limiter.filter(record))
+        self.assertEqual(record.suppressed, 3)
+
+    def test_rate_limit_keeps_warnings(self):
+        """Test that a burst of identical warnings and errors is never dropped"""
+        limiter = RateLimitFilter(rate=1000, burst=2)
+        for level in (logging.WARNING, logging.ERROR):
+            self.assertTrue(all(limiter.filter(make_record("Serial error", level)) for _ in range(10)))
+
+    def test_sampling_keeps_warnings(self):
+        sampler = SamplingFilter(every=3)
+        kept = [sampler.filter(make_record("Processing frames", logging.DEBUG)) for _ in range(6)]
+        self.assertEqual(kept, [True, False, False, True, False, False])
+        self.assertTrue(sampler.filter(make_record("Processing frames", logging.WARNING)))
+
+    def test_sampling_counts_across_threads(self):
+        """Test that records sampled from several threads keep exactly one in `every`"""
+        sampler = SamplingFilter(every=3)
+        kept = []
+
+        def log():
+            kept.append(sum(sampler.filter(make_record("Processing frames", logging.DEBUG)) for _ in range(3000)))
+        threads = [threading.Thread(target=log) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(kept), 4000)
+
+    def test_structured_fields(self):
+        formatter = StructuredFormatter()
+        line = formatter.format(make_record("Invalid FEN", logging.WARNING, reason="bad rank", lines=3))
+        self.assertIn("WARNING chesslink.serial Invalid FEN", line)
+        self.assertIn("reason='bad rank'", line)
+        self.assertIn("lines=3", line)
+        as_json = StructuredFormatter(as_json=True).format(make_record("Invalid FEN", reason="bad rank"))
+        self.assertIn('"reason":"bad rank"', as_json)
+
+if __name__ == "__main__":
+    unittest.main()
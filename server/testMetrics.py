@@ -0,0 +1,41 @@
+import unittest
+from metrics import Counter, Gauge, Histogram, RateMeter, Registry
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram_exposition(self):
+        """Test cumulative buckets, sum and count in the text format"""
+        histogram = Histogram('test_seconds', 'Test histogram', labelnames=('route',), buckets=(0.1, 1.0))
+        histogram.observe(0.05, route='/a')
+        histogram.observe(0.5, route='/a')
+        histogram.observe(5, route='/a')
+        lines = histogram.render()
+        self.assertIn('# TYPE test_seconds histogram', lines)
+        self.assertIn('test_seconds_bucket{route="/a",le="0.1"} 1', lines)
+        self.assertIn('test_seconds_bucket{route="/a",le="1"} 2', lines)
+        self.assertIn('test_seconds_bucket{route="/a",le="+Inf"} 3', lines)
+        self.assertIn('test_seconds_count{route="/a"} 3', lines)
+        self.assertEqual(histogram.count(route='/a'), 3)
+
+    def test_counter_and_gauge(self):
+        registry = Registry()
+        counter = registry.register(Counter('test_total', 'Test counter', labelnames=('reason',)))
+        gauge = registry.register(Gauge('test_depth', 'Test gauge', function=lambda: 7))
+        counter.inc(reason='bad "quote"')
+        counter.inc(2, reason='bad "quote"')
+        text = registry.render()
+        self.assertIn('test_total{reason="bad \\"quote\\""} 3', text)
+        self.assertIn('test_depth 7', text)
+        self.assertEqual(gauge.value(), 7)
+        with self.assertRaises(ValueError):
+            counter.inc()
+
+    def test_rate_meter_window(self):
+        meter = RateMeter(window=2)
+        meter.mark(10, now=100.2)
+        meter.mark(10, now=101.5)
+        self.assertEqual(meter.rate(now=101.9), 10)
+        self.assertEqual(meter.rate(now=102.1), 5)
+        self.assertEqual(meter.rate(now=104.0), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import chess
+from chessClass import ChessGame
+from getMove import board_placement
+from moveDecoder import MoveDecoder, parse_probabilities, probabilities_line
+
+SURE = [0.95] * 64
+
+def placement_after(board, uci):
+    board = board.copy()
+    board.push_uci(uci)
+    return board_placement(board)
+
+def misread(placement, square, symbol="q"):
+    """A frame of placement with one square misread, reported with low confidence"""
+    cells = list(placement)
+    cells[square] = symbol
+    confidence = list(SURE)
+    confidence[square] = 0.5
+    return "".join(cells), confidence
+
+class TestMoveDecoder(unittest.TestCase):
+    def test_commits_through_a_misread_square(self):
+        """Test that a move is decoded from frames that are never entirely correct"""
+        board = chess.Board()
+        decoder = MoveDecoder(board)
+        after = list(placement_after(board, "g1f3"))
+        after[chess.A7] = "P"  # misread, reported with low confidence
+        confidence = list(SURE)
+        confidence[chess.A7] = 0.5
+        move = None
+        for _ in range(3):
+            move, posterior = decoder.observe("".join(after), confidence)
+            if move:
+                break
+        self.assertEqual(move, chess.Move.from_uci("g1f3"))
+        self.assertGreaterEqual(posterior, 0.95)
+
+    def test_unchanged_board_does_not_commit(self):
+        """Test that frames of the current position never commit a move"""
+        board = chess.Board()
+        decoder = MoveDecoder(board)
+        for _ in range(10):
+            move, _ = decoder.observe(board_placement(board), SURE)
+            self.assertIsNone(move)
+
+    def test_lifted_piece_is_ambiguous(self):
+        """Test that a piece in the air does not commit one of its moves"""
+        board = chess.Board()
+        decoder = MoveDecoder(board)
+        lifted = list(board_placement(board))
+        lifted[chess.G1] = "."
+        for _ in range(6):
+            move, _ = decoder.observe("".join(lifted), SURE)
+            self.assertIsNone(move)
+
+    def test_frame_for_castling(self):
+        """Test that the committed frame describes the position after the move"""
+        board = chess.Board("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+        decoder = MoveDecoder(board)
+        frame = decoder.frame(chess.Move.from_uci("e1g1"))
+        self.assertEqual(frame.fen, "r3k2r/8/8/8/8/8/8/R4RK1 b kq - 1 1")
+        self.assertEqual(frame.placement, placement_after(board, "e1g1"))
+        self.assertEqual(sorted(frame.changed), [chess.E1, chess.F1, chess.G1, chess.H1])
+
+    def test_game_commits_noisy_frames(self):
+        """Test that ChessGame commits moves from frames that each have a misread square"""
+        game = ChessGame("decoder-test")
+        board = chess.Board()
+        committed = []
+        for uci in ["e2e4", "e7e5", "g1f3"]:
+            after = placement_after(board, uci)
+            for square in (chess.A3, chess.H6, chess.C5, chess.F4):
+                move = game.submit_square_probabilities(*misread(after, square))
+                if move:
+                    committed.append(move)
+                    break
+            board.push_uci(uci)
+        self.assertEqual([move.uci for move in committed], ["e2e4", "e7e5", "g1f3"])
+        self.assertEqual(game.master_state[-1].fen, board.fen())
+        self.assertTrue(all(move.is_legal for move in game.master_state))
+
+    def test_probabilities_line(self):
+        """Test that a classified frame survives the serial line format and bad lines are rejected"""
+        placement, confidence = misread(board_placement(chess.Board()), chess.E4)
+        line = probabilities_line(placement, confidence)
+        parsed_placement, parsed_confidence = parse_probabilities(line)
+        self.assertEqual(parsed_placement, placement)
+        for sent, received in zip(confidence, parsed_confidence):
+            self.assertAlmostEqual(sent, received, delta=1 / 255)
+        for bad in (line[:-2], line.replace("q", "x"), line[:-2] + "zz", line + " 00", "P"):
+            with self.assertRaises(ValueError):
+                parse_probabilities(bad)
+
+if __name__ == "__main__":
+    unittest.main()
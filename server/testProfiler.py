@@ -0,0 +1,51 @@
+import time
+import unittest
+from profiler import Profiler
+
+def busy_work():
+    total = 0
+    for i in range(20000):
+        total += i * i
+    return total
+
+class TestProfiler(unittest.TestCase):
+    def test_cprofile_frame_budget(self):
+        """Test that a capture finishes after N frames and yields collapsed stacks"""
+        profiler = Profiler()
+        profiler.start('ingest', mode='cprofile', frames=2)
+        for _ in range(3):
+            capture = profiler.current('ingest')
+            if capture:
+                section = capture.start_section()
+                busy_work()
+                section.end(frames=1)
+        self.assertIsNone(profiler.current('ingest'))
+        capture = profiler.get('ingest')
+        self.assertTrue(capture.done.is_set())
+        self.assertEqual(capture.frames, 2)
+        self.assertTrue(any('busy_work' in line for line in capture.output.splitlines()))
+        for line in capture.output.splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(int(count) > 0)
+
+    def test_sampling_window(self):
+        profiler = Profiler()
+        capture = profiler.start('/games/<game_id>/state', mode='sampling', seconds=0.2, interval=0.001)
+        section = capture.start_section()
+        deadline = time.monotonic() + 0.3
+        while time.monotonic() < deadline:
+            busy_work()
+        section.end(frames=1)
+        self.assertTrue(capture.done.wait(1))
+        self.assertIn('busy_work', capture.output)
+
+    def test_rejects_duplicate_and_bad_mode(self):
+        profiler = Profiler()
+        profiler.start('ingest', frames=1)
+        with self.assertRaises(ValueError):
+            profiler.start('ingest', frames=1)
+        with self.assertRaises(ValueError):
+            profiler.start('other', mode='perf')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,348 @@
+import io
+import os
+import tempfile
+import sys
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+import chess
+import serial
+
+# The emulators live with the hardware simulation
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'hardware', 'sim'))
+
+import app as server
+from chessClass import ChessGame
+from fakeSerial import FakeSerial
+from sessionCapture import SessionCapture, read_capture
+
+UCI_MOVES = ["e2e4", "e7e5", "g1f3", "b8c6", "f1b5"]
+
+@unittest.skipUnless(hasattr(os, "openpty"), "pseudo-terminals are POSIX only")
+class TestSerialIngest(unittest.TestCase):
+    def setUp(self):
+        board = chess.Board()
+        self.positions = [board.fen()]
+        for uci in UCI_MOVES:
+            board.push_uci(uci)
+            self.positions.append(board.fen())
+
+    def ingest(self, send, capture=None):
+        """Run read_serial_data on a virtual port while send(port) writes to it; returns the game"""
+        from virtual_serial import VirtualSerialPort
+
+        game = ChessGame("ingest-test")
+        with VirtualSerialPort() as port:
+            connection = server.BoardConnection(serial.Serial(port.port, 115200, timeout=1), game, None)
+            connection.capture = capture
+            reader = threading.Thread(target=server.read_serial_data, args=(connection,), daemon=True)
+            reader.start()
+            try:
+                with redirect_stdout(io.StringIO()):
+                    send(port)
+                deadline = time.monotonic() + 5
+                while len(game.master_state) < len(self.positions) and time.monotonic() < deadline:
+                    time.sleep(0.05)
+            finally:
+                connection.stop_thread = True
+                reader.join(2)
+                connection.serial_connection.close()
+        return game
+
+    def test_emulated_board_commits_moves(self):
+        """Test that an emulator on a virtual port drives read_serial_data end to end"""
+        from pgn_serial_emulator import stream_fen_game
+
+        game = self.ingest(lambda port: stream_fen_game(port, 0.01, self.positions, {}))
+        self.assertEqual([move.uci for move in game.master_state[1:]], UCI_MOVES)
+        self.assertTrue(all(move.is_legal for move in game.master_state))
+
+    def test_captured_session_replays(self):
+        """Test that a session captured by the reader replays to the same moves"""
+        from pgn_serial_emulator import stream_fen_game, replay_capture
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "session.clcap")
+            capture = SessionCapture(path)
+            self.ingest(lambda port: stream_fen_game(port, 0.01, self.positions, {}), capture)
+            self.assertTrue(capture._file.closed)  # closed when the reader stops
+            _, records = read_capture(path)
+
+        self.assertEqual(b"".join(line for _, line in records),
+                         b"".join((fen + "\n").encode("utf-8") for fen in self.positions))
+        self.assertEqual([seconds for seconds, _ in records], sorted(seconds for seconds, _ in records))
+        game = self.ingest(lambda port: replay_capture(port, records, speed=0))
+        self.assertEqual([move.uci for move in game.master_state[1:]], UCI_MOVES)
+
+class UnpluggedSerial(FakeSerial):
+    """A port whose device went away, as pyserial reports it on the next read"""
+    def read(self, size=1):
+        raise serial.SerialException("device reports readiness to read but returned no data")
+
+class CountingSerial(FakeSerial):
+    """A FakeSerial that records timeout changes, each a tcsetattr on a real port"""
+    def __init__(self):
+        self.timeouts_set = []
+        super().__init__()
+        self.timeouts_set.clear()
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self._timeout = value
+        self.timeouts_set.append(value)
+
+class TestFakeSerialIngest(unittest.TestCase):
+    def test_fake_serial_reads(self):
+        """Test that FakeSerial reads lines, partial lines after the timeout, and bytes"""
+        fake = FakeSerial(timeout=0.01)
+        fake.feed(b"first\nsec")
+        self.assertEqual(fake.in_waiting, 9)
+        self.assertEqual(fake.readline(), b"first\n")
+        self.assertEqual(fake.readline(), b"sec")
+        fake.feed(b"abc")
+        self.assertEqual(fake.read(2), b"ab")
+        fake.reset_input_buffer()
+        self.assertEqual(fake.in_waiting, 0)
+        self.assertEqual(fake.read(), b"")
+
+    def test_poll_interval_bounds_commit_latency(self):
+        """Test read_serial_data on a FakeSerial with a short poll interval"""
+        board = chess.Board()
+        game = ChessGame("fake-ingest-test")
+        fake = FakeSerial()
+        connection = server.BoardConnection(fake, game, None, poll_interval=0.005)
+        reader = threading.Thread(target=server.read_serial_data, args=(connection,), daemon=True)
+        reader.start()
+        try:
+            fake.feed((board.fen() + "\n").encode("utf-8"))
+            for uci in UCI_MOVES:
+                board.push_uci(uci)
+                fed = time.monotonic()
+                fake.feed((board.fen() + "\n").encode("utf-8"))
+                while game.master_state[-1].fen != board.fen() and time.monotonic() - fed < 2:
+                    time.sleep(0.001)
+                # Well under the default 100 ms poll
+                self.assertLess(time.monotonic() - fed, 0.08)
+        finally:
+            connection.stop_thread = True
+            reader.join(2)
+            fake.close()
+        self.assertEqual([move.uci for move in game.master_state[1:]], UCI_MOVES)
+
+    def test_lines_stamped_as_read(self):
+        """Test that each line carries the time it was read, not the first line's"""
+        board = chess.Board()
+        board.push_uci(UCI_MOVES[0])
+        line = (board.fen() + "\n").encode("utf-8")
+        game = ChessGame("stamp-test")
+        stamps = []
+        track_lift = game.track_lift
+        game.track_lift = lambda placement, received_at=None: stamps.append(received_at) or track_lift(placement, received_at)
+        fake = FakeSerial()
+        connection = server.BoardConnection(fake, game, None, poll_interval=1)
+        # The second line completes 50 ms after the first
+        fake.feed(line + line[:10])
+        reader = threading.Thread(target=server.read_serial_data, args=(connection,), daemon=True)
+        reader.start()
+        try:
+            time.sleep(0.05)
+            fake.feed(line[10:])
+            deadline = time.monotonic() + 2
+            while len(stamps) < 2 and time.monotonic() < deadline:
+                time.sleep(0.005)
+        finally:
+            connection.stop_thread = True
+            fake.close()
+            reader.join(2)
+        self.assertEqual(len(stamps), 2)
+        self.assertGreaterEqual(stamps[1] - stamps[0], 0.04)
+
+    def test_idle_reads_keep_port_settings(self):
+        """Test that the reader sets the port timeout once and joins a line split across reads"""
+        board = chess.Board()
+        board.push_uci(UCI_MOVES[0])
+        line = (board.fen() + "\n").encode("utf-8")
+        game = ChessGame("timeout-test")
+        fake = CountingSerial()
+        connection = server.BoardConnection(fake, game, None, poll_interval=0.005)
+        reader = threading.Thread(target=server.read_serial_data, args=(connection,), daemon=True)
+        reader.start()
+        try:
+            fake.feed(line[:10])
+            time.sleep(0.05)  # several read timeouts pass mid-line
+            fake.feed(line[10:])
+            deadline = time.monotonic() + 2
+            while len(game.master_state) < 2 and time.monotonic() < deadline:
+                time.sleep(0.002)
+        finally:
+            connection.stop_thread = True
+            fake.close()
+            reader.join(2)
+        self.assertEqual([move.uci for move in game.master_state[1:]], UCI_MOVES[:1])
+        self.assertEqual(fake.timeouts_set, [0.005])
+
+    def test_lift_guidance_does_not_wait_for_poll(self):
+        """Test that a lift frame is read and guided as it arrives, not after the poll interval"""
+        board = chess.Board()
+        board.remove_piece_at(chess.G1)
+        game = ChessGame("lift-latency-test")
+        guided = []
+        game.lift_tracker.on_guidance = lambda squares: guided.append((time.monotonic(), squares))
+        fake = FakeSerial()
+        connection = server.BoardConnection(fake, game, None, poll_interval=1)
+        reader = threading.Thread(target=server.read_serial_data, args=(connection,), daemon=True)
+        reader.start()
+        try:
+            time.sleep(0.05)  # the reader is now waiting on the idle port
+            fed = time.monotonic()
+            fake.feed((board.fen() + "\n").encode("utf-8"))
+            while not guided and time.monotonic() - fed < 2:
+                time.sleep(0.001)
+        finally:
+            connection.stop_thread = True
+            fake.close()
+            reader.join(2)
+        self.assertEqual(guided[0][1], (chess.F3, chess.H3))
+        self.assertLess(guided[0][0] - fed, 0.01)
+
+    def test_probability_frames_commit_moves(self):
+        """Test that noisy classified frames read from the port commit moves through the decoder"""
+        from getMove import board_placement
+        from moveDecoder import probabilities_line
+
+        board = chess.Board()
+        game = ChessGame("probability-ingest-test")
+        fake = FakeSerial()
+        connection = server.BoardConnection(fake, game, None, poll_interval=0.005)
+        reader = threading.Thread(target=server.read_serial_data, args=(connection,), daemon=True)
+        reader.start()
+        try:
+            fake.feed(b"P not-a-frame\n")
+            for number, uci in enumerate(UCI_MOVES):
+                board.push_uci(uci)
+                for square in (chess.A3, chess.H6, chess.C4, chess.F5):
+                    # Every frame has one square misread with low confidence, so none is an exact position
+                    cells = list(board_placement(board))
+                    cells[square] = "q" if cells[square] == "." else "."
+                    confidence = [0.95] * 64
+                    confidence[square] = 0.5
+                    fake.feed((probabilities_line("".join(cells), confidence) + "\n").encode("ascii"))
+                deadline = time.monotonic() + 2
+                while len(game.master_state) < number + 2 and time.monotonic() < deadline:
+                    time.sleep(0.002)
+        finally:
+            connection.stop_thread = True
+            fake.close()
+            reader.join(2)
+        self.assertEqual([move.uci for move in game.master_state[1:]], UCI_MOVES)
+        self.assertEqual(game.master_state[-1].fen, board.fen())
+
+    def test_connect_reserves_port_and_replaces_lost_board(self):
+        """Test that concurrent connects cannot share a port and a lost board's game carries over"""
+        client = server.app.test_client()
+        opening = threading.Event()
+        release = threading.Event()
+        opened = []
+
+        def open_port(port, baud_rate, timeout):
+            opening.set()
+            release.wait(2)
+            opened.append(port)
+            return FakeSerial(port, timeout)
+
+        # A board whose reader lost its port, with a move applied but not saved
+        lost_game = ChessGame("lost-game")
+        board = chess.Board()
+        board.push_uci(UCI_MOVES[0])
+        lost_game.add_to_queue(board.fen())
+        lost = server.BoardConnection(None, lost_game, None)
+        lost.thread = threading.Thread(target=lambda: None)
+        lost.thread.start()
+        saved = []
+        with server.connections_lock:
+            server.connections["lost-game"] = lost
+        try:
+            with mock.patch.object(server.serial, 'Serial', open_port), \
+                    mock.patch.object(ChessGame, 'load_from_db', return_value=None), \
+                    mock.patch.object(ChessGame, 'save_to_db', lambda game: saved.append(game.game_id) or True):
+                first = []
+                connect = threading.Thread(target=lambda: first.append(client.post(
+                    '/serial/connect', json={'port': 'shared', 'game_id': 'first-game'})))
+                connect.start()
+                self.assertTrue(opening.wait(2))
+                # While the first connect is opening the port, its port and game are both taken
+                for request in ({'port': 'shared', 'game_id': 'second-game'}, {'port': 'other', 'game_id': 'first-game'}):
+                    self.assertEqual(client.post('/serial/connect', json=request).status_code, 400, request)
+                release.set()
+                connect.join(2)
+                self.assertEqual(first[0].status_code, 200)
+                self.assertEqual(opened, ["shared"])
+
+                response = client.post('/serial/connect', json={'port': 'replacement', 'game_id': 'lost-game'})
+                self.assertEqual(response.status_code, 200, response.get_json())
+                self.assertIn("lost-game", saved)
+                replacement = server.connections["lost-game"]
+                self.assertIsNot(replacement, lost)
+                self.assertIs(replacement.game, lost_game)
+                self.assertEqual([move.uci for move in lost_game.master_state[1:]], UCI_MOVES[:1])
+                self.assertFalse(lost.thread.is_alive())
+                self.assertEqual(server.connecting, {})
+        finally:
+            release.set()
+            with server.connections_lock:
+                for game_id in ("first-game", "lost-game"):
+                    connection = server.connections.pop(game_id, None)
+                    if connection:
+                        connection.stop_thread = True
+                        connection.serial_connection.close()
+
+    def test_disconnect_removes_lost_board(self):
+        """Test that /serial/disconnect removes and saves a board whose reader lost its port"""
+        client = server.app.test_client()
+        saved = []
+        boards = {}
+        for game_id in ("lost-board", "open-board"):
+            game = ChessGame(game_id)
+            game.save_to_db = lambda game_id=game_id: saved.append(game_id) or True
+            port = UnpluggedSerial() if game_id == "lost-board" else FakeSerial()
+            boards[game_id] = server.BoardConnection(port, game, None, poll_interval=0.005)
+        lost = boards["lost-board"]
+        with server.connections_lock:
+            server.connections.update(boards)
+        try:
+            lost.thread = threading.Thread(target=server.read_serial_data, args=(lost,), daemon=True)
+            with self.assertLogs('chesslink', 'ERROR'):
+                lost.thread.start()
+                lost.thread.join(2)
+            self.assertIsNone(lost.serial_connection)
+
+            # The lost board neither blocks a disconnect without game_id nor stays behind
+            response = client.post('/serial/disconnect', json={})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(saved, ["open-board"])
+            response = client.post('/serial/disconnect', json={'game_id': 'lost-board'})
+            self.assertEqual(response.status_code, 200, response.get_json())
+            self.assertEqual(saved, ["open-board", "lost-board"])
+            self.assertNotIn("lost-board", server.connections)
+            self.assertEqual(client.post('/serial/disconnect', json={}).status_code, 400)
+        finally:
+            with server.connections_lock:
+                for game_id in boards:
+                    server.connections.pop(game_id, None)
+
+    def test_connect_rejects_short_poll(self):
+        """Test that /serial/connect refuses a poll_ms below MIN_POLL_MS before opening the port"""
+        client = server.app.test_client()
+        for poll_ms in (0, 0.5, -1, True, "10"):
+            response = client.post('/serial/connect', json={'port': 'fake', 'game_id': 'poll-test', 'poll_ms': poll_ms})
+            self.assertEqual(response.status_code, 400, poll_ms)
+            self.assertIn('poll_ms', response.get_json()['message'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from sessionCapture import SessionCapture, CaptureError, capture_path, read_capture
+
+class TestSessionCapture(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "session.clcap")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_round_trip(self):
+        """Test that raw lines (including partial and undecodable ones) and their times survive"""
+        lines = [b"rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1\n", b"\xff\xfe junk\n", b"partial", b"x" * 300]
+        with SessionCapture(self.path) as capture:
+            start = capture._started
+            for i, line in enumerate(lines):
+                capture.record(line, start + i * 0.25)
+        self.assertEqual(capture.lines, 4)
+        self.assertEqual(capture.bytes, sum(len(line) for line in lines))
+
+        started_at, records = read_capture(self.path)
+        self.assertAlmostEqual(started_at, datetime.now().timestamp(), delta=60)
+        self.assertEqual([line for _, line in records], lines)
+        for i, (seconds, _) in enumerate(records):
+            self.assertAlmostEqual(seconds, i * 0.25, places=5)
+
+    def test_times_never_go_backwards(self):
+        with SessionCapture(self.path) as capture:
+            capture.record(b"a\n", capture._started + 1)
+            capture.record(b"b\n", capture._started + 0.5)
+        _, records = read_capture(self.path)
+        self.assertEqual([seconds for seconds, _ in records], [1.0, 1.0])
+
+    def test_truncated_capture_keeps_complete_records(self):
+        with SessionCapture(self.path) as capture:
+            capture.record(b"first\n")
+            capture.record(b"second line\n")
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+        _, records = read_capture(self.path)
+        self.assertEqual([line for _, line in records], [b"first\n"])
+
+    def test_not_a_capture(self):
+        with open(self.path, "wb") as f:
+            f.write(b"rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1\n")
+        with self.assertRaises(CaptureError):
+            read_capture(self.path)
+
+    def test_capture_path(self):
+        """Test that game ids cannot escape the capture directory"""
+        now = datetime(2026, 1, 2, 3, 4, 5)
+        self.assertEqual(capture_path("game-1", "captures", now), os.path.join("captures", "game-1-20260102-030405.clcap"))
+        self.assertEqual(os.path.dirname(capture_path("../../etc/x", "captures", now)), "captures")
+        self.assertEqual(capture_path("..", "captures", now), os.path.join("captures", "game-20260102-030405.clcap"))
+
+if __name__ == "__main__":
+    unittest.main()